@@ -1,9 +1,196 @@
+from django import forms
 from django.contrib import admin
-from .models import Producto
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .estados import cambiar_estado, origenes, transicion_permitida
+from .facetas import categorias_con_conteo
+from .inventario import sincronizar_stock
+from .masivo import respuesta_exportacion
+from .models import Pedido, PedidoItem, Producto, Tarea, VarianteProducto, VentaDiaria
+
+
+class CategoriaFilter(admin.SimpleListFilter):
+    """Filtro por categoría con conteos, leído de la faceta en caché."""
+
+    title = "categoría"
+    parameter_name = "categoria"
+
+    def lookups(self, request, model_admin):
+        return [
+            (c["categoria"], f"{c['categoria']} ({c['total']})")
+            for c in categorias_con_conteo()
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(categoria=self.value())
+        return queryset
+
+
+class VarianteProductoInline(admin.TabularInline):
+    model = VarianteProducto
+    extra = 0
+    fields = ("talla", "stock", "sku")
 
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
-    list_display = ("nombre", "categoria", "precio", "stock", "activo")
-    list_filter = ("categoria", "activo")
-    search_fields = ("nombre", "descripcion")
\ No newline at end of file
+    list_display = ("nombre", "sku", "categoria", "precio", "stock", "activo")
+    list_filter = (CategoriaFilter, "activo")
+    search_fields = ("nombre", "descripcion", "sku")
+    inlines = (VarianteProductoInline,)
+    actions = ("exportar_csv", "exportar_jsonl")
+
+    @admin.action(description="Exportar seleccionados (CSV)")
+    def exportar_csv(self, request, queryset):
+        return respuesta_exportacion(queryset, "csv")
+
+    @admin.action(description="Exportar seleccionados (JSONL)")
+    def exportar_jsonl(self, request, queryset):
+        return respuesta_exportacion(queryset, "jsonl")
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Con variantes, el stock del producto es la suma de sus tallas.
+        sincronizar_stock([form.instance.id])
+
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    """Consulta del resumen diario (lo llena `actualizar_ventas`)."""
+
+    list_display = ("dia", "producto", "talla", "piezas", "importe")
+    list_select_related = ("producto",)
+    date_hierarchy = "dia"
+    search_fields = ("producto__nombre",)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PaginadorAcotado(Paginator):
+    """
+    Cuenta como mucho LIMITE filas (COUNT sobre una subconsulta con LIMIT):
+    con millones de pedidos el COUNT(*) completo de cada página del listado
+    tarda más que la página. Más allá del límite se llega con filtros.
+    """
+
+    LIMITE = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[: self.LIMITE].count()
+
+
+class PedidoItemInline(admin.TabularInline):
+    """Líneas del pedido, de sólo lectura (son el registro de la venta)."""
+
+    model = PedidoItem
+    extra = 0
+    can_delete = False
+    fields = ("producto", "talla", "cantidad", "precio_unitario", "subtotal")
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("producto")
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+def _accion_cambiar_estado(estado, etiqueta):
+    def accion(modeladmin, request, queryset):
+        seleccionados = queryset.count()
+        cambiados = cambiar_estado(queryset, estado)
+        mensaje = f"{cambiados} pedido(s) marcados como {etiqueta.lower()}."
+        if cambiados < seleccionados:
+            mensaje += (
+                f" {seleccionados - cambiados} no cambiaron: su estado no"
+                f" permite pasar a {etiqueta.lower()}."
+            )
+        modeladmin.message_user(request, mensaje)
+
+    accion.__name__ = f"marcar_{estado}"
+    return admin.action(description=f"Marcar como {etiqueta.lower()}")(accion)
+
+
+class PedidoAdminForm(forms.ModelForm):
+    """
+    El estado sólo ofrece (y acepta) los destinos de Pedido.TRANSICIONES
+    desde el estado guardado, igual que las acciones en bloque.
+    """
+
+    class Meta:
+        model = Pedido
+        fields = "__all__"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and "estado_pedido" in self.fields:
+            actual = self.instance.estado_pedido
+            self.fields["estado_pedido"].choices = [
+                (estado, etiqueta) for estado, etiqueta in Pedido.ESTADO_CHOICES
+                if transicion_permitida(actual, estado)
+            ]
+
+    def clean_estado_pedido(self):
+        estado = self.cleaned_data["estado_pedido"]
+        # La instancia todavía tiene el estado guardado: el formulario la
+        # actualiza después de limpiar los campos.
+        actual = self.instance.estado_pedido
+        if self.instance.pk and not transicion_permitida(actual, estado):
+            raise forms.ValidationError(f"Un pedido {actual} no puede pasar a {estado}.")
+        return estado
+
+
+@admin.register(Pedido)
+class PedidoAdmin(admin.ModelAdmin):
+    form = PedidoAdminForm
+    list_display = (
+        "codigo", "nombre_completo", "usuario", "estado_pedido",
+        "metodo_pago", "total", "creado_en",
+    )
+    list_select_related = ("usuario",)
+    # Con el orden del listado usan pedido_estado_fecha_idx y
+    # pedido_pago_fecha_idx.
+    list_filter = ("estado_pedido", "metodo_pago", "creado_en")
+    ordering = ("-creado_en",)
+    search_fields = ("=codigo",)
+    show_full_result_count = False
+    paginator = PaginadorAcotado
+    raw_id_fields = ("usuario",)
+    readonly_fields = ("codigo", "total", "creado_en", "actualizado_en")
+    inlines = (PedidoItemInline,)
+    actions = [
+        _accion_cambiar_estado(estado, etiqueta)
+        for estado, etiqueta in Pedido.ESTADO_CHOICES
+        if origenes(estado)
+    ]
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    """Tareas pendientes o fallidas de la cola (las terminadas se borran)."""
+
+    list_display = ("nombre", "estado", "intentos", "ejecutar_en", "creada_en", "error")
+    list_filter = ("estado", "nombre")
+    ordering = ("estado", "ejecutar_en")
+    readonly_fields = ("reclamo", "creada_en")
+    show_full_result_count = False
+    actions = ("reintentar",)
+
+    @admin.action(description="Reintentar ahora")
+    def reintentar(self, request, queryset):
+        reintentadas = queryset.update(
+            estado=Tarea.PENDIENTE, intentos=0, reclamo="", ejecutar_en=timezone.now()
+        )
+        self.message_user(request, f"{reintentadas} tarea(s) se volverán a ejecutar.")
@@ -0,0 +1,132 @@
+"""
+API JSON del catálogo, de sólo lectura (/api/v1/productos/).
+
+- Las vistas son async (ver catalogo.views) y leen con values(): se
+  serializan dicts, sin construir instancias de Producto.
+- `?fields=id,nombre,precio` elige los campos de la respuesta; sólo se
+  leen sus columnas (más las que hacen falta para paginar).
+- `?por_pagina=` fija el tamaño de página, como en las vistas HTML
+  (POR_PAGINA por omisión, MAX_POR_PAGINA como tope).
+- El listado se lee completo dentro de la vista (a lo más
+  MAX_POR_PAGINA filas de dicts): así cuenta en las métricas y en el
+  presupuesto de consultas, y sirve igual en WSGI que en ASGI (un
+  StreamingHttpResponse sobre un iterador async se junta entero en
+  memoria bajo WSGI de todos modos).
+- Son datos públicos: Cache-Control public con max-age corto (lo puede
+  guardar un CDN) y ETag para revalidar con 304.
+"""
+
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+
+from .condicional import con_validadores
+from .imagenes import urls_derivados
+from .paginacion import codificar_cursor
+
+
+SEGUNDOS_CACHE = getattr(settings, "CATALOGO_API_SEGUNDOS_CACHE", 60)
+POR_PAGINA = 100
+MAX_POR_PAGINA = getattr(settings, "CATALOGO_API_MAX_POR_PAGINA", 1000)
+
+# {campo de la respuesta: columnas de Producto que necesita}
+CAMPOS_LISTA = {
+    "id": ("id",),
+    "nombre": ("nombre",),
+    "categoria": ("categoria",),
+    "precio": ("precio",),
+    "stock": ("stock",),
+    "imagen": ("imagen",),
+    "imagenes": ("imagen", "miniaturas"),
+}
+CAMPOS_DETALLE = {
+    **CAMPOS_LISTA,
+    "descripcion": ("descripcion",),
+    "tallas": (),  # de VarianteProducto
+}
+
+
+class CamposInvalidos(ValueError):
+    pass
+
+
+def elegir_campos(parametro, permitidos):
+    """
+    Campos pedidos en `?fields=` (separados por comas), o todos si no
+    viene. Lanza CamposInvalidos si alguno no existe.
+    """
+    if not parametro:
+        return list(permitidos)
+    campos = list(dict.fromkeys(c.strip() for c in parametro.split(",") if c.strip()))
+    desconocidos = [c for c in campos if c not in permitidos]
+    if desconocidos or not campos:
+        raise CamposInvalidos(
+            f"Campos desconocidos: {', '.join(desconocidos) or '(ninguno)'}. "
+            f"Disponibles: {', '.join(permitidos)}."
+        )
+    return campos
+
+
+def columnas(campos, permitidos, *siempre):
+    """Columnas de Producto para values(): las de `campos` más `siempre`."""
+    return list(dict.fromkeys([*siempre, *(col for c in campos for col in permitidos[c])]))
+
+
+def tamano_pagina(request):
+    try:
+        tamano = int(request.GET.get("por_pagina", POR_PAGINA))
+    except ValueError:
+        tamano = POR_PAGINA
+    return max(1, min(tamano, MAX_POR_PAGINA))
+
+
+def serializar(fila, campos):
+    """Dict de la respuesta con sólo `campos` (imágenes como URLs)."""
+    datos = {}
+    for campo in campos:
+        if campo == "imagen":
+            datos[campo] = default_storage.url(fila["imagen"]) if fila["imagen"] else None
+        elif campo == "imagenes":
+            datos[campo] = urls_derivados(fila["imagen"], fila["miniaturas"])
+        else:
+            datos[campo] = fila[campo]
+    return datos
+
+
+def a_json(datos):
+    return json.dumps(datos, cls=DjangoJSONEncoder, separators=(",", ":"), ensure_ascii=False)
+
+
+async def listado(consulta, tamano, campos, campo_orden):
+    """
+    {"resultados": [...], "siguiente": cursor o None} de una página de
+    `consulta` (values() con tamano + 1 filas, ver
+    paginacion.consulta_pagina; la de más sólo dice si hay otra página).
+    """
+    filas = [fila async for fila in consulta]
+    siguiente = None
+    if len(filas) > tamano:
+        ultima = filas[tamano - 1]
+        siguiente = codificar_cursor([ultima[campo_orden], ultima["id"]])
+    return {
+        "resultados": [serializar(fila, campos) for fila in filas[:tamano]],
+        "siguiente": siguiente,
+    }
+
+
+def respuesta(datos):
+    return HttpResponse(a_json(datos), content_type="application/json")
+
+
+def error(mensaje, status):
+    return JsonResponse({"error": mensaje}, status=status)
+
+
+def con_cache(respuesta_api, etag, ultima_modificacion=None):
+    """ETag (y Last-Modified) y caché pública de corta duración."""
+    return con_validadores(
+        respuesta_api, etag, ultima_modificacion, cache_control=f"public, max-age={SEGUNDOS_CACHE}"
+    )
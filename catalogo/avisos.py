@@ -0,0 +1,108 @@
+"""
+Correos al cliente: confirmación del pedido y cambios de estado.
+
+- Los piden tareas de la cola (catalogo.tareas), nunca la petición web.
+- Cada aviso es una fila de AvisoPedido, única por (pedido, estado): si
+  la tarea se reintenta o el mismo cambio llega dos veces, no se duplica.
+- Se envían en lotes por una sola conexión al servidor de correo
+  (EMAIL_BACKEND; en pruebas locmem, en desarrollo la consola). Cada lote
+  se toma con un UPDATE que exige que nadie más lo haya tomado, y cada
+  aviso se marca enviado en cuanto sale: un error a media conexión sólo
+  deja pendientes los que no salieron.
+- Si el proceso muere con un lote tomado, pasado PLAZO otro envío lo
+  vuelve a tomar (como el `reclamo` de catalogo.cola); lo que ya había
+  salido puede repetirse, nunca quedarse sin enviar.
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Q
+from django.template.loader import select_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import AvisoPedido
+
+
+LOTE = 100
+PLAZO = timedelta(minutes=10)
+
+URL_SITIO = getattr(settings, "CATALOGO_URL_SITIO", "http://localhost:8000")
+
+ASUNTOS = {
+    "pendiente": "Recibimos tu pedido {codigo}",
+    "procesando": "Estamos preparando tu pedido {codigo}",
+    "enviado": "Tu pedido {codigo} va en camino",
+    "entregado": "Tu pedido {codigo} fue entregado",
+    "cancelado": "Tu pedido {codigo} fue cancelado",
+}
+
+
+def avisar(pedido_ids, estado):
+    """Registra (sin duplicar) los avisos de `estado` y envía los pendientes."""
+    AvisoPedido.objects.bulk_create(
+        [AvisoPedido(pedido_id=pedido_id, estado=estado) for pedido_id in pedido_ids],
+        ignore_conflicts=True,
+    )
+    return enviar_pendientes()
+
+
+def mensaje(aviso):
+    """EmailMessage del aviso (`aviso.pedido` con sus líneas ya cargadas)."""
+    pedido = aviso.pedido
+    contexto = {
+        "pedido": pedido,
+        "estado": dict(pedido.ESTADO_CHOICES).get(aviso.estado, aviso.estado),
+        "items": pedido.items.all(),
+        "url_seguimiento": URL_SITIO + reverse("trackear_pedido"),
+    }
+    cuerpo = select_template([
+        f"catalogo/correos/pedido_{aviso.estado}.txt",
+        "catalogo/correos/pedido_estado.txt",
+    ]).render(contexto)
+    return EmailMessage(
+        subject=ASUNTOS.get(aviso.estado, "Tu pedido {codigo}").format(codigo=pedido.codigo),
+        body=cuerpo,
+        to=[pedido.email],
+    )
+
+
+def _tomar_lote(cantidad):
+    ahora = timezone.now()
+    marca = uuid.uuid4().hex
+    libres = Q(enviado_en__isnull=True) & (Q(lote="") | Q(tomado_en__lt=ahora - PLAZO))
+    ids = list(
+        AvisoPedido.objects.filter(libres)
+                           .order_by("id")
+                           .values_list("id", flat=True)[:cantidad]
+    )
+    AvisoPedido.objects.filter(libres, id__in=ids).update(lote=marca, tomado_en=ahora)
+    return list(
+        AvisoPedido.objects.filter(enviado_en__isnull=True, lote=marca)
+                           .select_related("pedido")
+                           .prefetch_related("pedido__items__producto")
+                           .order_by("id")
+    )
+
+
+def enviar_pendientes(lote=LOTE):
+    """Envía los avisos pendientes, `lote` por conexión. Regresa cuántos salieron."""
+    enviados = 0
+    while avisos := _tomar_lote(lote):
+        salieron = []
+        try:
+            with get_connection() as conexion:
+                for aviso in avisos:
+                    conexion.send_messages([mensaje(aviso)])
+                    salieron.append(aviso.id)
+        finally:
+            AvisoPedido.objects.filter(id__in=salieron).update(enviado_en=timezone.now())
+            # Los que no salieron quedan libres para el siguiente intento.
+            AvisoPedido.objects.filter(
+                lote=avisos[0].lote, enviado_en__isnull=True
+            ).update(lote="", tomado_en=None)
+        enviados += len(salieron)
+    return enviados
@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Count, FloatField, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Producto, TerminoProducto
+
+
+PALABRAS_VACIAS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "para", "por", "un", "una", "y",
+}
+
+# Una palabra en el nombre pesa más que en la descripción.
+PESO_NOMBRE = 3
+PESO_DESCRIPCION = 1
+
+_PALABRA = re.compile(r"\w+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: "Suéter" -> "sueter"."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def tokenizar(texto):
+    return [
+        palabra[:64]
+        for palabra in _PALABRA.findall(normalizar(texto))
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def terminos_de(nombre, descripcion):
+    """Regresa {termino: peso} para un producto."""
+    pesos = Counter()
+    for termino in tokenizar(nombre):
+        pesos[termino] += PESO_NOMBRE
+    for termino in tokenizar(descripcion):
+        pesos[termino] += PESO_DESCRIPCION
+    return pesos
+
+
+def usa_fulltext():
+    """En MySQL se usa el índice FULLTEXT nativo (ver migración 0009)."""
+    return connection.vendor == "mysql"
+
+
+def indexar_productos(productos):
+    """
+    Reconstruye las filas del índice invertido de los productos dados
+    (los inactivos sólo se quitan). Un DELETE y un INSERT por lote.
+    """
+    productos = list(productos)
+    TerminoProducto.objects.filter(producto__in=productos).delete()
+    TerminoProducto.objects.bulk_create(
+        [
+            TerminoProducto(termino=termino, producto=producto, peso=min(peso, 32767))
+            for producto in productos
+            if producto.activo
+            for termino, peso in terminos_de(producto.nombre, producto.descripcion).items()
+        ],
+        batch_size=1000,
+    )
+
+
+def reindexar_todo(lote=1000):
+    """Reconstruye el índice completo recorriendo el catálogo por lotes."""
+    TerminoProducto.objects.all().delete()
+    productos = (
+        Producto.objects.filter(activo=True)
+                        .only("id", "nombre", "descripcion", "activo")
+                        .order_by("id")
+    )
+    lote_actual = []
+    for producto in productos.iterator(chunk_size=lote):
+        lote_actual.append(producto)
+        if len(lote_actual) == lote:
+            indexar_productos(lote_actual)
+            lote_actual = []
+    if lote_actual:
+        indexar_productos(lote_actual)
+
+
+def buscar(consulta, categoria=None):
+    """
+    Productos activos que coinciden con `consulta`, ordenados por
+    relevancia (`relevancia` queda anotada). Si se da `categoria` se
+    filtra además por ella.
+    """
+    terminos = sorted(set(tokenizar(consulta)))
+    if not terminos:
+        return Producto.objects.none()
+
+    productos = Producto.objects.filter(activo=True)
+    if categoria:
+        productos = productos.filter(categoria=categoria)
+
+    if usa_fulltext():
+        productos = productos.annotate(
+            relevancia=RawSQL(
+                "MATCH (catalogo_producto.nombre, catalogo_producto.descripcion) "
+                "AGAINST (%s IN BOOLEAN MODE)",
+                (" ".join(f"+{t}" for t in terminos),),
+                output_field=FloatField(),
+            )
+        ).filter(relevancia__gt=0)
+    else:
+        # Todas las palabras deben aparecer; la relevancia es la suma de pesos.
+        productos = (
+            productos.filter(terminos__termino__in=terminos)
+                     .annotate(
+                         relevancia=Sum("terminos__peso"),
+                         coincidencias=Count("terminos__termino", distinct=True),
+                     )
+                     .filter(coincidencias=len(terminos))
+        )
+
+    return productos.order_by("-relevancia", "nombre", "id")
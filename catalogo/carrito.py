@@ -0,0 +1,190 @@
+import uuid
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+from .models import Carrito, CarritoItem, Producto, Reserva
+
+
+CLAVE_SESION = "carrito_clave"
+
+
+def clave_carrito(request):
+    """
+    Identificador estable del carrito, guardado en la sesión. A diferencia
+    de session_key, no cambia al iniciar sesión, así que el carrito y sus
+    reservas siguen siendo del mismo usuario.
+    """
+    clave = request.session.get(CLAVE_SESION)
+    if not clave:
+        clave = uuid.uuid4().hex
+        request.session[CLAVE_SESION] = clave
+    return clave
+
+
+def obtener_carrito(request, crear=False):
+    """
+    Regresa el Carrito de la sesión. Si no existe y `crear` es False regresa
+    None (así ver el carrito vacío no inserta filas).
+    """
+    clave = request.session.get(CLAVE_SESION)
+    carrito = Carrito.objects.filter(clave=clave).first() if clave else None
+
+    if carrito is None and crear:
+        usuario = request.user if request.user.is_authenticated else None
+        carrito, _ = Carrito.objects.get_or_create(
+            clave=clave_carrito(request),
+            defaults={"usuario": usuario},
+        )
+
+    if carrito is not None and "carrito" in request.session:
+        _importar_carrito_de_sesion(request, carrito)
+
+    return carrito
+
+
+def _importar_carrito_de_sesion(request, carrito):
+    """
+    Pasa a la base los carritos que quedaron en el formato anterior
+    (dict dentro de request.session["carrito"]).
+    """
+    for item in request.session.pop("carrito", {}).values():
+        producto = Producto.objects.filter(id=item["producto_id"]).first()
+        if producto is not None:
+            agregar(carrito, producto, item.get("talla", ""), item["cantidad"])
+
+
+def agregar(carrito, producto, talla, cantidad):
+    """
+    Suma `cantidad` a la línea (producto, talla) del carrito, creándola si
+    no existe. El incremento se hace en SQL, sin leer la fila antes.
+    """
+    linea = CarritoItem.objects.filter(carrito=carrito, producto=producto, talla=talla)
+    if linea.update(cantidad=F("cantidad") + cantidad):
+        return
+
+    try:
+        with transaction.atomic():
+            CarritoItem.objects.create(
+                carrito=carrito,
+                producto=producto,
+                talla=talla,
+                cantidad=cantidad,
+            )
+    except IntegrityError:
+        # Otra petición creó la línea al mismo tiempo.
+        linea.update(cantidad=F("cantidad") + cantidad)
+
+
+def items_carrito(carrito):
+    """
+    Regresa (items, total) con el mismo formato de dicts que usan las
+    plantillas y el checkout. Precio, nombre e imagen salen del producto
+    en una sola consulta; subtotales y total son Decimal exactos.
+    """
+    if carrito is None:
+        return [], Decimal("0")
+
+    lineas = (
+        CarritoItem.objects.filter(carrito=carrito)
+                           .select_related("producto")
+                           .only(
+                               "id", "talla", "cantidad", "producto__id",
+                               "producto__nombre", "producto__precio",
+                               "producto__imagen", "producto__miniaturas",
+                           )
+                           .order_by("id")
+    )
+
+    items = []
+    for linea in lineas:
+        producto = linea.producto
+        items.append({
+            "id": linea.id,
+            "producto_id": producto.id,
+            "nombre": producto.nombre,
+            "talla": linea.talla,
+            "cantidad": linea.cantidad,
+            "precio": producto.precio,
+            "subtotal": producto.precio * linea.cantidad,
+            "imagen_url": producto.url_linea,
+        })
+
+    total = sum((item["subtotal"] for item in items), Decimal("0"))
+    return items, total
+
+
+def total_carrito(carrito):
+    """Total del carrito calculado por la base, sin traer las líneas."""
+    if carrito is None:
+        return Decimal("0")
+    total = CarritoItem.objects.filter(carrito=carrito).aggregate(
+        total=Sum(
+            ExpressionWrapper(
+                F("cantidad") * F("producto__precio"),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
+    )["total"]
+    return (total or Decimal("0")).quantize(Decimal("0.01"))
+
+
+def quitar(carrito, item_id):
+    """Elimina una línea y regresa sus datos (o None si no existe)."""
+    linea = (
+        CarritoItem.objects.filter(carrito=carrito, id=item_id)
+                           .values("producto_id", "talla")
+                           .first()
+    )
+    if linea:
+        CarritoItem.objects.filter(id=item_id).delete()
+    return linea
+
+
+def vaciar(carrito):
+    CarritoItem.objects.filter(carrito=carrito).delete()
+
+
+def fusionar_al_iniciar_sesion(request, usuario):
+    """
+    Al iniciar sesión junta el carrito de la sesión con el carrito que el
+    usuario haya dejado antes (en otro dispositivo), y deja uno solo.
+    """
+    actual = obtener_carrito(request)
+    previo = (
+        Carrito.objects.filter(usuario=usuario)
+                       .exclude(id=actual.id if actual else None)
+                       .order_by("-actualizado_en")
+                       .first()
+    )
+
+    if actual is None:
+        if previo is not None:
+            request.session[CLAVE_SESION] = previo.clave
+        return
+
+    if previo is None:
+        if actual.usuario_id != usuario.id:
+            Carrito.objects.filter(id=actual.id).update(usuario=usuario)
+        return
+
+    with transaction.atomic():
+        for linea in actual.items.select_related("producto"):
+            agregar(previo, linea.producto, linea.talla, linea.cantidad)
+
+        for reserva in Reserva.objects.filter(clave=actual.clave):
+            existente = Reserva.objects.filter(
+                clave=previo.clave, producto_id=reserva.producto_id, talla=reserva.talla
+            )
+            if existente.update(
+                cantidad=F("cantidad") + reserva.cantidad,
+                expira_en=reserva.expira_en,
+            ):
+                reserva.delete()
+            else:
+                Reserva.objects.filter(id=reserva.id).update(clave=previo.clave)
+
+        actual.delete()
+
+    request.session[CLAVE_SESION] = previo.clave
@@ -0,0 +1,105 @@
+"""
+Códigos de pedido: PW-20261018-7K3M-9QXDV
+
+- La fecha es informativa; lo que hace único al código es el bloque de
+  8 caracteres, que sale del id del pedido pasado por una permutación de
+  40 bits (Feistel con clave). Como el id es único y la permutación es
+  biyectiva, dos pedidos nunca reciben el mismo código, sin importar
+  cuántos se creen por día, y los códigos no son consecutivos (no se
+  puede adivinar el de otro cliente sumando uno).
+- Se escriben en base32 de Crockford (sin I, L, O ni U) y el último
+  carácter es un dígito verificador, así que trackear_pedido tolera
+  minúsculas, espacios y confusiones O/0, I/1 y rechaza la mayoría de
+  los errores de dedo sin consultar la base.
+"""
+
+import hashlib
+import re
+
+from django.conf import settings
+
+
+ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_VALOR = {c: i for i, c in enumerate(ALFABETO)}
+_CONFUSIONES = str.maketrans({"O": "0", "I": "1", "L": "1"})
+
+BITS = 40
+_MITAD = BITS // 2
+_MASCARA = (1 << _MITAD) - 1
+RONDAS = 4
+
+# No debe cambiar una vez en producción (cambiaría la permutación).
+_CLAVE = hashlib.blake2b(
+    getattr(settings, "PEDIDO_CLAVE_CODIGOS", settings.SECRET_KEY).encode("utf-8"),
+    digest_size=16,
+).digest()
+
+# Estado inicial de blake2b con la clave ya procesada; copiarlo es más
+# barato que volver a procesar la clave en cada ronda.
+_HASH_RONDA = hashlib.blake2b(key=_CLAVE, digest_size=3)
+
+_CODIGO = re.compile(r"^PW(\d{8})([0-9A-Z]{9})$")
+
+
+class CodigoInvalido(ValueError):
+    pass
+
+
+def _ronda(mitad, ronda):
+    resumen = _HASH_RONDA.copy()
+    resumen.update(((mitad << 8) | ronda).to_bytes(4, "big"))
+    return int.from_bytes(resumen.digest(), "big") & _MASCARA
+
+
+def permutar(numero):
+    """Biyección de [0, 2**40) en sí mismo (red de Feistel balanceada)."""
+    if not 0 <= numero < 1 << BITS:
+        raise ValueError(f"{numero} no cabe en {BITS} bits")
+    izquierda, derecha = numero >> _MITAD, numero & _MASCARA
+    for ronda in range(RONDAS):
+        izquierda, derecha = derecha, izquierda ^ _ronda(derecha, ronda)
+    return (izquierda << _MITAD) | derecha
+
+
+def _base32(numero, largo):
+    caracteres = []
+    for _ in range(largo):
+        numero, resto = divmod(numero, 32)
+        caracteres.append(ALFABETO[resto])
+    return "".join(reversed(caracteres))
+
+
+def verificador(texto):
+    """
+    Dígito verificador (suma ponderada módulo 31): detecta un carácter
+    cambiado o dos vecinos intercambiados, salvo que el cambio sea 0 <-> Z.
+    """
+    suma = sum((i + 1) * _VALOR[c] for i, c in enumerate(texto))
+    return ALFABETO[suma % 31]
+
+
+def codigo_pedido(numero, fecha):
+    """Código del pedido con id `numero` creado en `fecha`."""
+    fecha = fecha.strftime("%Y%m%d")
+    cuerpo = _base32(permutar(numero), BITS // 5)
+    return f"PW-{fecha}-{cuerpo[:4]}-{cuerpo[4:]}{verificador(fecha + cuerpo)}"
+
+
+def normalizar_codigo(texto):
+    """
+    Regresa el código como se guarda en la base a partir de lo que escribió
+    el cliente ("pw 20261018 7k3m-9qxdv" -> "PW-20261018-7K3M-9QXDV").
+
+    Los códigos con otro formato (los de 4 caracteres anteriores a este
+    esquema) se regresan sólo en mayúsculas. Lanza CodigoInvalido si tiene
+    el formato actual pero el verificador no coincide.
+    """
+    limpio = re.sub(r"[\s-]", "", texto or "").upper().translate(_CONFUSIONES)
+    encontrado = _CODIGO.match(limpio)
+    if not encontrado:
+        return (texto or "").strip().upper()
+
+    fecha, cuerpo = encontrado.group(1), encontrado.group(2)
+    if any(c not in _VALOR for c in cuerpo) or verificador(fecha + cuerpo[:-1]) != cuerpo[-1]:
+        raise CodigoInvalido(texto)
+    return f"PW-{fecha}-{cuerpo[:4]}-{cuerpo[4:]}"
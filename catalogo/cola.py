@@ -0,0 +1,121 @@
+"""
+Cola de tareas en la base de datos (tabla Tarea), sin broker externo.
+
+- `encolar()` inserta la tarea en la transacción en curso: sólo existe si
+  el pedido (o lo que la originó) se confirma, y ningún trabajador la ve
+  antes del COMMIT. No se pierde si el proceso muere justo después.
+- Los trabajadores (`manage.py procesar_tareas`) reclaman tareas con
+  SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8; en SQLite, que no lo tiene,
+  un solo UPDATE) que les pone su marca y corre ejecutar_en al fin del
+  plazo. El UPDATE exige que la tarea siga libre, así que dos
+  trabajadores nunca toman la misma.
+- Si la tarea termina bien se borra. Si falla se reprograma con espera
+  exponencial; al agotar sus intentos queda como fallida (se reintenta
+  desde el admin).
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarea
+
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que un trabajador tiene una tarea antes de que otro pueda tomarla.
+PLAZO = timedelta(minutes=5)
+ESPERA_BASE = timedelta(seconds=10)
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# {nombre: (función, max_intentos)}
+_registro = {}
+
+
+def tarea(nombre, max_intentos=5):
+    """Registra la función decorada como la tarea `nombre`."""
+    def registrar(funcion):
+        _registro[nombre] = (funcion, max_intentos)
+        return funcion
+    return registrar
+
+
+def encolar(nombre, retraso=None, **argumentos):
+    """
+    Agrega la tarea `nombre` con `argumentos` (serializables a JSON). Con
+    `retraso` (timedelta) no se ejecuta antes de ese tiempo.
+    """
+    if nombre not in _registro:
+        raise ValueError(f"Tarea desconocida: {nombre}")
+    return Tarea.objects.create(
+        nombre=nombre,
+        argumentos=argumentos,
+        max_intentos=_registro[nombre][1],
+        ejecutar_en=timezone.now() + (retraso or timedelta()),
+    )
+
+
+def espera(intentos):
+    """Cuánto esperar antes del siguiente intento tras `intentos` fallidos."""
+    return min(ESPERA_BASE * 2 ** min(intentos - 1, 20), ESPERA_MAXIMA)
+
+
+def reclamar(cantidad):
+    """Toma hasta `cantidad` tareas vencidas para este trabajador."""
+    ahora = timezone.now()
+    marca = uuid.uuid4().hex
+    vencidas = (
+        Tarea.objects.filter(estado=Tarea.PENDIENTE, ejecutar_en__lte=ahora)
+                     .order_by("ejecutar_en", "id")
+                     .values("id")[:cantidad]
+    )
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            # MySQL no acepta LIMIT en la subconsulta del UPDATE: se leen
+            # los ids, saltando los que otro trabajador tiene bloqueados.
+            vencidas = list(vencidas.select_for_update(skip_locked=True).values_list("id", flat=True))
+            if not vencidas:
+                return []
+        # En SQLite leer y luego escribir en la misma transacción choca con
+        # otro trabajador que hace lo mismo: va en un solo UPDATE.
+        Tarea.objects.filter(
+            id__in=vencidas, estado=Tarea.PENDIENTE, ejecutar_en__lte=ahora
+        ).update(reclamo=marca, ejecutar_en=ahora + PLAZO, intentos=F("intentos") + 1)
+    return list(Tarea.objects.filter(reclamo=marca).order_by("id"))
+
+
+def ejecutar(tarea):
+    """
+    Ejecuta una tarea ya reclamada y la borra o la reprograma. Regresa
+    True si terminó bien.
+    """
+    # Si el plazo venció y otro trabajador la tomó, su marca es otra y
+    # estas escrituras no la tocan.
+    propia = Tarea.objects.filter(id=tarea.id, reclamo=tarea.reclamo)
+    try:
+        funcion, _ = _registro[tarea.nombre]
+        funcion(**tarea.argumentos)
+    except Exception as exc:
+        logger.exception("Falló la tarea %s (intento %s)", tarea, tarea.intentos)
+        error = f"{type(exc).__name__}: {exc}"
+        if tarea.intentos >= tarea.max_intentos:
+            propia.update(estado=Tarea.FALLIDA, reclamo="", error=error)
+        else:
+            propia.update(
+                reclamo="", error=error, ejecutar_en=timezone.now() + espera(tarea.intentos)
+            )
+        return False
+    propia.delete()
+    return True
+
+
+def procesar(cantidad=100):
+    """Reclama y ejecuta aquí mismo hasta `cantidad` tareas. Regresa cuántas."""
+    tareas = reclamar(cantidad)
+    for pendiente in tareas:
+        ejecutar(pendiente)
+    return len(tareas)
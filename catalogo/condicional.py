@@ -0,0 +1,55 @@
+"""
+Respuestas condicionales (ETag / Last-Modified -> 304 Not Modified).
+
+Las vistas calculan primero una huella barata de lo que muestra la página
+(una consulta de pocas columnas) y sólo si el cliente no tiene ya esa
+versión hacen la consulta completa y renderizan.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def etiqueta(*partes):
+    """ETag (entre comillas) a partir de los valores que definen la respuesta."""
+    base = "|".join("" if parte is None else str(parte) for parte in partes)
+    return quote_etag(hashlib.sha256(base.encode("utf-8")).hexdigest()[:32])
+
+
+def etiqueta_pagina(request, *partes):
+    """
+    Como `etiqueta`, más lo que cambia cualquier página HTML aunque no
+    cambien sus datos: el usuario (barra de navegación) y el secreto CSRF
+    (los formularios llevan un token ligado a él).
+
+    En la primera visita el secreto se crea al renderizar: la etiqueta que
+    se envía se calcula otra vez después de render().
+    """
+    return etiqueta(request.user.pk, request.META.get("CSRF_COOKIE"), *partes)
+
+
+def no_modificado(request, etag, ultima_modificacion=None):
+    """
+    Regresa la respuesta 304 (o 412) si el cliente ya tiene esta versión,
+    o None si hay que generar la página.
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(ultima_modificacion.timestamp()) if ultima_modificacion else None,
+    )
+
+
+def con_validadores(respuesta, etag, ultima_modificacion=None, cache_control="private, no-cache"):
+    """
+    Agrega ETag (y Last-Modified) a `respuesta`. Por omisión son páginas
+    con datos del usuario: sólo el navegador las guarda y las revalida
+    cada vez.
+    """
+    respuesta["ETag"] = etag
+    if ultima_modificacion:
+        respuesta["Last-Modified"] = http_date(ultima_modificacion.timestamp())
+    respuesta["Cache-Control"] = cache_control
+    return respuesta
@@ -0,0 +1,60 @@
+"""
+Cambios de estado de pedidos en bloque (acciones del admin).
+
+Un solo UPDATE para todos los pedidos seleccionados, restringido a los
+que pueden pasar al estado nuevo según Pedido.TRANSICIONES; los demás se
+quedan como están. Como UPDATE no dispara señales, aquí se hace lo que
+harían: invalidar la caché de seguimiento, avisar al cliente y corregir
+el resumen diario de ventas si se cancelaron pedidos.
+"""
+
+from django.db import transaction
+from django.db.models.functions import Now
+
+from .cola import encolar
+from .models import Pedido
+from .seguimiento import invalidar_seguimientos
+from .ventas import corregir_pedidos
+
+
+def origenes(estado):
+    """Estados desde los que se puede pasar a `estado`."""
+    return [
+        origen
+        for origen, destinos in Pedido.TRANSICIONES.items()
+        if estado in destinos
+    ]
+
+
+def transicion_permitida(origen, destino):
+    """Si un pedido en `origen` puede pasar a `destino` (o quedarse igual)."""
+    return origen == destino or destino in Pedido.TRANSICIONES.get(origen, ())
+
+
+def cambiar_estado(pedidos, estado):
+    """
+    Pasa a `estado` los pedidos de `pedidos` (queryset) cuya transición
+    está permitida. Regresa cuántos cambiaron.
+    """
+    if estado not in dict(Pedido.ESTADO_CHOICES):
+        raise ValueError(f"Estado desconocido: {estado}")
+
+    with transaction.atomic():
+        permitidos = pedidos.filter(estado_pedido__in=origenes(estado))
+        # Se leen y bloquean primero: hacen falta los códigos (caché de
+        # seguimiento) y las fechas (resumen de ventas) de los que cambian.
+        filas = list(
+            permitidos.select_for_update().order_by().values_list("id", "codigo", "creado_en")
+        )
+        if not filas:
+            return 0
+        ids = [i for i, _, _ in filas]
+        cambiados = Pedido.objects.filter(id__in=ids).update(
+            estado_pedido=estado, actualizado_en=Now()
+        )
+        encolar("avisar_pedidos", pedido_ids=ids, estado=estado)
+
+    invalidar_seguimientos([codigo for _, codigo, _ in filas])
+    if estado == "cancelado":
+        corregir_pedidos([creado_en for _, _, creado_en in filas])
+    return cambiados
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Min
+
+from .models import Producto, VarianteProducto
+
+
+CLAVE_CATEGORIAS = "catalogo:facetas:categorias"
+CLAVE_TALLAS = "catalogo:facetas:tallas"
+
+# Las señales de Producto invalidan la faceta; el timeout sólo es un
+# respaldo por si algún cambio llega por fuera del ORM.
+SEGUNDOS_CATEGORIAS = getattr(settings, "CATALOGO_SEGUNDOS_FACETAS", 60 * 60)
+
+
+def categorias_con_conteo():
+    """
+    Regresa las categorías con productos activos y cuántos tiene cada una:
+    [{"categoria": "Camisas", "total": 12}, ...]
+
+    Sale de una sola consulta agrupada (al primario: lo que se guarda en
+    caché no puede venir de una réplica atrasada) y se guarda en la caché
+    de Django, así que con la caché caliente no toca la base de datos.
+    """
+    categorias = cache.get(CLAVE_CATEGORIAS)
+    if categorias is None:
+        categorias = list(
+            Producto.objects.using(DEFAULT_DB_ALIAS)
+                            .filter(activo=True)
+                            .exclude(categoria="")
+                            .values("categoria")
+                            .annotate(total=Count("id"))
+                            .order_by("categoria")
+        )
+        cache.set(CLAVE_CATEGORIAS, categorias, SEGUNDOS_CATEGORIAS)
+    return categorias
+
+
+def _invalidar(clave):
+    # Se repite al confirmar la transacción: otra petición pudo volver a
+    # llenar la caché con los datos de antes del commit.
+    cache.delete(clave)
+    transaction.on_commit(lambda: cache.delete(clave))
+
+
+def invalidar_categorias():
+    _invalidar(CLAVE_CATEGORIAS)
+
+
+def tallas_con_existencia():
+    """
+    Tallas con al menos una variante en existencia de un producto activo,
+    para el filtro "tiene talla M" del catálogo. Misma caché que las
+    categorías; el checkout no la invalida (una talla que se agota sigue
+    en la lista hasta que vence el timeout y el filtro sólo sale vacío).
+    """
+    tallas = cache.get(CLAVE_TALLAS)
+    if tallas is None:
+        # Orden de alta de las variantes (S, M, L, XL), no alfabético.
+        tallas = list(
+            VarianteProducto.objects.using(DEFAULT_DB_ALIAS)
+                                    .filter(stock__gt=0, producto__activo=True)
+                                    .values("talla")
+                                    .annotate(primera=Min("id"))
+                                    .order_by("primera")
+                                    .values_list("talla", flat=True)
+        )
+        cache.set(CLAVE_TALLAS, tallas, SEGUNDOS_CATEGORIAS)
+    return tallas
+
+
+def invalidar_tallas():
+    _invalidar(CLAVE_TALLAS)
@@ -0,0 +1,30 @@
+"""
+CSV escrito fila por fila para StreamingHttpResponse y comandos: cada
+línea se genera en cuanto se lee su fila, sin armar el archivo en memoria.
+Lo usan la exportación del catálogo y los reportes.
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+
+class _Eco:
+    """Búfer de csv.writer que regresa lo escrito en vez de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(encabezado, filas):
+    """Genera el encabezado y cada fila (secuencias) como líneas CSV."""
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(encabezado)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def respuesta_streaming(lineas, nombre_archivo, tipo="text/csv"):
+    respuesta = StreamingHttpResponse(lineas, content_type=f"{tipo}; charset=utf-8")
+    respuesta["Content-Disposition"] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
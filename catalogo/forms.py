@@ -1,5 +1,10 @@
+from datetime import timedelta
+
 from django import forms
-from .models import Pedido
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from .models import MAX_TALLA, Pedido, Producto
 
 
 class PedidoCheckoutForm(forms.ModelForm):
@@ -54,4 +59,109 @@ class PedidoCheckoutForm(forms.ModelForm):
                 "rows": 3,
                 "placeholder": "Notas adicionales sobre tu pedido (opcional)",
             }),
-        }
\ No newline at end of file
+        }
+
+
+def parsear_tallas(valor):
+    """
+    "S:5|M:3|L:0" (o {"S": 5, ...} desde JSONL) -> {"S": 5, "M": 3, "L": 0}.
+    Lanza ValidationError si el formato o alguna cantidad no es válida.
+    """
+    if isinstance(valor, dict):
+        pares = list(valor.items())
+    else:
+        pares = []
+        for parte in str(valor).split("|"):
+            talla, separador, stock = parte.partition(":")
+            if not separador:
+                raise forms.ValidationError(
+                    f"“{parte}” no tiene el formato TALLA:STOCK (ej. S:5|M:3)."
+                )
+            pares.append((talla, stock))
+
+    tallas = {}
+    for talla, stock in pares:
+        talla = str(talla).strip()
+        if not talla or len(talla) > MAX_TALLA:
+            raise forms.ValidationError(f"Talla inválida: “{talla}”.")
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError):
+            stock = -1
+        if stock < 0:
+            raise forms.ValidationError(f"El stock de la talla {talla} debe ser un entero >= 0.")
+        tallas[talla] = stock
+    return tallas
+
+
+class FilaProductoForm(forms.Form):
+    """
+    Valida una fila de un feed de productos (ver catalogo.masivo). Todos los
+    campos son opcionales aquí: una celda vacía no cambia el campo, y qué
+    hace falta para crear un producto lo decide la importación.
+    """
+
+    id = forms.IntegerField(min_value=1, required=False)
+    sku = forms.CharField(max_length=40, required=False)
+    nombre = forms.CharField(max_length=150, required=False)
+    descripcion = forms.CharField(required=False, strip=False)
+    categoria = forms.ChoiceField(choices=Producto.CATEGORIAS_CHOICES, required=False)
+    precio = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = forms.IntegerField(min_value=0, required=False)
+    activo = forms.NullBooleanField(required=False)
+    imagen = forms.CharField(max_length=100, required=False)
+    tallas = forms.Field(required=False)
+
+    def clean_imagen(self):
+        # Sólo rutas dentro de MEDIA_ROOT: la importación no descarga nada.
+        imagen = self.cleaned_data["imagen"]
+        if not imagen:
+            return imagen
+        if "://" in imagen:
+            raise forms.ValidationError(
+                "La imagen debe ser una ruta dentro de MEDIA_ROOT, no una URL."
+            )
+        try:
+            existe = default_storage.exists(imagen)
+        except SuspiciousFileOperation:
+            existe = False
+        if not existe:
+            raise forms.ValidationError(f"No existe la imagen {imagen} en MEDIA_ROOT.")
+        return imagen
+
+    def clean_tallas(self):
+        tallas = self.cleaned_data["tallas"]
+        if tallas in (None, "", {}):
+            return None
+        return parsear_tallas(tallas)
+
+    def clean(self):
+        datos = super().clean()
+        if not datos.get("id") and not datos.get("sku"):
+            raise forms.ValidationError("Cada fila necesita sku (o id para actualizar).")
+        return datos
+
+
+class RangoReporteForm(forms.Form):
+    """Rango de días de los reportes (por omisión, los últimos 30)."""
+
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        "type": "date", "class": "form-control",
+    }))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={
+        "type": "date", "class": "form-control",
+    }))
+
+    @staticmethod
+    def por_omision(hasta=None):
+        hasta = hasta or timezone.localdate()
+        return hasta - timedelta(days=29), hasta
+
+    def clean(self):
+        datos = super().clean()
+        desde, hasta = self.por_omision(datos.get("hasta"))
+        desde = datos.get("desde") or desde
+        if desde > hasta:
+            raise forms.ValidationError("La fecha inicial es posterior a la final.")
+        datos["desde"], datos["hasta"] = desde, hasta
+        return datos
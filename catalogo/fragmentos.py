@@ -0,0 +1,173 @@
+"""
+Caché de HTML ya renderizado del catálogo.
+
+- Fragmentos por producto (tarjetas del listado, partes fijas del
+  detalle): la clave lleva el id y la versión del producto. La versión es
+  un valor al azar que se reemplaza cuando el producto cambia (señales de
+  Producto/VarianteProducto y el checkout, que descuenta stock con
+  UPDATE), así que nunca hace falta borrar fragmentos: los viejos dejan de
+  pedirse y caducan solos.
+- Vistas completas para visitantes anónimos (`cache_anonimo`): sólo para
+  páginas sin partes de la sesión (token CSRF, nombre del usuario).
+- Contadores de aciertos/fallos por fragmento o vista, para el comando
+  `estadisticas_cache`.
+
+Usa la caché `default`: locmem en desarrollo y pruebas, tabla en la base
+de datos en producción (ver CACHES en settings).
+"""
+
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+
+PREFIJO = "catalogo:fragmentos"
+SEGUNDOS_FRAGMENTO = getattr(settings, "CATALOGO_SEGUNDOS_FRAGMENTOS", 60 * 60 * 24)
+
+# Fragmentos y vistas en caché (los que reporta `estadisticas_cache`).
+NOMBRES = ("tarjeta", "detalle_imagen", "detalle_info", "inicio")
+
+
+def _clave_version(producto_id):
+    return f"{PREFIJO}:version:{producto_id}"
+
+
+def versiones(productos_ids):
+    """
+    {producto_id: versión} en una sola lectura de la caché. Los productos
+    sin versión (nuevos o expulsados de la caché) reciben una nueva.
+    """
+    claves = {_clave_version(i): i for i in productos_ids}
+    encontradas = cache.get_many(claves)
+    nuevas = {
+        clave: uuid.uuid4().hex[:12]
+        for clave in claves
+        if clave not in encontradas
+    }
+    if nuevas:
+        cache.set_many(nuevas, None)
+    return {claves[clave]: version for clave, version in {**encontradas, **nuevas}.items()}
+
+
+def invalidar_productos(productos_ids):
+    """
+    Cambia la versión de los productos: sus fragmentos dejan de usarse.
+    Se repite al confirmar la transacción, por si otra petición guardó un
+    fragmento con los datos viejos mientras tanto.
+    """
+    claves = [_clave_version(i) for i in productos_ids]
+    cache.delete_many(claves)
+    transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def registrar(nombre, aciertos=0, fallos=0):
+    for tipo, cantidad in (("aciertos", aciertos), ("fallos", fallos)):
+        if not cantidad:
+            continue
+        clave = f"{PREFIJO}:contador:{nombre}:{tipo}"
+        if not cache.add(clave, cantidad, None):
+            try:
+                cache.incr(clave, cantidad)
+            except ValueError:  # expulsado entre add() e incr()
+                cache.set(clave, cantidad, None)
+
+
+def estadisticas(nombres):
+    """{nombre: (aciertos, fallos)} de los contadores de `nombres`."""
+    claves = {
+        f"{PREFIJO}:contador:{nombre}:{tipo}": (nombre, tipo)
+        for nombre in nombres
+        for tipo in ("aciertos", "fallos")
+    }
+    valores = cache.get_many(claves)
+    return {
+        nombre: (
+            valores.get(f"{PREFIJO}:contador:{nombre}:aciertos", 0),
+            valores.get(f"{PREFIJO}:contador:{nombre}:fallos", 0),
+        )
+        for nombre in nombres
+    }
+
+
+def reiniciar_estadisticas(nombres):
+    cache.delete_many([
+        f"{PREFIJO}:contador:{nombre}:{tipo}"
+        for nombre in nombres
+        for tipo in ("aciertos", "fallos")
+    ])
+
+
+def fragmentos_productos(nombre, productos, renderizar):
+    """
+    HTML de un fragmento por producto, en el orden de `productos`.
+    `renderizar(faltantes)` recibe sólo los productos que no están en caché
+    y regresa su HTML en el mismo orden (así puede precargar lo que
+    necesite en una sola consulta). Dos lecturas de la caché (versiones y
+    fragmentos) sin importar cuántos productos sean.
+    """
+    productos = list(productos)
+    version = versiones([p.id for p in productos])
+    claves = [
+        f"{PREFIJO}:{nombre}:{p.id}:{version[p.id]}"
+        for p in productos
+    ]
+    encontrados = cache.get_many(claves)
+
+    faltantes = [
+        (producto, clave)
+        for producto, clave in zip(productos, claves)
+        if clave not in encontrados
+    ]
+    nuevos = {}
+    if faltantes:
+        html = renderizar([producto for producto, _ in faltantes])
+        nuevos = {clave: fragmento for (_, clave), fragmento in zip(faltantes, html)}
+        cache.set_many(nuevos, SEGUNDOS_FRAGMENTO)
+
+    registrar(nombre, aciertos=len(encontrados), fallos=len(nuevos))
+    return [encontrados[clave] if clave in encontrados else nuevos[clave] for clave in claves]
+
+
+def cache_anonimo(nombre, segundos=60 * 10):
+    """
+    Guarda la respuesta completa de una vista GET para visitantes anónimos,
+    por ruta + querystring. Los usuarios con sesión iniciada pasan directo
+    a la vista. Si la página usó el token CSRF no se guarda (el token es
+    de cada visitante).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != "GET" or request.user.is_authenticated:
+                return vista(request, *args, **kwargs)
+
+            ruta = hashlib.sha256(request.get_full_path().encode("utf-8")).hexdigest()[:32]
+            clave = f"{PREFIJO}:vista:{nombre}:{ruta}"
+            guardada = cache.get(clave)
+            if guardada is not None:
+                registrar(nombre, aciertos=1)
+                contenido, tipo = guardada
+                respuesta = HttpResponse(contenido, content_type=tipo)
+            else:
+                registrar(nombre, fallos=1)
+                respuesta = vista(request, *args, **kwargs)
+                if (
+                    respuesta.status_code == 200
+                    and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+                    and not getattr(respuesta, "streaming", False)
+                ):
+                    cache.set(clave, (respuesta.content, respuesta["Content-Type"]), segundos)
+
+            # La misma URL cambia al iniciar sesión.
+            patch_vary_headers(respuesta, ["Cookie"])
+            return respuesta
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,131 @@
+import hashlib
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# Anchos (px) que se generan para cada uso; el segundo es para pantallas 2x.
+USOS = {
+    "tarjeta": (320, 640),
+    "detalle": (600, 1200),
+    "linea": (64, 128),
+}
+
+# Atributo `sizes` de <img> para cada uso.
+SIZES = {
+    "tarjeta": "(max-width: 600px) 90vw, 320px",
+    "detalle": "(max-width: 900px) 90vw, 600px",
+    "linea": "64px",
+}
+
+FORMATOS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+CARPETA_DERIVADOS = "productos/derivados"
+
+
+def _huella(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def _codificar(imagen, formato):
+    nombre_pil, opciones = FORMATOS[formato]
+    if nombre_pil == "JPEG" and imagen.mode not in ("RGB", "L"):
+        fondo = Image.new("RGB", imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.convert("RGBA").split()[-1])
+        imagen = fondo
+    salida = io.BytesIO()
+    imagen.save(salida, nombre_pil, **opciones)
+    return salida.getvalue()
+
+
+def generar_derivados(nombre_original, storage=None):
+    """
+    Genera las miniaturas de una imagen ya guardada en el storage y regresa
+    el dict que se guarda en Producto.miniaturas:
+
+        {"origen": "productos/hoodie.png", "huella": "3fa1...",
+         "tarjeta": {"webp": {"320": "productos/derivados/...webp", ...},
+                     "jpeg": {...}},
+         ...}
+
+    Los nombres llevan la huella del contenido original, así que pueden
+    servirse con caché de larga duración y no se regeneran si ya existen.
+    No toca la base de datos (se puede llamar desde otro proceso).
+    """
+    storage = storage or default_storage
+    with storage.open(nombre_original, "rb") as archivo:
+        contenido = archivo.read()
+
+    huella = _huella(contenido)
+    base = posixpath.splitext(posixpath.basename(nombre_original))[0]
+    original = ImageOps.exif_transpose(Image.open(io.BytesIO(contenido)))
+
+    miniaturas = {"origen": nombre_original, "huella": huella}
+    for uso, anchos in USOS.items():
+        miniaturas[uso] = {formato: {} for formato in FORMATOS}
+        for ancho in anchos:
+            ancho = min(ancho, original.width)
+            alto = max(1, round(original.height * ancho / original.width))
+            copia = original.resize((ancho, alto), Image.LANCZOS)
+            for formato in FORMATOS:
+                nombre = f"{CARPETA_DERIVADOS}/{base}-{huella}-{ancho}.{formato}"
+                if not storage.exists(nombre):
+                    storage.save(nombre, ContentFile(_codificar(copia, formato)))
+                miniaturas[uso][formato][str(ancho)] = nombre
+    return miniaturas
+
+
+def derivados_vigentes(producto):
+    """True si las miniaturas guardadas corresponden a la imagen actual."""
+    miniaturas = producto.miniaturas or {}
+    return bool(producto.imagen) and miniaturas.get("origen") == producto.imagen.name
+
+
+def srcset(producto, uso, formato):
+    """Cadena `srcset` ("url 320w, url 640w") o "" si no hay derivados."""
+    if not derivados_vigentes(producto):
+        return ""
+    variantes = producto.miniaturas.get(uso, {}).get(formato, {})
+    return ", ".join(
+        f"{default_storage.url(nombre)} {ancho}w"
+        for ancho, nombre in sorted(variantes.items(), key=lambda v: int(v[0]))
+    )
+
+
+def url_derivado(producto, uso, formato="jpeg"):
+    """
+    URL de la miniatura más chica de `uso`, o la imagen original si todavía
+    no hay derivados ("" si el producto no tiene imagen).
+    """
+    if not producto.imagen:
+        return ""
+    if derivados_vigentes(producto):
+        variantes = producto.miniaturas.get(uso, {}).get(formato, {})
+        if variantes:
+            menor = min(variantes, key=int)
+            return default_storage.url(variantes[menor])
+    return producto.imagen.url
+
+
+def urls_derivados(imagen, miniaturas):
+    """
+    {uso: {formato: {ancho: url}}} de las miniaturas vigentes, a partir de
+    las columnas `imagen` y `miniaturas` tal como salen de values(); {} si
+    no hay.
+    """
+    miniaturas = miniaturas or {}
+    if not imagen or miniaturas.get("origen") != imagen:
+        return {}
+    return {
+        uso: {
+            formato: {ancho: default_storage.url(nombre) for ancho, nombre in anchos.items()}
+            for formato, anchos in miniaturas.get(uso, {}).items()
+        }
+        for uso in USOS
+    }
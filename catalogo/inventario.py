@@ -0,0 +1,436 @@
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import (
+    Case, Count, Exists, F, Max, OuterRef, PositiveIntegerField, Q, Subquery, Sum, When,
+)
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from .cola import encolar
+from .fragmentos import invalidar_productos
+from .models import Producto, PedidoItem, Reserva, VarianteProducto
+
+
+# Minutos que se apartan las unidades agregadas al carrito.
+MINUTOS_RESERVA = getattr(settings, "CATALOGO_MINUTOS_RESERVA", 15)
+
+
+class StockInsuficiente(Exception):
+    """
+    Se lanza cuando algún producto del carrito no alcanza a cubrir la
+    cantidad solicitada. La transacción del pedido se revierte completa.
+    """
+
+    def __init__(self, nombre, disponible, solicitado):
+        self.nombre = nombre
+        self.disponible = disponible
+        self.solicitado = solicitado
+        super().__init__(
+            f"Stock insuficiente de {nombre}: "
+            f"disponible {disponible}, solicitado {solicitado}"
+        )
+
+
+class TallaInvalida(ValueError):
+    """
+    La talla no es una de las variantes del producto, o el producto no
+    tiene variantes y se pidió una talla.
+    """
+
+    def __init__(self, nombre, talla):
+        self.nombre = nombre
+        self.talla = talla
+        super().__init__(f"{nombre} no tiene la talla {talla!r}")
+
+
+def _cantidades_por_linea(items):
+    """
+    Agrupa las cantidades del carrito por (producto, talla) y conserva el
+    nombre para los mensajes de error.
+    """
+    cantidades = OrderedDict()
+    nombres = {}
+    for item in items:
+        producto_id = int(item["producto_id"])
+        linea = (producto_id, item.get("talla", ""))
+        cantidades[linea] = cantidades.get(linea, 0) + int(item["cantidad"])
+        nombres.setdefault(producto_id, item.get("nombre", ""))
+    return cantidades, nombres
+
+
+def _reservado_por_otros(productos_ids, clave=None):
+    """
+    Unidades apartadas por otros carritos (reservas vigentes), por
+    (producto, talla). Una sola consulta agregada sobre el índice
+    (producto, expira_en).
+    """
+    reservas = Reserva.objects.filter(
+        producto_id__in=productos_ids,
+        expira_en__gt=timezone.now(),
+    )
+    if clave:
+        reservas = reservas.exclude(clave=clave)
+    return {
+        (producto_id, talla): total
+        for producto_id, talla, total in (
+            reservas.values("producto_id", "talla")
+                    .annotate(total=Sum("cantidad"))
+                    .values_list("producto_id", "talla", "total")
+        )
+    }
+
+
+def repartir_stock(total, tallas):
+    """
+    Reparte `total` unidades entre `tallas` lo más parejo posible (las
+    primeras tallas se quedan con el sobrante): 10 en S,M,L -> 4,3,3.
+    """
+    base, sobrante = divmod(total, len(tallas))
+    return {talla: base + (1 if i < sobrante else 0) for i, talla in enumerate(tallas)}
+
+
+def sincronizar_stock(productos_ids):
+    """
+    Deja Producto.stock igual a la suma del stock de sus variantes (sólo
+    en los productos que tienen variantes), con un solo UPDATE.
+    """
+    suma = (
+        VarianteProducto.objects.filter(producto=OuterRef("pk"))
+                                .values("producto")
+                                .annotate(total=Sum("stock"))
+                                .values("total")
+    )
+    Producto.objects.filter(
+        Exists(VarianteProducto.objects.filter(producto=OuterRef("pk"))),
+        id__in=productos_ids,
+    ).update(stock=Coalesce(Subquery(suma), 0), actualizado_en=Now())
+
+
+def disponibles(productos_ids, clave=None):
+    """
+    Regresa {producto_id: stock - reservas vigentes de otros carritos}
+    en una sola consulta, siempre en el primario (reservas al momento).
+    """
+    filtro = Q(reservas__expira_en__gt=timezone.now())
+    if clave:
+        filtro &= ~Q(reservas__clave=clave)
+
+    filas = (
+        Producto.objects.using(DEFAULT_DB_ALIAS)
+                        .filter(id__in=productos_ids)
+                        .annotate(reservado=Coalesce(Sum("reservas__cantidad", filter=filtro), 0))
+                        .values_list("id", "stock", "reservado")
+    )
+    return {
+        producto_id: max(stock - reservado, 0)
+        for producto_id, stock, reservado in filas
+    }
+
+
+def version_disponibilidad(producto_id, clave=None):
+    """
+    Lo que cambia la disponibilidad que ve el carrito `clave` en la página
+    del producto: la última modificación del producto (stock, variantes) y
+    las reservas vigentes de otros carritos (suma, cuántas y la más nueva).
+    Una consulta agregada sin leer filas de reservas, en el primario; None
+    si el producto no existe o no está activo.
+    """
+    filtro = Q(reservas__expira_en__gt=timezone.now())
+    if clave:
+        filtro &= ~Q(reservas__clave=clave)
+
+    return (
+        Producto.objects.using(DEFAULT_DB_ALIAS)
+                        .filter(id=producto_id, activo=True)
+                        .annotate(
+                            reservado=Sum("reservas__cantidad", filter=filtro),
+                            reservas_vigentes=Count("reservas", filter=filtro),
+                            ultima_reserva=Max("reservas__id", filter=filtro),
+                        )
+                        .values_list("actualizado_en", "reservado", "reservas_vigentes", "ultima_reserva")
+                        .first()
+    )
+
+
+def disponibles_por_talla(producto, clave=None):
+    """
+    Regresa {talla: stock de la variante - reservas vigentes de otros
+    carritos} en el orden de las variantes. Usa las variantes ya
+    precargadas (prefetch_related("variantes")) y una sola consulta
+    agregada de reservas. {} si el producto no tiene variantes.
+    """
+    variantes = list(producto.variantes.all())
+    if not variantes:
+        return {}
+    reservado = _reservado_por_otros([producto.id], clave)
+    return {
+        v.talla: max(v.stock - reservado.get((producto.id, v.talla), 0), 0)
+        for v in variantes
+    }
+
+
+def reservar(clave, producto, talla, cantidad):
+    """
+    Aparta `cantidad` unidades más de `producto` en `talla` para el carrito
+    `clave` y renueva el vencimiento de la reserva. Si el producto tiene
+    variantes se valida contra el stock de esa talla; si no, contra el
+    stock del producto y la talla tiene que ir vacía.
+    Lanza TallaInvalida si la talla no corresponde al producto y
+    StockInsuficiente si lo disponible (stock menos reservas de otros)
+    no alcanza.
+    """
+    with transaction.atomic():
+        # Bloquear el producto serializa las reservas concurrentes, también
+        # las de sus variantes.
+        producto = Producto.objects.select_for_update().get(id=producto.id)
+        variantes = dict(
+            VarianteProducto.objects.filter(producto=producto)
+                                    .values_list("talla", "stock")
+        )
+        if (talla not in variantes) if variantes else talla:
+            raise TallaInvalida(producto.nombre, talla)
+
+        reserva = (
+            Reserva.objects.select_for_update()
+                           .filter(clave=clave, producto=producto, talla=talla)
+                           .first()
+        )
+        ya_reservado = reserva.cantidad if reserva else 0
+
+        # Todo lo apartado salvo esta misma línea (otros carritos y, si el
+        # stock es del producto, otras tallas del mismo carrito).
+        apartadas = (
+            Reserva.objects.filter(producto=producto, expira_en__gt=timezone.now())
+                           .exclude(clave=clave, talla=talla)
+        )
+        if variantes:
+            nombre = f"{producto.nombre} ({talla})"
+            stock = variantes.get(talla, 0)
+            apartadas = apartadas.filter(talla=talla)
+        else:
+            nombre = producto.nombre
+            stock = producto.stock
+        reservado = apartadas.aggregate(total=Coalesce(Sum("cantidad"), 0))["total"]
+        disponible = stock - reservado
+
+        if ya_reservado + cantidad > disponible:
+            raise StockInsuficiente(
+                nombre,
+                max(disponible - ya_reservado, 0),
+                cantidad,
+            )
+
+        expira_en = timezone.now() + timedelta(minutes=MINUTOS_RESERVA)
+        if reserva:
+            Reserva.objects.filter(id=reserva.id).update(
+                cantidad=F("cantidad") + cantidad,
+                expira_en=expira_en,
+            )
+        else:
+            Reserva.objects.create(
+                clave=clave,
+                producto=producto,
+                talla=talla,
+                cantidad=cantidad,
+                expira_en=expira_en,
+            )
+
+
+def liberar(clave, producto_id=None, talla=None):
+    """
+    Libera las reservas del carrito `clave`; si se indica producto/talla
+    sólo libera esa línea.
+    """
+    reservas = Reserva.objects.filter(clave=clave)
+    if producto_id is not None:
+        reservas = reservas.filter(producto_id=producto_id)
+    if talla is not None:
+        reservas = reservas.filter(talla=talla)
+    reservas.delete()
+
+
+def expirar_reservas(lote=1000):
+    """
+    Borra las reservas vencidas en lotes de `lote` filas, recorriendo el
+    índice de `expira_en` (nunca escanea la tabla completa ni bloquea
+    muchas filas a la vez). Regresa cuántas se borraron.
+    """
+    ahora = timezone.now()
+    borradas = 0
+    while True:
+        ids = list(
+            Reserva.objects.filter(expira_en__lte=ahora)
+                           .order_by("expira_en")
+                           .values_list("id", flat=True)[:lote]
+        )
+        if not ids:
+            return borradas
+        borradas += Reserva.objects.filter(id__in=ids).delete()[0]
+
+
+def _descontar(modelo, cantidades, **campos):
+    """
+    UPDATE condicional con F(): descuenta `cantidades` ({id: cantidad}) y
+    sólo toca filas cuyo stock alcanza. `campos` se actualizan también.
+    Regresa cuántas filas cambió.
+    """
+    condicion = Q()
+    for fila_id, cantidad in cantidades.items():
+        condicion |= Q(id=fila_id, stock__gte=cantidad)
+
+    return modelo.objects.filter(condicion).update(
+        stock=Case(
+            *[
+                When(id=fila_id, then=F("stock") - cantidad)
+                for fila_id, cantidad in cantidades.items()
+            ],
+            default=F("stock"),
+            output_field=PositiveIntegerField(),
+        ),
+        **campos,
+    )
+
+
+def descontar_stock(items, clave=None):
+    """
+    Bloquea los productos del carrito y descuenta su stock y el de sus
+    variantes.
+
+    - Un SELECT ... FOR UPDATE de productos y otro de sus variantes,
+      ordenados por id (todas las transacciones bloquean en el mismo
+      orden, así no hay interbloqueos).
+    - Un UPDATE condicional con F() por tabla: sólo toca filas cuyo stock
+      alcanza, de modo que aunque el motor no soporte FOR UPDATE (SQLite)
+      nunca se vende de más.
+
+    Si el producto tiene variantes la línea se valida contra el stock de
+    su talla (una talla inexistente no tiene stock) y Producto.stock, que
+    es la suma de las variantes, baja lo mismo. Las unidades apartadas
+    por otros carritos (reservas vigentes) no se pueden vender; las del
+    propio carrito `clave` sí.
+
+    Debe llamarse dentro de transaction.atomic(). Regresa un dict
+    {producto_id: Producto} con las filas bloqueadas.
+    """
+    lineas, nombres = _cantidades_por_linea(items)
+    cantidades = OrderedDict()
+    for (producto_id, _), cantidad in lineas.items():
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+    productos = {
+        p.id: p
+        for p in Producto.objects.select_for_update()
+                                 .filter(id__in=cantidades.keys())
+                                 .order_by("id")
+    }
+    variantes = {
+        (v.producto_id, v.talla): v
+        for v in VarianteProducto.objects.select_for_update()
+                                         .filter(producto_id__in=cantidades.keys())
+                                         .order_by("id")
+    }
+    con_variantes = {producto_id for producto_id, _ in variantes}
+
+    reservado_otros = _reservado_por_otros(cantidades.keys(), clave)
+    reservado_producto = {}
+    for (producto_id, _), total in reservado_otros.items():
+        reservado_producto[producto_id] = reservado_producto.get(producto_id, 0) + total
+
+    por_variante = {}
+    for (producto_id, talla), cantidad in lineas.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            raise StockInsuficiente(nombres[producto_id], 0, cantidad)
+        if producto_id not in con_variantes:
+            continue
+        variante = variantes.get((producto_id, talla))
+        disponible = 0
+        if variante is not None:
+            disponible = variante.stock - reservado_otros.get((producto_id, talla), 0)
+        if disponible < cantidad:
+            raise StockInsuficiente(
+                f"{producto.nombre} ({talla})", max(disponible, 0), cantidad
+            )
+        por_variante[variante.id] = cantidad
+
+    for producto_id, cantidad in cantidades.items():
+        producto = productos[producto_id]
+        disponible = producto.stock - reservado_producto.get(producto_id, 0)
+        if disponible < cantidad:
+            raise StockInsuficiente(producto.nombre, max(disponible, 0), cantidad)
+
+    actualizados = _descontar(Producto, cantidades, actualizado_en=Now())
+    if por_variante:
+        actualizados += _descontar(VarianteProducto, por_variante)
+
+    if actualizados != len(cantidades) + len(por_variante):
+        # Otra transacción ganó la carrera entre la lectura y los UPDATE;
+        # la excepción revierte también lo que sí se descontó.
+        stock_actual = dict(
+            Producto.objects.filter(id__in=cantidades.keys())
+                            .values_list("id", "stock")
+        )
+        faltantes = [
+            (producto_id, cantidad)
+            for producto_id, cantidad in cantidades.items()
+            if stock_actual.get(producto_id, 0) < cantidad
+        ] or list(cantidades.items())
+        producto_id, cantidad = faltantes[0]
+        raise StockInsuficiente(
+            productos[producto_id].nombre,
+            stock_actual.get(producto_id, 0),
+            cantidad,
+        )
+
+    return productos
+
+
+def registrar_pedido(pedido, items, clave=None):
+    """
+    Guarda el pedido con sus líneas y descuenta inventario en una sola
+    transacción, con un número fijo de consultas sin importar cuántas
+    líneas tenga el carrito.
+
+    `items` son los dicts del carrito (ver `_obtener_items_carrito`) y
+    `clave` el carrito cuyas reservas se consumen al confirmar.
+    Lanza StockInsuficiente si algún producto no alcanza.
+    """
+    with transaction.atomic():
+        productos = descontar_stock(items, clave)
+        # El stock de las tarjetas del catálogo cambió.
+        invalidar_productos(productos.keys())
+
+        total = Decimal("0")
+        lineas = []
+        for item in items:
+            precio = Decimal(str(item["precio"]))
+            cantidad = int(item["cantidad"])
+            total += precio * cantidad
+            lineas.append(
+                PedidoItem(
+                    producto=productos[int(item["producto_id"])],
+                    talla=item.get("talla", ""),
+                    cantidad=cantidad,
+                    precio_unitario=precio,
+                )
+            )
+
+        pedido.total = total
+        pedido.save()
+
+        for linea in lineas:
+            linea.pedido = pedido
+        PedidoItem.objects.bulk_create(lineas)
+
+        if clave:
+            liberar(clave)
+
+        # El resto (avisos, correos) lo hace un trabajador después del
+        # COMMIT: la respuesta al cliente no lo espera.
+        encolar("pedido_registrado", pedido_id=pedido.id)
+
+    return pedido
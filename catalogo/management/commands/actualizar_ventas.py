@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo.ventas import actualizar
+
+
+class Command(BaseCommand):
+    help = (
+        "Actualiza el resumen diario de ventas (VentaDiaria) recalculando "
+        "sólo los días con pedidos nuevos o cambiados desde la última corrida."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde-cero",
+            action="store_true",
+            help="Recalcula todos los días (p. ej. la primera vez).",
+        )
+        parser.add_argument(
+            "--cada",
+            type=int,
+            default=0,
+            help="Si es mayor a 0, repite la actualización cada N segundos.",
+        )
+
+    def handle(self, *args, **options):
+        desde_cero = options["desde_cero"]
+        while True:
+            dias = actualizar(desde_cero=desde_cero)
+            self.stdout.write(f"Días recalculados: {len(dias)}")
+            desde_cero = False
+
+            if options["cada"] <= 0:
+                return
+            time.sleep(options["cada"])
@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from catalogo.management.commands.bench_embudo import percentil
+from catalogo.models import Producto
+
+
+HOST = "127.0.0.1"
+
+
+class ServidorWSGIConHilos(WSGIServer):
+    """
+    Servidor WSGI con un número fijo de hilos, como un worker gthread de
+    gunicorn: con todos ocupados, las conexiones nuevas esperan turno.
+    """
+
+    def __init__(self, *args, hilos, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.grupo = ThreadPoolExecutor(max_workers=hilos)
+
+    def process_request(self, request, client_address):
+        self.grupo.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+async def _leer_respuesta(lector):
+    """Lee una respuesta HTTP/1.1. Regresa (status, el servidor cierra)."""
+    status = int((await lector.readline()).split()[1])
+    cabeceras = {}
+    while (linea := await lector.readline()) not in (b"\r\n", b""):
+        nombre, _, valor = linea.decode("latin-1").partition(":")
+        cabeceras[nombre.strip().lower()] = valor.strip().lower()
+
+    cierra = cabeceras.get("connection") == "close"
+    if cabeceras.get("transfer-encoding") == "chunked":
+        while tamano := int((await lector.readline()).split(b";")[0], 16):
+            await lector.readexactly(tamano + 2)
+        await lector.readline()
+    elif "content-length" in cabeceras:
+        await lector.readexactly(int(cabeceras["content-length"]))
+    elif status not in (204, 304):
+        await lector.read()
+        cierra = True
+    return status, cierra
+
+
+async def _cliente(puerto, rutas, fin, azar, muestras, errores):
+    conexion = None
+    while time.perf_counter() < fin:
+        ruta = azar.choice(rutas)
+        inicio = time.perf_counter()
+        try:
+            if conexion is None:
+                conexion = await asyncio.open_connection(HOST, puerto)
+            lector, escritor = conexion
+            escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await escritor.drain()
+            status, cierra = await _leer_respuesta(lector)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errores.append(ruta)
+            conexion = None
+            continue
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        if status >= 400:
+            errores.append(ruta)
+        if cierra:
+            conexion[1].close()
+            conexion = None
+    if conexion is not None:
+        conexion[1].close()
+
+
+async def _cliente_lento(puerto, fin):
+    """Manda su petición una cabecera por segundo y nunca la termina."""
+    try:
+        _, escritor = await asyncio.open_connection(HOST, puerto)
+        escritor.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n")
+        while time.perf_counter() < fin:
+            await asyncio.sleep(1)
+            escritor.write(b"X-Lento: 1\r\n")
+            await escritor.drain()
+        escritor.close()
+    except OSError:
+        pass
+
+
+async def _carga(puerto, rutas, clientes, lentos, duracion, semilla):
+    muestras, errores = [], []
+    fin = time.perf_counter() + duracion
+    inicio = time.perf_counter()
+    await asyncio.gather(
+        *(_cliente_lento(puerto, fin) for _ in range(lentos)),
+        *(
+            _cliente(puerto, rutas, fin, random.Random(semilla + n), muestras, errores)
+            for n in range(clientes)
+        ),
+    )
+    return muestras, errores, time.perf_counter() - inicio
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de la app servida por WSGI (servidor con "
+        "hilos fijos, como gunicorn gthread) y por ASGI (uvicorn, un solo "
+        "worker) sobre los mismos datos: levanta cada servidor en local y "
+        "lanza clientes concurrentes contra el catálogo (listado, detalle y "
+        "API). Con --lentos agrega conexiones que mandan su petición muy "
+        "despacio, como clientes móviles lentos. Requiere `uvicorn` para ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servidor", choices=("wsgi", "asgi", "ambos"), default="ambos",
+        )
+        parser.add_argument("--clientes", type=int, default=32)
+        parser.add_argument("--lentos", type=int, default=0,
+                            help="Conexiones lentas que ocupan al servidor.")
+        parser.add_argument("--duracion", type=float, default=10.0,
+                            help="Segundos de carga por servidor.")
+        parser.add_argument("--hilos", type=int, default=8,
+                            help="Hilos del servidor WSGI (default: 8).")
+        parser.add_argument("--puerto", type=int, default=8765)
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--salida", help="Archivo JSON donde guardar el resultado.")
+        # Uso interno: el proceso hijo que corre el servidor.
+        parser.add_argument("--servir", choices=("wsgi", "asgi"), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["servir"]:
+            return self._servir(options["servir"], options["puerto"], options["hilos"])
+
+        servidores = ("wsgi", "asgi") if options["servidor"] == "ambos" else (options["servidor"],)
+        if "asgi" in servidores and find_spec("uvicorn") is None:
+            raise CommandError("Para medir ASGI instala uvicorn (pip install uvicorn).")
+
+        productos_ids = list(
+            Producto.objects.filter(activo=True).values_list("id", flat=True)[:200]
+        )
+        if not productos_ids:
+            raise CommandError("No hay productos; corre `sembrar_datos` primero.")
+        rutas = [reverse("lista_productos"), reverse("api_productos")]
+        for producto_id in productos_ids:
+            rutas += [
+                reverse("detalle_producto", args=[producto_id]),
+                reverse("api_producto", args=[producto_id]),
+            ]
+
+        resultado = {
+            "fecha": timezone.now().isoformat(),
+            "base_de_datos": connection.vendor,
+            "django": django.get_version(),
+            "productos": Producto.objects.count(),
+            "clientes": options["clientes"],
+            "lentos": options["lentos"],
+            "hilos_wsgi": options["hilos"],
+            "servidores": {},
+        }
+        for modo in servidores:
+            resultado["servidores"][modo] = self._medir(modo, rutas, options)
+        self._imprimir(resultado)
+
+        if options["salida"]:
+            with open(options["salida"], "w") as archivo:
+                json.dump(resultado, archivo, indent=2)
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+
+    def _medir(self, modo, rutas, options):
+        proceso = subprocess.Popen(
+            [
+                sys.executable, str(settings.BASE_DIR / "manage.py"), "bench_asgi",
+                "--servir", modo, "--puerto", str(options["puerto"]),
+                "--hilos", str(options["hilos"]),
+            ],
+            env=os.environ.copy(),
+        )
+        try:
+            self._esperar_servidor(options["puerto"], proceso)
+            muestras, errores, duracion = asyncio.run(_carga(
+                options["puerto"], rutas, options["clientes"], options["lentos"],
+                options["duracion"], options["semilla"],
+            ))
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+
+        if not muestras:
+            return {"peticiones": 0, "errores": len(errores)}
+        muestras.sort()
+        return {
+            "peticiones": len(muestras),
+            "errores": len(errores),
+            "peticiones_por_segundo": round(len(muestras) / duracion, 2),
+            "p50_ms": round(percentil(muestras, 50), 2),
+            "p95_ms": round(percentil(muestras, 95), 2),
+            "p99_ms": round(percentil(muestras, 99), 2),
+        }
+
+    def _esperar_servidor(self, puerto, proceso, segundos=30):
+        limite = time.monotonic() + segundos
+        while time.monotonic() < limite:
+            if proceso.poll() is not None:
+                raise CommandError("El servidor terminó antes de empezar.")
+            try:
+                socket.create_connection((HOST, puerto), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f"El servidor no respondió en {segundos} s.")
+
+    def _servir(self, modo, puerto, hilos):
+        if modo == "asgi":
+            import uvicorn
+
+            from tienda.asgi import application
+        else:
+            application = get_wsgi_application()
+        # Después de crear la aplicación: django.setup() reconfigura el logging.
+        logging.getLogger("django.server").setLevel(logging.WARNING)
+        logging.getLogger("tienda.consultas").setLevel(logging.ERROR)
+
+        if modo == "asgi":
+            uvicorn.run(application, host=HOST, port=puerto, log_level="warning")
+            return
+        servidor = ServidorWSGIConHilos((HOST, puerto), WSGIRequestHandler, hilos=hilos)
+        servidor.set_app(application)
+        servidor.serve_forever()
+
+    def _imprimir(self, resultado):
+        self.stdout.write(
+            f"{resultado['base_de_datos']} · {resultado['productos']} productos · "
+            f"{resultado['clientes']} clientes · {resultado['lentos']} lentos · "
+            f"WSGI con {resultado['hilos_wsgi']} hilos"
+        )
+        self.stdout.write(f"{'servidor':<10}{'n':>8}{'err':>6}{'pet/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for modo, datos in resultado["servidores"].items():
+            self.stdout.write(
+                f"{modo:<10}{datos['peticiones']:>8}{datos['errores']:>6}"
+                f"{datos.get('peticiones_por_segundo', 0):>10}{datos.get('p50_ms', '-'):>9}"
+                f"{datos.get('p95_ms', '-'):>9}{datos.get('p99_ms', '-'):>9}"
+            )
@@ -0,0 +1,67 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from catalogo import sintetico
+from catalogo.busqueda import buscar, indexar_productos, usa_fulltext
+from catalogo.models import Producto
+
+
+CONSULTAS = [
+    "sueter", "suéter negro", "playera algodon", "pantalon mezclilla",
+    "hoodie oversize", "camisa formal lino", "gorra", "chamarra azul",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de la búsqueda con catálogos sintéticos. Los "
+        "productos se crean dentro de una transacción que se revierte al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanos", type=int, nargs="+", default=[10_000, 100_000],
+            help="Tamaños de catálogo a medir (default: 10000 100000).",
+        )
+        parser.add_argument("--consultas", type=int, default=200)
+        parser.add_argument("--semilla", type=int, default=1)
+
+    def handle(self, *args, **options):
+        azar = random.Random(options["semilla"])
+        motor = "FULLTEXT" if usa_fulltext() else "índice invertido"
+        self.stdout.write(f"Motor de búsqueda: {motor}")
+
+        for tamano in options["tamanos"]:
+            with transaction.atomic():
+                self._sembrar(tamano, azar)
+                tiempos = self._medir(options["consultas"], azar)
+                transaction.set_rollback(True)
+
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+            self.stdout.write(
+                f"{tamano:>8} productos: "
+                f"p50={statistics.median(tiempos):.2f} ms  "
+                f"p95={p95:.2f} ms  max={tiempos[-1]:.2f} ms"
+            )
+
+    def _sembrar(self, tamano, azar, lote=2000):
+        for inicio in range(0, tamano, lote):
+            productos = Producto.objects.bulk_create(
+                sintetico.productos(azar, min(lote, tamano - inicio), inicio)
+            )
+            if not usa_fulltext():
+                indexar_productos(productos)
+
+    def _medir(self, consultas, azar):
+        tiempos = []
+        for _ in range(consultas):
+            categoria = azar.choice([None, *sintetico.CATEGORIAS])
+            inicio = time.perf_counter()
+            list(buscar(azar.choice(CONSULTAS), categoria)[:24])
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos
@@ -0,0 +1,230 @@
+import json
+import logging
+import platform
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from catalogo.models import Producto
+
+
+PASOS = [
+    "portal_acceso",
+    "lista_productos",
+    "detalle_producto",
+    "agregar_al_carrito",
+    "checkout_pedido",
+    "trackear_pedido",
+]
+
+DATOS_ENVIO = {
+    "nombre_completo": "Cliente Bench",
+    "email": "bench@ejemplo.com",
+    "telefono": "5512345678",
+    "direccion": "Calle 1",
+    "ciudad": "CDMX",
+    "estado": "CDMX",
+    "codigo_postal": "01000",
+    "metodo_pago": "tarjeta",
+}
+
+
+def percentil(valores, p):
+    if len(valores) == 1:
+        return valores[0]
+    return statistics.quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Recorre el embudo de compra (portal → catálogo → detalle → carrito → "
+        "checkout → rastreo) contra la app WSGI con clientes concurrentes y "
+        "reporta latencia p50/p95/p99, throughput y consultas por petición. "
+        "Usar sobre datos de `sembrar_datos`: crea pedidos reales. Con "
+        "SQLite la concurrencia de escritura es limitada y los bloqueos se "
+        "reportan como errores del paso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clientes", type=int, default=8)
+        parser.add_argument("--iteraciones", type=int, default=25,
+                            help="Recorridos del embudo por cliente.")
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument("--salida", help="Archivo JSON donde guardar el resultado.")
+        parser.add_argument("--comparar", help="JSON de una corrida previa para comparar.")
+        parser.add_argument(
+            "--con-limites", action="store_true",
+            help="Aplicar el límite de consultas de seguimiento (por omisión se "
+                 "desactiva para medir la app y no el limitador).",
+        )
+
+    def handle(self, *args, **options):
+        productos_ids = list(
+            Producto.objects.filter(activo=True, stock__gt=100)
+                            .values_list("id", flat=True)[:10_000]
+        )
+        if not productos_ids:
+            raise CommandError("No hay productos con stock; corre `sembrar_datos` primero.")
+
+        # Permite usar el cliente de pruebas (ALLOWED_HOSTS, correo en memoria).
+        setup_test_environment()
+        if not options["con_limites"]:
+            override_settings(CATALOGO_SEGUIMIENTO_LIMITE=None).enable()
+        # Los errores se cuentan por paso; no imprimir cada traceback.
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        logging.getLogger("tienda.consultas").setLevel(logging.ERROR)
+
+        muestras = defaultdict(list)
+        errores = defaultdict(int)
+        candado = threading.Lock()
+
+        def cliente(numero):
+            azar = random.Random(options["semilla"] + numero)
+            # Cada cliente con su propia IP, como visitantes distintos.
+            http = Client(
+                raise_request_exception=False,
+                REMOTE_ADDR=f"10.0.{numero // 250}.{numero % 250 + 1}",
+            )
+            try:
+                for _ in range(options["iteraciones"]):
+                    self._recorrido(http, azar, productos_ids, muestras, errores, candado)
+            finally:
+                connections.close_all()
+
+        inicio = time.perf_counter()
+        hilos = [
+            threading.Thread(target=cliente, args=(n,))
+            for n in range(options["clientes"])
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        resultado = self._resumen(muestras, errores, duracion, options)
+        self._imprimir(resultado)
+
+        if options["comparar"]:
+            with open(options["comparar"]) as archivo:
+                self._comparar(resultado, json.load(archivo))
+        if options["salida"]:
+            with open(options["salida"], "w") as archivo:
+                json.dump(resultado, archivo, indent=2)
+            self.stdout.write(f"Resultado guardado en {options['salida']}")
+
+    def _recorrido(self, http, azar, productos_ids, muestras, errores, candado):
+        producto_id = azar.choice(productos_ids)
+        codigo = None
+
+        for paso in PASOS:
+            if paso == "portal_acceso":
+                peticion = lambda: http.get(reverse("portal_acceso"))
+            elif paso == "lista_productos":
+                peticion = lambda: http.get(reverse("lista_productos"))
+            elif paso == "detalle_producto":
+                peticion = lambda: http.get(reverse("detalle_producto", args=[producto_id]))
+            elif paso == "agregar_al_carrito":
+                peticion = lambda: http.post(
+                    reverse("agregar_al_carrito", args=[producto_id]),
+                    {"talla": "M", "cantidad": 1},
+                )
+            elif paso == "checkout_pedido":
+                peticion = lambda: http.post(reverse("checkout_pedido"), DATOS_ENVIO)
+            else:
+                if not codigo:
+                    return
+                peticion = lambda: http.post(reverse("trackear_pedido"), {"codigo": codigo})
+
+            inicio = time.perf_counter()
+            try:
+                respuesta = peticion()
+            except Exception:
+                with candado:
+                    errores[paso] += 1
+                return
+            milisegundos = (time.perf_counter() - inicio) * 1000
+
+            registro = getattr(respuesta, "metricas_consultas", None)
+            with candado:
+                if respuesta.status_code >= 400:
+                    errores[paso] += 1
+                muestras[paso].append((milisegundos, registro.total if registro else 0))
+
+            if paso == "checkout_pedido" and respuesta.status_code == 302:
+                ubicacion = respuesta["Location"].rstrip("/")
+                if "/confirmacion/" in ubicacion:
+                    codigo = ubicacion.rsplit("/", 1)[-1]
+
+    def _resumen(self, muestras, errores, duracion, options):
+        pasos = {}
+        total_peticiones = 0
+        for paso in PASOS:
+            datos = muestras.get(paso, [])
+            if not datos:
+                continue
+            tiempos = sorted(ms for ms, _ in datos)
+            total_peticiones += len(datos)
+            pasos[paso] = {
+                "peticiones": len(datos),
+                "errores": errores.get(paso, 0),
+                "p50_ms": round(percentil(tiempos, 50), 2),
+                "p95_ms": round(percentil(tiempos, 95), 2),
+                "p99_ms": round(percentil(tiempos, 99), 2),
+                "consultas_promedio": round(statistics.mean(q for _, q in datos), 2),
+            }
+
+        return {
+            "fecha": timezone.now().isoformat(),
+            "base_de_datos": connection.vendor,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "debug": settings.DEBUG,
+            "productos": Producto.objects.count(),
+            "clientes": options["clientes"],
+            "iteraciones": options["iteraciones"],
+            "duracion_s": round(duracion, 2),
+            "peticiones_por_segundo": round(total_peticiones / duracion, 2),
+            "pasos": pasos,
+        }
+
+    def _imprimir(self, resultado):
+        self.stdout.write(
+            f"{resultado['base_de_datos']} · {resultado['productos']} productos · "
+            f"{resultado['clientes']} clientes · "
+            f"{resultado['peticiones_por_segundo']} peticiones/s"
+        )
+        self.stdout.write(
+            f"{'paso':<20}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'consultas':>11}"
+        )
+        for paso, datos in resultado["pasos"].items():
+            self.stdout.write(
+                f"{paso:<20}{datos['peticiones']:>6}{datos['errores']:>5}"
+                f"{datos['p50_ms']:>9}{datos['p95_ms']:>9}{datos['p99_ms']:>9}"
+                f"{datos['consultas_promedio']:>11}"
+            )
+
+    def _comparar(self, actual, previo):
+        self.stdout.write(
+            f"\nComparación contra {previo['base_de_datos']} ({previo['fecha']}):"
+        )
+        for paso, datos in actual["pasos"].items():
+            antes = previo.get("pasos", {}).get(paso)
+            if not antes:
+                continue
+            cambio = (datos["p95_ms"] - antes["p95_ms"]) / antes["p95_ms"] * 100
+            self.stdout.write(
+                f"  {paso:<20} p95 {antes['p95_ms']} → {datos['p95_ms']} ms "
+                f"({cambio:+.1f}%)"
+            )
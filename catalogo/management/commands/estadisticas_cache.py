@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.fragmentos import NOMBRES, estadisticas, reiniciar_estadisticas
+
+
+class Command(BaseCommand):
+    help = "Aciertos, fallos y tasa de acierto de la caché de fragmentos y vistas."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reiniciar", action="store_true",
+            help="Pone los contadores en cero después de mostrarlos.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'fragmento':<16}{'aciertos':>10}{'fallos':>10}{'tasa':>8}")
+        for nombre, (aciertos, fallos) in estadisticas(NOMBRES).items():
+            total = aciertos + fallos
+            tasa = f"{aciertos / total:.0%}" if total else "-"
+            self.stdout.write(f"{nombre:<16}{aciertos:>10}{fallos:>10}{tasa:>8}")
+
+        if options["reiniciar"]:
+            reiniciar_estadisticas(NOMBRES)
+            self.stdout.write("Contadores reiniciados.")
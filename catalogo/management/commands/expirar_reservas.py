@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo.inventario import expirar_reservas
+
+
+class Command(BaseCommand):
+    help = "Borra en lotes las reservas de carrito que ya vencieron."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lote",
+            type=int,
+            default=1000,
+            help="Reservas a borrar por consulta (default: 1000).",
+        )
+        parser.add_argument(
+            "--cada",
+            type=int,
+            default=0,
+            help="Si es mayor a 0, repite el barrido cada N segundos.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            borradas = expirar_reservas(lote=options["lote"])
+            self.stdout.write(f"Reservas vencidas eliminadas: {borradas}")
+
+            if options["cada"] <= 0:
+                return
+            time.sleep(options["cada"])
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.masivo import FORMATOS, filas_exportacion, formato_de, lineas
+from catalogo.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el catálogo a CSV o JSONL (el formato que acepta "
+        "importar_catalogo) leyendo la tabla por bloques."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--salida", default="-",
+            help="Archivo de salida (default: salida estándar).",
+        )
+        parser.add_argument(
+            "--formato", choices=FORMATOS,
+            help="Default: según la extensión de --salida (CSV en la salida estándar).",
+        )
+        parser.add_argument("--solo-activos", action="store_true")
+        parser.add_argument("--bloque", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        salida = options["salida"]
+        formato = options["formato"] or ("csv" if salida == "-" else formato_de(salida))
+        productos = Producto.objects.all()
+        if options["solo_activos"]:
+            productos = productos.filter(activo=True)
+
+        filas = lineas(filas_exportacion(productos, chunk_size=options["bloque"]), formato)
+        if salida == "-":
+            for linea in filas:
+                self.stdout.write(linea, ending="")
+            return
+
+        with open(salida, "w", encoding="utf-8", newline="") as archivo:
+            archivo.writelines(filas)
+        self.stdout.write(self.style.SUCCESS(f"Catálogo exportado a {salida}."))
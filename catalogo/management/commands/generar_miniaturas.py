@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models.functions import Now
+
+from catalogo.fragmentos import invalidar_productos
+from catalogo.imagenes import derivados_vigentes, generar_derivados
+from catalogo.models import Producto
+
+
+def _generar(producto_id, nombre_imagen):
+    try:
+        return producto_id, generar_derivados(nombre_imagen), None
+    except Exception as exc:  # se reporta y se sigue con los demás
+        return producto_id, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera (o regenera) las miniaturas WebP/JPEG de las imágenes de "
+        "producto existentes usando varios procesos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--procesos", type=int, default=None,
+            help="Procesos de trabajo (default: núcleos del equipo).",
+        )
+        parser.add_argument(
+            "--todas", action="store_true",
+            help="Regenera también las que ya están al día.",
+        )
+
+    def handle(self, *args, **options):
+        pendientes = [
+            (producto.id, producto.imagen.name)
+            for producto in Producto.objects.exclude(imagen="")
+                                            .exclude(imagen__isnull=True)
+                                            .only("id", "imagen", "miniaturas")
+                                            .iterator(chunk_size=500)
+            if options["todas"] or not derivados_vigentes(producto)
+        ]
+        self.stdout.write(f"Imágenes por procesar: {len(pendientes)}")
+        if not pendientes:
+            return
+
+        # Los procesos hijos no deben heredar la conexión abierta.
+        connections.close_all()
+
+        listas = errores = 0
+        with ProcessPoolExecutor(max_workers=options["procesos"]) as pool:
+            futuros = [pool.submit(_generar, *pendiente) for pendiente in pendientes]
+            for futuro in as_completed(futuros):
+                producto_id, miniaturas, error = futuro.result()
+                if error:
+                    errores += 1
+                    self.stderr.write(f"Producto {producto_id}: {error}")
+                    continue
+                Producto.objects.filter(id=producto_id).update(miniaturas=miniaturas, actualizado_en=Now())
+                invalidar_productos([producto_id])
+                listas += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Miniaturas generadas: {listas}. Con error: {errores}."
+        ))
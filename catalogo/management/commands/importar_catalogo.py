@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalogo.masivo import FORMATOS, LOTE, formato_de, importar, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde un feed CSV o JSONL (crea por sku nuevo, "
+        "actualiza los existentes) en lotes. Las filas con error se reportan "
+        "y no detienen la importación."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument(
+            "--formato", choices=FORMATOS,
+            help="Default: según la extensión (.jsonl/.ndjson o CSV).",
+        )
+        parser.add_argument("--lote", type=int, default=LOTE)
+        parser.add_argument(
+            "--simular", action="store_true",
+            help="Sólo valida y cuenta; no escribe en la base.",
+        )
+
+    def handle(self, *args, **options):
+        formato = options["formato"] or formato_de(options["archivo"])
+
+        def al_error(numero, mensaje):
+            self.stderr.write(f"Línea {numero}: {mensaje}")
+
+        try:
+            # utf-8-sig: los CSV guardados desde Excel traen BOM.
+            with open(options["archivo"], encoding="utf-8-sig", newline="") as archivo:
+                resultado = importar(
+                    leer_filas(archivo, formato),
+                    lote=options["lote"],
+                    simular=options["simular"],
+                    al_error=al_error,
+                )
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {exc}")
+
+        prefijo = "Simulación: " if options["simular"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resultado.creados} creados, {resultado.actualizados} "
+            f"actualizados, {resultado.errores} con error."
+        ))
+        if resultado.imagenes:
+            self.stdout.write(
+                f"{resultado.imagenes} productos con imagen nueva: corre "
+                "`manage.py generar_miniaturas` para sus miniaturas."
+            )
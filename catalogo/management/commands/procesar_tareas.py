@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from catalogo import cola
+
+
+def _ejecutar(tarea):
+    try:
+        return cola.ejecutar(tarea)
+    finally:
+        # Cada hilo tiene su conexión; se cierra si ya no sirve.
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Trabajador de la cola de tareas (pedidos registrados, avisos): "
+        "reclama tareas de la tabla Tarea y las ejecuta en un grupo de hilos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hilos",
+            type=int,
+            default=4,
+            help="Tareas a ejecutar a la vez (default: 4).",
+        )
+        parser.add_argument(
+            "--espera",
+            type=float,
+            default=1.0,
+            help="Segundos entre consultas cuando no hay tareas (default: 1).",
+        )
+        parser.add_argument(
+            "--una-vez",
+            action="store_true",
+            help="Termina en cuanto no quedan tareas vencidas.",
+        )
+
+    def handle(self, *args, **options):
+        hilos = max(options["hilos"], 1)
+        hechas = fallidas = 0
+        en_curso = set()
+        with ThreadPoolExecutor(max_workers=hilos) as grupo:
+            while True:
+                close_old_connections()
+                nuevas = cola.reclamar(hilos - len(en_curso)) if len(en_curso) < hilos else []
+                en_curso |= {grupo.submit(_ejecutar, tarea) for tarea in nuevas}
+
+                if not en_curso:
+                    if options["una_vez"]:
+                        break
+                    time.sleep(options["espera"])
+                    continue
+
+                # Si llegaron tareas y quedan hilos libres, se vuelve a
+                # reclamar de inmediato; si no, se espera a que acabe alguna.
+                libres = nuevas and len(en_curso) < hilos
+                terminadas, en_curso = wait(
+                    en_curso, timeout=0 if libres else options["espera"], return_when=FIRST_COMPLETED
+                )
+                for futuro in terminadas:
+                    if futuro.result():
+                        hechas += 1
+                    else:
+                        fallidas += 1
+
+        self.stdout.write(f"Tareas terminadas: {hechas}, con error: {fallidas}")
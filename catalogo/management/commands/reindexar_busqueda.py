@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from catalogo.busqueda import reindexar_todo, usa_fulltext
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice invertido de búsqueda del catálogo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if usa_fulltext():
+            self.stdout.write("La base usa FULLTEXT nativo; no hay nada que reindexar.")
+            return
+        reindexar_todo(lote=options["lote"])
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
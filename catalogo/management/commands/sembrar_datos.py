@@ -0,0 +1,104 @@
+import random
+
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from catalogo import sintetico
+from catalogo.busqueda import indexar_productos, usa_fulltext
+from catalogo.models import Pedido, PedidoItem, Producto, VarianteProducto
+
+
+class Command(BaseCommand):
+    help = (
+        "Siembra un catálogo y un historial de pedidos sintéticos para "
+        "benchmarks (de 1k a 1M filas). Inserta por lotes con bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=1_000)
+        parser.add_argument("--pedidos", type=int, default=1_000)
+        parser.add_argument("--usuarios", type=int, default=50)
+        parser.add_argument("--lote", type=int, default=5_000)
+        parser.add_argument("--semilla", type=int, default=1)
+        parser.add_argument(
+            "--stock", type=int, default=100_000,
+            help=(
+                "Stock de cada producto, repartido entre sus tallas (alto para "
+                "que el embudo no se agote)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        azar = random.Random(options["semilla"])
+        lote = options["lote"]
+
+        usuarios_ids = self._usuarios(options["usuarios"])
+        productos_ids = self._productos(azar, options["productos"], options["stock"], lote)
+        self._pedidos(azar, options["pedidos"], productos_ids, usuarios_ids, lote)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {Producto.objects.count()} productos, "
+            f"{Pedido.objects.count()} pedidos, "
+            f"{PedidoItem.objects.count()} líneas."
+        ))
+
+    def _usuarios(self, cantidad):
+        # Todos con la misma contraseña (bench_embudo inicia sesión con ella).
+        clave = make_password("bench-12345")
+        existentes = set(
+            User.objects.filter(username__startswith="bench")
+                        .values_list("username", flat=True)
+        )
+        User.objects.bulk_create([
+            User(username=f"bench{i}", password=clave)
+            for i in range(cantidad)
+            if f"bench{i}" not in existentes
+        ])
+        return list(
+            User.objects.filter(username__startswith="bench")
+                        .values_list("id", flat=True)
+        )
+
+    def _productos(self, azar, cantidad, stock, lote):
+        inicio = Producto.objects.count()
+        for desde in range(0, cantidad, lote):
+            with transaction.atomic():
+                ultimo_id = Producto.objects.aggregate(ultimo=Max("id"))["ultimo"] or 0
+                nuevos = Producto.objects.bulk_create(
+                    sintetico.productos(
+                        azar, min(lote, cantidad - desde), inicio + desde,
+                        stock=(stock, stock),
+                    )
+                )
+                if not usa_fulltext():
+                    # MySQL no regresa ids en bulk_create; ahí no hace falta.
+                    indexar_productos(nuevos)
+                # Los ids se leen de la base por la misma razón.
+                VarianteProducto.objects.bulk_create(sintetico.variantes(
+                    Producto.objects.filter(id__gt=ultimo_id).values_list("id", "stock")
+                ))
+            self.stdout.write(f"  productos: {desde + len(nuevos)}/{cantidad}")
+        return list(Producto.objects.filter(activo=True).values_list("id", flat=True))
+
+    def _pedidos(self, azar, cantidad, productos_ids, usuarios_ids, lote):
+        inicio = Pedido.objects.filter(codigo__startswith="PW-BENCH-").count()
+        for desde in range(0, cantidad, lote):
+            pedidos, items = sintetico.pedidos_con_items(
+                azar, min(lote, cantidad - desde), productos_ids, usuarios_ids,
+                inicio=inicio + desde,
+            )
+            with transaction.atomic(), sintetico.fechas_manuales(
+                Pedido, "creado_en", "actualizado_en"
+            ):
+                Pedido.objects.bulk_create(pedidos)
+                ids = dict(
+                    Pedido.objects.filter(codigo__in=[p.codigo for p in pedidos])
+                                  .values_list("codigo", "id")
+                )
+                for item in items:
+                    item.pedido_id = ids[item._codigo_pedido]
+                PedidoItem.objects.bulk_create(items)
+            self.stdout.write(f"  pedidos: {desde + len(pedidos)}/{cantidad}")
@@ -0,0 +1,387 @@
+"""
+Importación y exportación masiva del catálogo (feeds de proveedores de
+decenas de miles de filas, en CSV o JSONL).
+
+Importar (`importar_catalogo`):
+
+- El archivo se lee fila por fila y se procesa por lotes: la memoria no
+  depende del tamaño del feed.
+- Cada fila se valida con FilaProductoForm. Los errores se reportan por
+  fila (número de línea) y la importación sigue con las demás.
+- La clave es `sku`: si existe se actualiza, si no se crea (hace falta
+  nombre y precio). Con `id` se actualiza ese producto (así se puede
+  reimportar una exportación). Una celda vacía no cambia el campo.
+- Por lote: una consulta para saber qué existe y upserts con
+  bulk_create(update_conflicts=True): uno para los nuevos (por sku) y uno
+  por combinación de columnas para los existentes (por id). `tallas` ("S:5|M:3") reemplaza
+  las variantes del producto y su stock pasa a ser la suma; por eso una
+  fila con `stock` y sin `tallas` de un producto con variantes se rechaza.
+- Nada se descarga: `imagen` es una ruta dentro de MEDIA_ROOT. Las
+  miniaturas se generan después con `generar_miniaturas`.
+- bulk_create/bulk_update no disparan señales: al final de cada lote se
+  invalidan fragmentos, facetas e índice de búsqueda a mano.
+
+Exportar (`exportar_catalogo` y la acción del admin): recorre la tabla con
+.iterator(chunk_size=...) y escribe cada fila en cuanto la lee, en el mismo
+formato que acepta la importación.
+"""
+
+import csv
+import json
+from dataclasses import dataclass
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from .busqueda import indexar_productos, usa_fulltext
+from .facetas import invalidar_categorias, invalidar_tallas
+from .flujo_csv import lineas_csv, respuesta_streaming
+from .forms import FilaProductoForm
+from .fragmentos import invalidar_productos
+from .inventario import sincronizar_stock
+from .models import Producto, VarianteProducto
+
+
+COLUMNAS = (
+    "id", "sku", "nombre", "descripcion", "categoria", "precio", "stock",
+    "activo", "imagen", "tallas",
+)
+# Columnas de Producto que se pueden escribir desde un feed.
+CAMPOS_PRODUCTO = (
+    "sku", "nombre", "descripcion", "categoria", "precio", "stock", "activo", "imagen",
+)
+# Los que cambian el índice de búsqueda.
+CAMPOS_BUSQUEDA = {"nombre", "descripcion", "activo"}
+
+LOTE = 1000
+FORMATOS = ("csv", "jsonl")
+
+
+def formato_de(nombre_archivo):
+    return "jsonl" if nombre_archivo.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+# --- Lectura ---------------------------------------------------------------
+
+def leer_filas(archivo, formato):
+    """
+    Genera (número de línea, dict con las celdas no vacías, error) de un
+    archivo de texto abierto. `error` es un mensaje si la línea no se pudo
+    leer (entonces el dict es None).
+    """
+    if formato == "csv":
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, _sin_vacios(fila), None
+        return
+
+    for numero, linea in enumerate(archivo, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as exc:
+            yield numero, None, f"JSON inválido: {exc}"
+            continue
+        if not isinstance(fila, dict):
+            yield numero, None, "Cada línea debe ser un objeto JSON."
+            continue
+        yield numero, _sin_vacios(fila), None
+
+
+def _sin_vacios(fila):
+    return {
+        columna: valor
+        for columna, valor in fila.items()
+        if columna in COLUMNAS and valor not in (None, "")
+    }
+
+
+# --- Importación -----------------------------------------------------------
+
+@dataclass
+class ResultadoImportacion:
+    creados: int = 0
+    actualizados: int = 0
+    errores: int = 0
+    # Productos con imagen nueva: les faltan miniaturas.
+    imagenes: int = 0
+
+
+@dataclass
+class _Fila:
+    numero: int
+    datos: dict       # sólo las columnas que trae la fila, ya validadas
+    tallas: dict = None
+    producto_id: int = None
+
+    @property
+    def clave(self):
+        return ("id", self.datos["id"]) if self.datos.get("id") else ("sku", self.datos["sku"])
+
+
+def importar(filas, lote=LOTE, simular=False, al_error=None):
+    """
+    Importa las filas de `leer_filas`. `al_error(numero, mensaje)` recibe
+    cada fila rechazada. Con `simular` sólo valida y cuenta (no escribe).
+    Regresa un ResultadoImportacion.
+    """
+    resultado = ResultadoImportacion()
+
+    def error(numero, mensaje):
+        resultado.errores += 1
+        if al_error:
+            al_error(numero, mensaje)
+
+    pendientes = []
+    for numero, datos, problema in filas:
+        if problema:
+            error(numero, problema)
+            continue
+        formulario = FilaProductoForm(datos)
+        if not formulario.is_valid():
+            error(numero, _mensaje_errores(formulario))
+            continue
+        limpios = {campo: formulario.cleaned_data[campo] for campo in datos}
+        pendientes.append(_Fila(numero, limpios, limpios.pop("tallas", None)))
+        if len(pendientes) >= lote:
+            _importar_lote(pendientes, resultado, simular, error)
+            pendientes = []
+    if pendientes:
+        _importar_lote(pendientes, resultado, simular, error)
+
+    if not simular:
+        invalidar_categorias()
+        invalidar_tallas()
+    return resultado
+
+
+def _mensaje_errores(formulario):
+    return "; ".join(
+        f"{campo}: {' '.join(mensajes)}" if campo != "__all__" else " ".join(mensajes)
+        for campo, mensajes in formulario.errors.items()
+    )
+
+
+def _importar_lote(filas, resultado, simular, error):
+    # Si una clave se repite en el lote gana la última fila.
+    filas = list({fila.clave: fila for fila in filas}.values())
+
+    skus = [f.datos["sku"] for f in filas if not f.datos.get("id")]
+    ids = [f.datos["id"] for f in filas if f.datos.get("id")]
+    por_id, por_sku = {}, {}  # {id: (imagen, nombre, precio) actuales}, {sku: id}
+    for producto_id, sku, *actuales in Producto.objects.filter(
+        Q(sku__in=skus) | Q(id__in=ids)
+    ).values_list("id", "sku", "imagen", "nombre", "precio"):
+        por_id[producto_id] = actuales
+        if sku:
+            por_sku[sku] = producto_id
+
+    nuevas, cambios = [], []
+    for fila in filas:
+        tipo, valor = fila.clave
+        fila.producto_id = valor if tipo == "id" else por_sku.get(valor)
+        if fila.producto_id is None:
+            faltan = [c for c in ("nombre", "precio") if c not in fila.datos]
+            if faltan:
+                error(fila.numero, f"El sku {valor} no existe; para crearlo faltan: {', '.join(faltan)}.")
+                continue
+            nuevas.append(fila)
+        elif fila.producto_id not in por_id:
+            error(fila.numero, f"No existe el producto con id {valor}.")
+        else:
+            cambios.append(fila)
+
+    # El stock de un producto con variantes es la suma de sus tallas: sólo
+    # se cambia con la columna tallas (si no, Producto.stock y las
+    # variantes dejarían de cuadrar).
+    solo_stock = [f.producto_id for f in cambios if "stock" in f.datos and f.tallas is None]
+    if solo_stock:
+        con_variantes = set(
+            VarianteProducto.objects.filter(producto_id__in=solo_stock)
+                                    .values_list("producto_id", flat=True)
+        )
+        rechazadas = [
+            f for f in cambios
+            if f.producto_id in con_variantes and "stock" in f.datos and f.tallas is None
+        ]
+        for fila in rechazadas:
+            error(fila.numero, "El producto tiene tallas: su stock se cambia con la columna tallas.")
+        cambios = [f for f in cambios if f not in rechazadas]
+
+    if simular:
+        resultado.creados += len(nuevas)
+        resultado.actualizados += len(cambios)
+        return
+
+    try:
+        _escribir(nuevas, cambios, por_id, resultado)
+    except IntegrityError as exc:
+        if len(nuevas) + len(cambios) == 1:
+            error((nuevas or cambios)[0].numero, f"La base rechazó la fila: {exc}")
+            return
+        # Una fila choca con otra (p. ej. un sku repetido entre productos):
+        # se reintenta fila por fila para reportar sólo las que fallan.
+        for fila in nuevas + cambios:
+            _importar_lote([fila], resultado, simular, error)
+
+
+def _escribir(nuevas, cambios, actuales, resultado):
+    ahora = timezone.now()
+    with transaction.atomic():
+        if nuevas:
+            # Sólo se actualizan (si otra importación creó el sku mientras
+            # tanto) las columnas que traen todas las filas nuevas.
+            comunes = set.intersection(*(set(f.datos) for f in nuevas)) - {"sku"}
+            Producto.objects.bulk_create(
+                [Producto(**_campos(f.datos), actualizado_en=ahora) for f in nuevas],
+                update_conflicts=True,
+                unique_fields=_unicos(["sku"]),
+                update_fields=sorted(comunes & set(CAMPOS_PRODUCTO)) + ["actualizado_en"],
+            )
+            # MySQL no regresa los ids de bulk_create: se leen por sku.
+            creados = dict(
+                Producto.objects.filter(sku__in=[f.datos["sku"] for f in nuevas])
+                                .values_list("sku", "id")
+            )
+            for fila in nuevas:
+                fila.producto_id = creados[fila.datos["sku"]]
+
+        # Los existentes también con upsert (por id): bulk_update arma un
+        # CASE WHEN por columna y con miles de filas tarda 10 veces más. La
+        # parte INSERT no se usa (el producto existe); lleva nombre y precio
+        # actuales sólo para cumplir NOT NULL. Cada upsert escribe las
+        # mismas columnas en todas sus filas: se agrupan por columnas.
+        grupos = {}
+        for fila in cambios:
+            grupos.setdefault(frozenset(_campos(fila.datos)), []).append(fila)
+        for campos, grupo in grupos.items():
+            if not campos:
+                continue
+            Producto.objects.bulk_create(
+                [
+                    Producto(
+                        id=f.producto_id,
+                        **{
+                            "nombre": actuales[f.producto_id][1],
+                            "precio": actuales[f.producto_id][2],
+                            **_campos(f.datos),
+                        },
+                        actualizado_en=ahora,
+                    )
+                    for f in grupo
+                ],
+                update_conflicts=True,
+                unique_fields=_unicos(["id"]),
+                update_fields=sorted(campos) + ["actualizado_en"],
+            )
+
+        con_tallas = [f for f in nuevas + cambios if f.tallas is not None]
+        if con_tallas:
+            _reemplazar_variantes(con_tallas)
+
+    resultado.creados += len(nuevas)
+    resultado.actualizados += len(cambios)
+    resultado.imagenes += sum(
+        1 for f in nuevas + cambios
+        if f.datos.get("imagen") and f.datos["imagen"] != actuales.get(f.producto_id, [None])[0]
+    )
+
+    invalidar_productos([f.producto_id for f in nuevas + cambios])
+    if not usa_fulltext():
+        indexar = [f.producto_id for f in nuevas] + [
+            f.producto_id for f in cambios if CAMPOS_BUSQUEDA & set(f.datos)
+        ]
+        if indexar:
+            indexar_productos(
+                Producto.objects.filter(id__in=indexar).only("id", "nombre", "descripcion", "activo")
+            )
+
+
+def _unicos(campos):
+    # MySQL no acepta indicar la restricción del upsert (ON DUPLICATE KEY
+    # UPDATE usa cualquier índice único).
+    return campos if connection.features.supports_update_conflicts_with_target else None
+
+
+def _campos(datos):
+    return {campo: valor for campo, valor in datos.items() if campo in CAMPOS_PRODUCTO}
+
+
+def _reemplazar_variantes(filas):
+    """Las tallas de cada fila pasan a ser exactamente las variantes del producto."""
+    tallas = {f.producto_id: f.tallas for f in filas}
+    sobrantes = [
+        variante_id
+        for variante_id, producto_id, talla in VarianteProducto.objects.filter(
+            producto_id__in=tallas
+        ).values_list("id", "producto_id", "talla")
+        if talla not in tallas[producto_id]
+    ]
+    if sobrantes:
+        VarianteProducto.objects.filter(id__in=sobrantes).delete()
+    VarianteProducto.objects.bulk_create(
+        [
+            VarianteProducto(producto_id=producto_id, talla=talla, stock=stock)
+            for producto_id, por_talla in tallas.items()
+            for talla, stock in por_talla.items()
+        ],
+        update_conflicts=True,
+        unique_fields=_unicos(["producto", "talla"]),
+        update_fields=["stock"],
+    )
+    sincronizar_stock(list(tallas))
+
+
+# --- Exportación -----------------------------------------------------------
+
+def filas_exportacion(productos, chunk_size=2000):
+    """
+    Genera un dict por producto (columnas de COLUMNAS) recorriendo
+    `productos` por bloques de `chunk_size`, con sus tallas precargadas
+    por bloque.
+    """
+    productos = (
+        productos.order_by("id")
+                 .only(*(c for c in COLUMNAS if c != "tallas"))
+                 .prefetch_related(Prefetch(
+                     "variantes",
+                     queryset=VarianteProducto.objects.only("id", "producto_id", "talla", "stock"),
+                 ))
+    )
+    for producto in productos.iterator(chunk_size=chunk_size):
+        yield {
+            "id": producto.id,
+            "sku": producto.sku or "",
+            "nombre": producto.nombre,
+            "descripcion": producto.descripcion,
+            "categoria": producto.categoria,
+            "precio": str(producto.precio),
+            "stock": producto.stock,
+            "activo": producto.activo,
+            "imagen": producto.imagen.name if producto.imagen else "",
+            "tallas": {v.talla: v.stock for v in producto.variantes.all()},
+        }
+
+
+def lineas(filas, formato):
+    """Genera el texto del archivo exportado línea por línea."""
+    if formato == "jsonl":
+        return (json.dumps(fila, ensure_ascii=False) + "\n" for fila in filas)
+    return lineas_csv(COLUMNAS, (_celdas_csv(fila) for fila in filas))
+
+
+def _celdas_csv(fila):
+    fila["activo"] = "true" if fila["activo"] else "false"
+    fila["tallas"] = "|".join(f"{talla}:{stock}" for talla, stock in fila["tallas"].items())
+    return [fila[columna] for columna in COLUMNAS]
+
+
+def respuesta_exportacion(productos, formato="csv"):
+    """StreamingHttpResponse con la exportación de `productos`."""
+    return respuesta_streaming(
+        lineas(filas_exportacion(productos), formato),
+        f"catalogo-{timezone.localdate():%Y%m%d}.{formato}",
+        "application/x-ndjson" if formato == "jsonl" else "text/csv",
+    )
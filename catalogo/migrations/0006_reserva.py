@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_pedido_codigo_alter_producto_tallas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=40)),
+                ('talla', models.CharField(blank=True, max_length=10)),
+                ('cantidad', models.PositiveIntegerField(default=1)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='catalogo.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'expira_en'], name='reserva_producto_expira_idx'), models.Index(fields=['expira_en'], name='reserva_expira_idx')],
+                'constraints': [models.UniqueConstraint(fields=('clave', 'producto', 'talla'), name='reserva_unica_por_carrito')],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:11
+
+import re
+import unicodedata
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia del tokenizador de catalogo.busqueda al momento de esta
+# migración: la migración no depende del código vivo de la app.
+PALABRAS_VACIAS = {
+    "a", "al", "con", "de", "del", "el", "en", "la", "las", "lo", "los",
+    "para", "por", "un", "una", "y",
+}
+PESO_NOMBRE = 3
+PESO_DESCRIPCION = 1
+_PALABRA = re.compile(r"\w+")
+
+
+def tokenizar(texto):
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    normalizado = "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+    return [
+        palabra[:64]
+        for palabra in _PALABRA.findall(normalizado)
+        if palabra not in PALABRAS_VACIAS
+    ]
+
+
+def terminos_de(nombre, descripcion):
+    pesos = Counter()
+    for termino in tokenizar(nombre):
+        pesos[termino] += PESO_NOMBRE
+    for termino in tokenizar(descripcion):
+        pesos[termino] += PESO_DESCRIPCION
+    return pesos
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    """
+    MySQL: índice FULLTEXT nativo sobre nombre y descripción.
+    Otros motores: llena el índice invertido con el catálogo existente.
+    """
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX producto_fulltext_idx "
+            "ON catalogo_producto (nombre, descripcion)"
+        )
+        return
+
+    bd = schema_editor.connection.alias
+    Producto = apps.get_model("catalogo", "Producto")
+    TerminoProducto = apps.get_model("catalogo", "TerminoProducto")
+    TerminoProducto.objects.using(bd).bulk_create(
+        [
+            TerminoProducto(termino=termino, producto_id=p.id, peso=min(peso, 32767))
+            for p in Producto.objects.using(bd).filter(activo=True).iterator()
+            for termino, peso in terminos_de(p.nombre, p.descripcion).items()
+        ],
+        batch_size=1000,
+    )
+
+
+def quitar_indice_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX producto_fulltext_idx ON catalogo_producto"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0008_carrito_carritoitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=64)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='catalogo.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('termino', 'producto'), name='termino_producto_unico')],
+            },
+        ),
+        migrations.RunPython(crear_indice_busqueda, quitar_indice_busqueda),
+    ]
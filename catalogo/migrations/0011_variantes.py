@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def repartir_stock(total, tallas):
+    """
+    Copia de catalogo.inventario.repartir_stock al momento de esta
+    migración: la migración no depende del código vivo de la app.
+    """
+    base, sobrante = divmod(total, len(tallas))
+    return {talla: base + (1 if i < sobrante else 0) for i, talla in enumerate(tallas)}
+
+
+def crear_variantes(apps, schema_editor):
+    """
+    Una variante por cada talla del texto `tallas` ("S, M,L" -> S, M, L).
+    El stock, que era uno solo para todas las tallas, se reparte entre
+    ellas para que la suma siga siendo la misma.
+    """
+    bd = schema_editor.connection.alias
+    Producto = apps.get_model("catalogo", "Producto")
+    VarianteProducto = apps.get_model("catalogo", "VarianteProducto")
+
+    variantes = []
+    for producto in Producto.objects.using(bd).exclude(tallas="").only("id", "stock", "tallas").iterator():
+        tallas = list(dict.fromkeys(
+            t.strip()[:20] for t in producto.tallas.split(",") if t.strip()
+        ))
+        if not tallas:
+            continue
+        variantes.extend(
+            VarianteProducto(producto_id=producto.id, talla=talla, stock=piezas)
+            for talla, piezas in repartir_stock(producto.stock, tallas).items()
+        )
+    VarianteProducto.objects.using(bd).bulk_create(variantes, batch_size=1000)
+
+
+def restaurar_tallas(apps, schema_editor):
+    bd = schema_editor.connection.alias
+    Producto = apps.get_model("catalogo", "Producto")
+    VarianteProducto = apps.get_model("catalogo", "VarianteProducto")
+
+    tallas = {}
+    for producto_id, talla in VarianteProducto.objects.using(bd).order_by("id").values_list("producto_id", "talla"):
+        tallas.setdefault(producto_id, []).append(talla)
+    for producto_id, lista in tallas.items():
+        Producto.objects.using(bd).filter(id=producto_id).update(tallas=",".join(lista)[:150])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0010_producto_miniaturas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VarianteProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('talla', models.CharField(max_length=20)),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('sku', models.CharField(blank=True, max_length=40, null=True, unique=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variantes', to='catalogo.producto')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['talla', 'stock', 'producto'], name='variante_talla_stock_idx')],
+                'constraints': [models.UniqueConstraint(fields=('producto', 'talla'), name='variante_talla_unica')],
+            },
+        ),
+        migrations.RunPython(crear_variantes, restaurar_tallas),
+        migrations.RemoveField(
+            model_name='producto',
+            name='tallas',
+        ),
+    ]
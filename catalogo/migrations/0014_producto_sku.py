@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0013_producto_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='sku',
+            field=models.CharField(blank=True, max_length=40, null=True, unique=True),
+        ),
+    ]
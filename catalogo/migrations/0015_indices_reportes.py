@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0014_producto_sku'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['creado_en', 'estado_pedido', 'metodo_pago', 'total'], name='pedido_reporte_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidoitem',
+            index=models.Index(fields=['pedido', 'producto', 'cantidad', 'precio_unitario'], name='pedidoitem_reporte_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0015_indices_reportes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaProceso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('hasta', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('talla', models.CharField(blank=True, max_length=10)),
+                ('piezas', models.PositiveIntegerField(default=0)),
+                ('importe', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'venta diaria',
+                'verbose_name_plural': 'ventas diarias',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['actualizado_en'], name='pedido_actualizado_idx'),
+        ),
+        migrations.AddField(
+            model_name='ventadiaria',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ventas_diarias', to='catalogo.producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiaria',
+            constraint=models.UniqueConstraint(fields=('dia', 'producto', 'talla'), name='venta_diaria_unica'),
+        ),
+    ]
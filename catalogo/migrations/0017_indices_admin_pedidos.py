@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0016_venta_diaria'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado_pedido', '-creado_en'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['metodo_pago', '-creado_en'], name='pedido_pago_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0018_tarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvisoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente de pago'), ('procesando', 'Preparando pedido'), ('enviado', 'Enviado'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=20)),
+                ('lote', models.CharField(blank=True, max_length=32)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avisos', to='catalogo.pedido')),
+            ],
+            options={
+                'verbose_name': 'aviso de pedido',
+                'verbose_name_plural': 'avisos de pedido',
+                'indexes': [models.Index(fields=['enviado_en', 'lote'], name='aviso_pendiente_idx')],
+                'constraints': [models.UniqueConstraint(fields=('pedido', 'estado'), name='aviso_pedido_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0019_aviso_pedido'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carritoitem',
+            name='talla',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='pedidoitem',
+            name='talla',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='reserva',
+            name='talla',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='ventadiaria',
+            name='talla',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
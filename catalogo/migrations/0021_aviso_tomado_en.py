@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0020_talla_mismo_largo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avisopedido',
+            name='tomado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,7 +1,14 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-import uuid
+
+from .codigos import codigo_pedido
+from .imagenes import srcset, url_derivado
+
+
+# Largo máximo de una talla, igual en la variante y en todo lo que la
+# copia (carrito, reservas, pedidos, resumen de ventas).
+MAX_TALLA = 20
 
 
 class Producto(models.Model):
@@ -16,6 +23,9 @@ class Producto(models.Model):
     nombre = models.CharField(max_length=150)
     descripcion = models.TextField(blank=True)
 
+    # Clave del producto en los feeds de proveedores (importar_catalogo).
+    sku = models.CharField(max_length=40, unique=True, null=True, blank=True)
+
     categoria = models.CharField(
         max_length=50,
         choices=CATEGORIAS_CHOICES,
@@ -23,6 +33,8 @@ class Producto(models.Model):
     )
 
     precio = models.DecimalField(max_digits=10, decimal_places=2)
+    # Si el producto tiene variantes es la suma de su stock por talla
+    # (ver inventario.sincronizar_stock); si no, es el stock del producto.
     stock = models.PositiveIntegerField(default=0)
 
     imagen = models.ImageField(
@@ -31,17 +43,115 @@ class Producto(models.Model):
         null=True,
     )
 
-    tallas = models.CharField(
-        max_length=150,
-        blank=True,
-        help_text="Escribe tallas separadas por coma. Ejemplo: S,M,L,XL o 30,32,34"
-    )
+    # Miniaturas generadas por catalogo.imagenes (ver generar_derivados).
+    miniaturas = models.JSONField(default=dict, blank=True, editable=False)
 
     activo = models.BooleanField(default=True)
 
+    # Lo usan las respuestas condicionales (ETag / 304) del catálogo. Los
+    # UPDATE que cambian lo que se muestra del producto lo ponen a mano.
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Paginación por cursor del catálogo: filtro + orden (nombre, id)
+            # resueltos con un rango del índice.
+            models.Index(
+                fields=["activo", "categoria", "nombre", "id"],
+                name="producto_catalogo_idx",
+            ),
+            models.Index(
+                fields=["activo", "nombre", "id"],
+                name="producto_activo_nombre_idx",
+            ),
+            # Último cambio del catálogo (MAX) sin recorrer la tabla.
+            models.Index(
+                fields=["activo", "actualizado_en"],
+                name="producto_activo_cambio_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.nombre
 
+    @property
+    def url_tarjeta(self):
+        return url_derivado(self, "tarjeta")
+
+    @property
+    def url_detalle(self):
+        return url_derivado(self, "detalle")
+
+    @property
+    def url_linea(self):
+        return url_derivado(self, "linea")
+
+    def srcset(self, uso, formato="jpeg"):
+        return srcset(self, uso, formato)
+
+
+class VarianteProducto(models.Model):
+    """
+    Una talla de un producto con su propio stock. Los productos sin
+    variantes (accesorios de talla única) siguen usando Producto.stock.
+    """
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="variantes",
+    )
+    talla = models.CharField(max_length=MAX_TALLA)
+    stock = models.PositiveIntegerField(default=0)
+    sku = models.CharField(max_length=40, unique=True, null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["producto", "talla"],
+                name="variante_talla_unica",
+            ),
+        ]
+        indexes = [
+            # Filtro del catálogo "tiene talla M en existencia".
+            models.Index(
+                fields=["talla", "stock", "producto"],
+                name="variante_talla_stock_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} · {self.talla}"
+
+
+class TerminoProducto(models.Model):
+    """
+    Índice invertido para la búsqueda del catálogo cuando la base no tiene
+    FULLTEXT (SQLite en desarrollo y pruebas). Cada fila dice que `termino`
+    (normalizado, sin acentos) aparece en `producto` con cierto `peso`.
+    Lo mantiene catalogo.busqueda a partir de las señales de Producto.
+    """
+
+    termino = models.CharField(max_length=64)
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="terminos",
+    )
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["termino", "producto"],
+                name="termino_producto_unico",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} → {self.producto_id}"
+
 
 class Pedido(models.Model):
     METODO_PAGO_CHOICES = [
@@ -58,6 +168,16 @@ class Pedido(models.Model):
         ("cancelado", "Cancelado"),
     ]
 
+    # Estados a los que se puede pasar desde cada estado (ver
+    # estados.cambiar_estado). Entregado y cancelado son finales.
+    TRANSICIONES = {
+        "pendiente": ("procesando", "cancelado"),
+        "procesando": ("enviado", "cancelado"),
+        "enviado": ("entregado",),
+        "entregado": (),
+        "cancelado": (),
+    }
+
     codigo = models.CharField(
         max_length=25,
         unique=True,
@@ -102,17 +222,52 @@ class Pedido(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Historial de mis_pedidos: filtro por usuario y orden por fecha
+            # resueltos con el índice, sin ordenar en memoria.
+            models.Index(
+                fields=["usuario", "-creado_en"],
+                name="pedido_usuario_fecha_idx",
+            ),
+            # Reportes por rango de fechas (catalogo.reportes): agrupan por
+            # estado / método de pago y suman el total sin leer la tabla.
+            models.Index(
+                fields=["creado_en", "estado_pedido", "metodo_pago", "total"],
+                name="pedido_reporte_idx",
+            ),
+            # Pedidos cambiados desde la última corrida de actualizar_ventas.
+            models.Index(fields=["actualizado_en"], name="pedido_actualizado_idx"),
+            # Filtros del admin de pedidos, con el orden del listado.
+            models.Index(
+                fields=["estado_pedido", "-creado_en"],
+                name="pedido_estado_fecha_idx",
+            ),
+            models.Index(
+                fields=["metodo_pago", "-creado_en"],
+                name="pedido_pago_fecha_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Pedido {self.codigo or self.id}"
 
-    def save(self, *args, **kwargs):
-        if not self.codigo:
-            fecha = timezone.now().strftime("%Y%m%d")
-            sufijo = uuid.uuid4().hex[:4].upper()
-            self.codigo = f"PW-{fecha}-{sufijo}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        pedido = super().from_db(db, field_names, values)
+        # Para saber en post_save si cambió el estado (avisos al cliente).
+        pedido._estado_guardado = pedido.__dict__.get("estado_pedido")
+        return pedido
 
+    def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
 
+        if not self.codigo:
+            # El código sale del id (ver catalogo.codigos), así que no
+            # puede chocar con el de otro pedido y no hace falta reintentar.
+            self.codigo = codigo_pedido(self.id, self.creado_en)
+            Pedido.objects.filter(pk=self.pk).update(codigo=self.codigo)
+
 
 class PedidoItem(models.Model):
     pedido = models.ForeignKey(
@@ -122,12 +277,223 @@ class PedidoItem(models.Model):
     )
     producto = models.ForeignKey(Producto, on_delete=models.PROTECT)
 
-    talla = models.CharField(max_length=10, blank=True)
+    talla = models.CharField(max_length=MAX_TALLA, blank=True)
     cantidad = models.PositiveIntegerField(default=1)
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Ventas por categoría: las líneas de los pedidos del rango con
+            # producto, cantidad y precio desde el índice.
+            models.Index(
+                fields=["pedido", "producto", "cantidad", "precio_unitario"],
+                name="pedidoitem_reporte_idx",
+            ),
+        ]
+
     def subtotal(self):
         return self.cantidad * self.precio_unitario
 
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
+
+
+class AvisoPedido(models.Model):
+    """
+    Correo al cliente por un estado de su pedido (ver catalogo.avisos).
+    Hay uno por (pedido, estado): pedirlo otra vez (reintentos, el mismo
+    cambio guardado dos veces) no manda otro correo.
+    """
+
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        related_name="avisos",
+    )
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADO_CHOICES)
+    # Marca del envío que lo tomó (y cuándo); vacía mientras nadie lo
+    # envía. Un lote tomado hace más de avisos.PLAZO se vuelve a tomar.
+    lote = models.CharField(max_length=32, blank=True)
+    tomado_en = models.DateTimeField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "aviso de pedido"
+        verbose_name_plural = "avisos de pedido"
+        constraints = [
+            models.UniqueConstraint(fields=["pedido", "estado"], name="aviso_pedido_unico"),
+        ]
+        indexes = [
+            # Avisos por enviar (enviado_en vacío) y los de cada lote.
+            models.Index(fields=["enviado_en", "lote"], name="aviso_pendiente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pedido_id} · {self.estado}"
+
+
+class Carrito(models.Model):
+    """
+    Carrito de compras persistido en la base. La sesión sólo guarda `clave`;
+    las líneas, precios e imágenes se leen de la base al mostrarlo.
+    """
+
+    clave = models.CharField(max_length=40, unique=True)
+    usuario = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="carritos",
+    )
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Carrito {self.clave}"
+
+
+class CarritoItem(models.Model):
+    carrito = models.ForeignKey(
+        Carrito,
+        on_delete=models.CASCADE,
+        related_name="items",
+    )
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+
+    talla = models.CharField(max_length=MAX_TALLA, blank=True)
+    cantidad = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["carrito", "producto", "talla"],
+                name="carrito_item_unico",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto} x {self.cantidad}"
+
+
+class Reserva(models.Model):
+    """
+    Apartado temporal de unidades mientras el producto está en un carrito.
+    `clave` identifica el carrito (se guarda en la sesión y sobrevive al
+    login). Las reservas vencidas se ignoran al calcular disponibilidad y se
+    borran con `manage.py expirar_reservas`.
+    """
+
+    clave = models.CharField(max_length=40)
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="reservas",
+    )
+    talla = models.CharField(max_length=MAX_TALLA, blank=True)
+    cantidad = models.PositiveIntegerField(default=1)
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["clave", "producto", "talla"],
+                name="reserva_unica_por_carrito",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["producto", "expira_en"],
+                name="reserva_producto_expira_idx",
+            ),
+            models.Index(fields=["expira_en"], name="reserva_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.producto} x {self.cantidad} ({self.clave})"
+
+
+class VentaDiaria(models.Model):
+    """
+    Resumen de ventas por día (local), producto y talla: piezas e importe
+    de las líneas de pedidos no cancelados. Lo llena catalogo.ventas
+    recalculando días completos; los reportes lo leen en vez de recorrer
+    PedidoItem.
+    """
+
+    dia = models.DateField()
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name="ventas_diarias",
+    )
+    talla = models.CharField(max_length=MAX_TALLA, blank=True)
+    piezas = models.PositiveIntegerField(default=0)
+    importe = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "venta diaria"
+        verbose_name_plural = "ventas diarias"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "producto", "talla"],
+                name="venta_diaria_unica",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} · {self.producto_id} · {self.talla or '-'}"
+
+
+class MarcaProceso(models.Model):
+    """
+    Hasta dónde llegó un proceso incremental (p. ej. "ventas_diarias"): la
+    siguiente corrida sólo procesa lo que cambió después de `hasta`.
+    """
+
+    nombre = models.CharField(max_length=50, unique=True)
+    hasta = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre}: {self.hasta:%Y-%m-%d %H:%M}"
+
+
+class Tarea(models.Model):
+    """
+    Trabajo pendiente de la cola en base de datos (ver catalogo.cola): el
+    nombre de una función registrada y sus argumentos. Las que terminan
+    bien se borran; las que agotan sus intentos quedan como fallidas.
+    """
+
+    PENDIENTE = "pendiente"
+    FALLIDA = "fallida"
+    ESTADO_CHOICES = [
+        (PENDIENTE, "Pendiente"),
+        (FALLIDA, "Fallida"),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default=PENDIENTE)
+    # Cuándo puede tomarla un trabajador. Al reclamarla se corre al fin del
+    # plazo: si el trabajador muere, vuelve a estar disponible entonces.
+    ejecutar_en = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    # Marca del trabajador que la tiene tomada.
+    reclamo = models.CharField(max_length=32, blank=True, db_index=True)
+    error = models.TextField(blank=True)
+    creada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Siguientes tareas a reclamar.
+            models.Index(fields=["estado", "ejecutar_en"], name="tarea_siguiente_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.pk} ({self.estado})"
@@ -0,0 +1,126 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(valores):
+    crudo = json.dumps(valores, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor, campo=None):
+    """
+    [valor, id] del cursor. El id tiene que ser entero y el valor un
+    escalar que `campo` (el Field del orden, si se da) acepte; si no,
+    CursorInvalido: un cursor alterado no debe llegar al filtro.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as exc:
+        raise CursorInvalido(cursor) from exc
+    if not isinstance(valores, list) or len(valores) != 2:
+        raise CursorInvalido(cursor)
+
+    valor, ultimo_id = valores
+    if type(ultimo_id) is not int or not isinstance(valor, (str, int, float)) or isinstance(valor, bool):
+        raise CursorInvalido(cursor)
+    if campo is not None:
+        try:
+            valor = campo.to_python(valor)
+        except ValidationError as exc:
+            raise CursorInvalido(cursor) from exc
+    return [valor, ultimo_id]
+
+
+class PaginaCursor:
+    """
+    Una página de resultados paginados por cursor (keyset).
+
+    - `items`: objetos de la página.
+    - `siguiente` / `anterior`: cursores opacos para los enlaces, o None.
+    """
+
+    def __init__(self, items, siguiente=None, anterior=None):
+        self.items = items
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _valor(fila, campo):
+    # Instancias o dicts (consultas con values()).
+    return fila[campo] if isinstance(fila, dict) else getattr(fila, campo)
+
+
+def consulta_pagina(queryset, campo, tamano, despues=None, antes=None):
+    """
+    La consulta de una página: `tamano` + 1 filas (la de más dice si hay
+    otra página). Para quien la recorre por su cuenta, p. ej. en streaming.
+    """
+    campo_orden = queryset.model._meta.get_field(campo)
+    if antes:
+        valor, ultimo_id = decodificar_cursor(antes, campo_orden)
+        return queryset.filter(
+            Q(**{f"{campo}__lt": valor})
+            | Q(**{campo: valor, "id__lt": ultimo_id})
+        ).order_by(f"-{campo}", "-id")[:tamano + 1]
+    if despues:
+        valor, ultimo_id = decodificar_cursor(despues, campo_orden)
+        queryset = queryset.filter(
+            Q(**{f"{campo}__gt": valor})
+            | Q(**{campo: valor, "id__gt": ultimo_id})
+        )
+    return queryset.order_by(campo, "id")[:tamano + 1]
+
+
+def _armar_pagina(filas, campo, tamano, despues, antes):
+    hay_mas = len(filas) > tamano
+    if antes:
+        items = list(reversed(filas[:tamano]))
+        hay_anterior, hay_siguiente = hay_mas, True
+    else:
+        items = filas[:tamano]
+        hay_anterior, hay_siguiente = bool(despues), hay_mas
+
+    siguiente = anterior = None
+    if items and hay_siguiente:
+        siguiente = codificar_cursor([_valor(items[-1], campo), _valor(items[-1], "id")])
+    if items and hay_anterior:
+        anterior = codificar_cursor([_valor(items[0], campo), _valor(items[0], "id")])
+
+    return PaginaCursor(items, siguiente=siguiente, anterior=anterior)
+
+
+def paginar_por_cursor(queryset, campo, tamano, despues=None, antes=None):
+    """
+    Pagina `queryset` por la llave compuesta (campo, id).
+
+    En vez de OFFSET (que obliga a la base a recorrer y descartar todas
+    las filas previas), cada página es un rango del índice que empieza
+    justo después (o antes) del último registro visto, así el costo es el
+    mismo en la página 1 que en la 1000.
+
+    `despues` y `antes` son cursores generados por una página previa;
+    lanza CursorInvalido si no se pueden leer. `queryset` puede ser de
+    instancias o de values() (que incluya `campo` e "id").
+    """
+    filas = list(consulta_pagina(queryset, campo, tamano, despues, antes))
+    return _armar_pagina(filas, campo, tamano, despues, antes)
+
+
+async def apaginar_por_cursor(queryset, campo, tamano, despues=None, antes=None):
+    """`paginar_por_cursor` para vistas async (ORM async)."""
+    filas = [fila async for fila in consulta_pagina(queryset, campo, tamano, despues, antes)]
+    return _armar_pagina(filas, campo, tamano, despues, antes)
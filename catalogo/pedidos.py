@@ -0,0 +1,93 @@
+"""
+Totales de pedidos calculados por la base, con Decimal exacto.
+
+Lo usan mis_pedidos (una sola consulta con conteo y total por pedido) y
+detalle_pedido / pedido_confirmacion (líneas con su importe ya calculado
+en SQL), en vez de sumar floats en Python. Esas dos páginas revisan antes
+`version_pedido` para responder 304 sin leer las líneas.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Pedido
+
+
+CENTAVOS = Decimal("0.01")
+
+# Campos de Pedido que muestra el historial.
+CAMPOS_HISTORIAL = ("id", "codigo", "total", "estado_pedido", "creado_en")
+
+
+def importe_linea(prefijo=""):
+    return ExpressionWrapper(
+        F(f"{prefijo}cantidad") * F(f"{prefijo}precio_unitario"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def con_totales(pedidos):
+    """
+    Anota cada pedido con `num_articulos` (piezas) y `total_lineas` (suma
+    de cantidad × precio de sus líneas) en la misma consulta.
+    """
+    return pedidos.annotate(
+        num_articulos=Coalesce(Sum("items__cantidad"), 0),
+        total_lineas=Coalesce(
+            Sum(importe_linea("items__")),
+            Decimal("0"),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+
+
+def version_pedido(**filtro):
+    """
+    (id, usuario_id, última modificación, cantidad de líneas) del pedido
+    que cumple `filtro` (id=... o codigo=...), o None si no existe. La
+    última modificación es la más reciente entre el pedido y los productos
+    de sus líneas (nombre e imagen salen en la página). Una sola consulta.
+    """
+    fila = (
+        Pedido.objects.filter(**filtro)
+                      .annotate(
+                          productos_en=Max("items__producto__actualizado_en"),
+                          lineas=Count("items"),
+                      )
+                      .values_list("id", "usuario_id", "actualizado_en", "productos_en", "lineas")
+                      .first()
+    )
+    if fila is None:
+        return None
+    pedido_id, usuario_id, actualizado_en, productos_en, lineas = fila
+    if productos_en and productos_en > actualizado_en:
+        actualizado_en = productos_en
+    return pedido_id, usuario_id, actualizado_en, lineas
+
+
+class ResumenPedido:
+    """
+    Líneas de un pedido (con producto y `importe` calculado en SQL) y sus
+    totales como Decimal redondeado a centavos.
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self.articulos = sum(item.cantidad for item in items)
+        self.total = sum(
+            (item.importe for item in items), Decimal("0")
+        ).quantize(CENTAVOS)
+
+
+def resumen_lineas(pedido):
+    items = list(
+        pedido.items.select_related("producto")
+                    .annotate(importe=importe_linea())
+                    .order_by("id")
+    )
+    for item in items:
+        # SQLite regresa el producto de dos decimales con más escala.
+        item.importe = Decimal(item.importe).quantize(CENTAVOS)
+    return ResumenPedido(items)
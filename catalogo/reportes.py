@@ -0,0 +1,157 @@
+"""
+Reportes de ventas e inventario para el personal (vista `reportes` y su
+exportación CSV).
+
+- Todo se agrega en SQL: la base regresa una fila por grupo (día,
+  categoría, método de pago, estado), no los pedidos.
+- El rango de fechas es por día local (TIME_ZONE) y se filtra con
+  creado_en >= inicio y < fin, que usa el índice pedido_reporte_idx; ese
+  índice trae también estado, método de pago y total, así que los
+  reportes sobre Pedido no leen la tabla.
+- Ventas = pedidos no cancelados. El reporte por estado sí los incluye.
+- Los reportes por línea (categoría, producto) leen el resumen diario
+  VentaDiaria para los días que ya cubre y agregan PedidoItem sólo para
+  los recientes (ver catalogo.ventas): tardan lo mismo con un mes o con
+  cinco años de historia.
+"""
+
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Pedido, PedidoItem, Producto, VarianteProducto, VentaDiaria
+from .pedidos import importe_linea
+from .ventas import dia_de_corte, rango
+
+
+UMBRAL_STOCK_BAJO = getattr(settings, "CATALOGO_UMBRAL_STOCK_BAJO", 5)
+
+_LEER = object()  # corte todavía no leído
+
+# {clave: (título, encabezado CSV)}
+REPORTES = {
+    "dia": ("Ventas por día", ("dia", "pedidos", "importe")),
+    "categoria": ("Ventas por categoría", ("categoria", "piezas", "importe")),
+    "producto": ("Productos más vendidos", ("producto_id", "producto", "piezas", "importe")),
+    "metodo_pago": ("Ventas por método de pago", ("metodo_pago", "pedidos", "importe")),
+    "estado": ("Pedidos por estado", ("estado_pedido", "pedidos", "importe")),
+    "stock_bajo": ("Stock bajo", ("producto_id", "producto", "talla", "stock")),
+}
+
+
+def _pedidos(desde, hasta, con_cancelados=False):
+    inicio, fin = rango(desde, hasta)
+    pedidos = Pedido.objects.filter(creado_en__gte=inicio, creado_en__lt=fin)
+    if not con_cancelados:
+        pedidos = pedidos.exclude(estado_pedido="cancelado")
+    return pedidos
+
+
+def _por(pedidos, campo):
+    return (
+        pedidos.values(campo)
+               .annotate(pedidos=Count("id"), importe=Sum("total"))
+               .order_by(campo)
+               .values_list(campo, "pedidos", "importe")
+    )
+
+
+def ventas_por_dia(desde, hasta):
+    """(día, pedidos, importe) de cada día con ventas, en orden."""
+    return _por(
+        _pedidos(desde, hasta).annotate(dia=TruncDate("creado_en", tzinfo=timezone.get_current_timezone())),
+        "dia",
+    )
+
+
+def ventas_por_metodo_pago(desde, hasta):
+    return _por(_pedidos(desde, hasta), "metodo_pago")
+
+
+def pedidos_por_estado(desde, hasta):
+    return _por(_pedidos(desde, hasta, con_cancelados=True), "estado_pedido")
+
+
+def _lineas_agrupadas(desde, hasta, campos, corte=_LEER):
+    """
+    [(*campos, piezas, importe)] de las líneas no canceladas del rango,
+    agrupadas por `campos` (rutas desde la línea, p. ej.
+    "producto__categoria") y de mayor a menor importe. `corte` es el de
+    ventas.dia_de_corte() si ya se leyó.
+    """
+    if corte is _LEER:
+        corte = dia_de_corte()
+    grupos = {}
+    consultas = []
+    if corte and desde < corte:
+        consultas.append(
+            VentaDiaria.objects.filter(dia__gte=desde, dia__lte=min(hasta, corte - timedelta(days=1)))
+                               .values(*campos)
+                               .annotate(suma_piezas=Sum("piezas"), suma_importe=Sum("importe"))
+        )
+    if not corte or hasta >= corte:
+        inicio, fin = rango(max(desde, corte) if corte else desde, hasta)
+        consultas.append(
+            PedidoItem.objects.filter(pedido__creado_en__gte=inicio, pedido__creado_en__lt=fin)
+                              .exclude(pedido__estado_pedido="cancelado")
+                              .values(*campos)
+                              .annotate(suma_piezas=Sum("cantidad"), suma_importe=Sum(importe_linea()))
+        )
+    for consulta in consultas:
+        for *clave, piezas, importe in consulta.order_by().values_list(*campos, "suma_piezas", "suma_importe"):
+            anterior = grupos.get(tuple(clave), (0, 0))
+            grupos[tuple(clave)] = (anterior[0] + piezas, anterior[1] + importe)
+    return sorted(
+        (clave + valores for clave, valores in grupos.items()),
+        key=lambda fila: (-fila[-1], fila[0]),
+    )
+
+
+def ventas_por_categoria(desde, hasta, corte=_LEER):
+    """[(categoría, piezas, importe)] de mayor a menor importe."""
+    return _lineas_agrupadas(desde, hasta, ("producto__categoria",), corte)
+
+
+def ventas_por_producto(desde, hasta, corte=_LEER):
+    """[(producto_id, nombre, piezas, importe)] de mayor a menor importe."""
+    return _lineas_agrupadas(desde, hasta, ("producto_id", "producto__nombre"), corte)
+
+
+def stock_bajo(umbral=UMBRAL_STOCK_BAJO):
+    """
+    (producto_id, nombre, talla, stock) de los productos activos con
+    `umbral` piezas o menos: por talla si tienen variantes, si no el stock
+    del producto (talla vacía). De menos a más stock.
+    """
+    por_talla = (
+        VarianteProducto.objects.filter(stock__lte=umbral, producto__activo=True)
+                                .order_by("stock", "producto_id", "id")
+                                .values_list("producto_id", "producto__nombre", "talla", "stock")
+    )
+    sin_variantes = (
+        (producto_id, nombre, "", stock)
+        for producto_id, nombre, stock in Producto.objects.filter(
+            activo=True, stock__lte=umbral, variantes__isnull=True
+        ).order_by("stock", "id").values_list("id", "nombre", "stock").iterator()
+    )
+    # Las dos consultas vienen ordenadas por stock: se intercalan sin
+    # juntar todo en memoria.
+    return heapq.merge(sin_variantes, por_talla.iterator(), key=lambda fila: fila[3])
+
+
+def filas(reporte, desde, hasta):
+    """Filas del reporte `reporte` (clave de REPORTES) para exportar."""
+    if reporte == "stock_bajo":
+        return stock_bajo()
+    consulta = {
+        "dia": ventas_por_dia,
+        "categoria": ventas_por_categoria,
+        "producto": ventas_por_producto,
+        "metodo_pago": ventas_por_metodo_pago,
+        "estado": pedidos_por_estado,
+    }[reporte](desde, hasta)
+    return consulta.iterator() if isinstance(consulta, QuerySet) else consulta
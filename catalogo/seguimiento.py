@@ -0,0 +1,107 @@
+"""
+Consulta del estado de un pedido por su código (trackear_pedido y su
+versión JSON).
+
+- El resumen de cada código se guarda en la caché; la señal post_save de
+  Pedido lo invalida, así que un cambio de estado se ve al momento.
+  Los códigos que no existen también se guardan (por poco tiempo) para
+  que probar códigos al azar no llegue a la base.
+- Sólo se leen las columnas que muestra la página de seguimiento.
+- Cada consulta gasta una ficha del cubo del cliente (IP y sesión), ver
+  tienda.limites.
+"""
+
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from tienda.limites import CuboDeFichas, clientes
+
+from .condicional import etiqueta
+from .models import Pedido
+
+
+CAMPOS_SEGUIMIENTO = (
+    "id", "codigo", "nombre_completo", "estado_pedido", "total",
+    "creado_en", "actualizado_en",
+)
+
+PREFIJO = "catalogo:seguimiento"
+SEGUNDOS_SEGUIMIENTO = getattr(settings, "CATALOGO_SEGUNDOS_SEGUIMIENTO", 60 * 60)
+SEGUNDOS_NO_EXISTE = 60
+
+# Valor guardado en la caché para "ese código no existe" (None no sirve:
+# cache.get lo regresa también cuando la clave no está).
+_NO_EXISTE = "no-existe"
+
+
+def _clave(codigo):
+    # Los códigos vienen del cliente: se usa un hash para que la clave sea
+    # válida en cualquier backend de caché (memcached no acepta espacios).
+    return f"{PREFIJO}:{hashlib.sha256(codigo.encode('utf-8')).hexdigest()[:32]}"
+
+
+def resumen_pedido(codigo):
+    """
+    Regresa el dict que muestra el seguimiento del pedido `codigo`, o None
+    si no existe:
+
+        {"id": 7, "codigo": "PW-...", "nombre_completo": "...",
+         "estado_pedido": "enviado", "estado_display": "Enviado",
+         "total": Decimal("650.00"), "creado_en": datetime,
+         "actualizado_en": datetime}
+    """
+    resumen = cache.get(_clave(codigo))
+    if resumen is None:
+        pedido = Pedido.objects.filter(codigo=codigo).only(*CAMPOS_SEGUIMIENTO).first()
+        resumen = _guardar(codigo, pedido)
+    return None if resumen == _NO_EXISTE else resumen
+
+
+async def aresumen_pedido(codigo):
+    """`resumen_pedido` para vistas async (caché y ORM async)."""
+    resumen = await cache.aget(_clave(codigo))
+    if resumen is None:
+        pedido = await Pedido.objects.filter(codigo=codigo).only(*CAMPOS_SEGUIMIENTO).afirst()
+        resumen = await sync_to_async(_guardar)(codigo, pedido)
+    return None if resumen == _NO_EXISTE else resumen
+
+
+def _guardar(codigo, pedido):
+    if pedido is None:
+        cache.set(_clave(codigo), _NO_EXISTE, SEGUNDOS_NO_EXISTE)
+        return _NO_EXISTE
+    resumen = {campo: getattr(pedido, campo) for campo in CAMPOS_SEGUIMIENTO}
+    resumen["estado_display"] = pedido.get_estado_pedido_display()
+    cache.set(_clave(codigo), resumen, SEGUNDOS_SEGUIMIENTO)
+    return resumen
+
+
+def invalidar_seguimiento(codigo):
+    invalidar_seguimientos([codigo])
+
+
+def invalidar_seguimientos(codigos):
+    cache.delete_many([_clave(codigo) for codigo in codigos if codigo])
+
+
+def etag_resumen(resumen):
+    """ETag que cambia cuando cambia el estado (o cualquier otro dato) del pedido."""
+    return etiqueta(resumen["codigo"], resumen["estado_pedido"], resumen["actualizado_en"].isoformat())
+
+
+def espera_para(request):
+    """
+    Gasta una ficha por cada identificador del cliente. Regresa 0 si puede
+    consultar o los segundos que debe esperar.
+
+    settings.CATALOGO_SEGUIMIENTO_LIMITE es (ráfaga, consultas por minuto);
+    None desactiva el límite (lo usa bench_embudo).
+    """
+    limite = getattr(settings, "CATALOGO_SEGUIMIENTO_LIMITE", (10, 10))
+    if limite is None:
+        return 0
+    cubo = CuboDeFichas("seguimiento", *limite)
+    return max(cubo.consumir(cliente) for cliente in clientes(request))
@@ -0,0 +1,93 @@
+import logging
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from PIL import UnidentifiedImageError
+
+from .busqueda import indexar_productos, usa_fulltext
+from .carrito import fusionar_al_iniciar_sesion
+from .cola import encolar
+from .facetas import invalidar_categorias, invalidar_tallas
+from .fragmentos import invalidar_productos
+from .imagenes import derivados_vigentes, generar_derivados
+from .models import Pedido, Producto, VarianteProducto
+from .seguimiento import invalidar_seguimiento
+from .ventas import corregir_pedidos
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_cambiado(sender, instance, **kwargs):
+    invalidar_categorias()
+    invalidar_tallas()
+    invalidar_productos([instance.pk])
+
+
+@receiver(post_save, sender=VarianteProducto)
+@receiver(post_delete, sender=VarianteProducto)
+def variante_cambiada(sender, instance, **kwargs):
+    invalidar_tallas()
+    invalidar_productos([instance.producto_id])
+    # Las tallas se muestran en las páginas del producto (ETag).
+    Producto.objects.filter(pk=instance.producto_id).update(actualizado_en=Now())
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, raw=False, **kwargs):
+    if not raw and not usa_fulltext():
+        indexar_productos([instance])
+
+
+@receiver(post_save, sender=Producto)
+def generar_miniaturas(sender, instance, raw=False, **kwargs):
+    if raw or not instance.imagen or derivados_vigentes(instance):
+        return
+    try:
+        miniaturas = generar_derivados(instance.imagen.name)
+    except (OSError, UnidentifiedImageError):
+        logger.warning("No se pudieron generar miniaturas de %s", instance.imagen.name)
+        return
+    # update() para no volver a disparar post_save.
+    Producto.objects.filter(pk=instance.pk).update(miniaturas=miniaturas, actualizado_en=Now())
+    instance.miniaturas = miniaturas
+    invalidar_productos([instance.pk])
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+def pedido_cambiado(sender, instance, **kwargs):
+    invalidar_seguimiento(instance.codigo)
+
+
+@receiver(post_save, sender=Pedido)
+def pedido_cambio_de_estado(sender, instance, created, raw=False, **kwargs):
+    anterior = getattr(instance, "_estado_guardado", None)
+    instance._estado_guardado = instance.estado_pedido
+    if raw or created or anterior in (None, instance.estado_pedido):
+        return
+    # Se envía después del COMMIT, desde la cola (ver catalogo.avisos).
+    encolar("avisar_pedidos", pedido_ids=[instance.id], estado=instance.estado_pedido)
+
+
+# Un pedido cancelado o borrado deja de contar en el resumen diario al
+# momento (ver ventas.corregir_pedidos).
+@receiver(post_save, sender=Pedido)
+def pedido_cancelado(sender, instance, raw=False, **kwargs):
+    if not raw and instance.estado_pedido == "cancelado":
+        corregir_pedidos([instance.creado_en])
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_borrado(sender, instance, **kwargs):
+    corregir_pedidos([instance.creado_en])
+
+
+@receiver(user_logged_in)
+def fusionar_carrito(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, "session"):
+        fusionar_al_iniciar_sesion(request, user)
@@ -0,0 +1,113 @@
+"""
+Datos sintéticos para benchmarks (ver los comandos sembrar_datos,
+bench_embudo y bench_busqueda). No se usa en las vistas.
+"""
+
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .inventario import repartir_stock
+from .models import Pedido, PedidoItem, Producto, VarianteProducto
+
+
+PRENDAS = ["Suéter", "Playera", "Camisa", "Pantalón", "Hoodie", "Gorra", "Mochila", "Chamarra"]
+ADJETIVOS = ["negro", "blanco", "azul", "deportivo", "casual", "formal", "básico", "oversize"]
+MATERIALES = ["algodón", "lana", "mezclilla", "poliéster", "lino"]
+TALLAS = ["S", "M", "L", "XL"]
+CATEGORIAS = [c for c, _ in Producto.CATEGORIAS_CHOICES]
+METODOS_PAGO = [m for m, _ in Pedido.METODO_PAGO_CHOICES]
+ESTADOS = [e for e, _ in Pedido.ESTADO_CHOICES]
+
+
+def productos(azar, cantidad, inicio=0, stock=(0, 50)):
+    """Genera (sin guardar) `cantidad` productos activos."""
+    return [
+        Producto(
+            nombre=f"{azar.choice(PRENDAS)} {azar.choice(ADJETIVOS)} {i}",
+            descripcion=(
+                f"{azar.choice(PRENDAS)} de {azar.choice(MATERIALES)} "
+                f"{azar.choice(ADJETIVOS)}"
+            ),
+            categoria=azar.choice(CATEGORIAS),
+            precio=Decimal(azar.randint(10_000, 150_000)) / 100,
+            stock=azar.randint(*stock),
+        )
+        for i in range(inicio, inicio + cantidad)
+    ]
+
+
+def variantes(productos):
+    """
+    Genera (sin guardar) las variantes S..XL de `productos`, pares
+    (producto_id, stock), repartiendo el stock del producto entre tallas.
+    """
+    return [
+        VarianteProducto(producto_id=producto_id, talla=talla, stock=piezas)
+        for producto_id, stock in productos
+        for talla, piezas in repartir_stock(stock, TALLAS).items()
+    ]
+
+
+def pedidos_con_items(azar, cantidad, productos_ids, usuarios_ids, inicio=0, dias=365):
+    """
+    Genera `cantidad` pedidos (con código BENCH único y fecha repartida en
+    los últimos `dias`) y sus líneas. Las líneas quedan sin pedido y con el
+    código en `_codigo_pedido` para enlazarlas una vez guardados los
+    pedidos; insertar dentro de `fechas_manuales(Pedido, ...)`.
+    """
+    ahora = timezone.now()
+    pedidos, items = [], []
+    for i in range(inicio, inicio + cantidad):
+        codigo = f"PW-BENCH-{i:010d}"
+        creado_en = ahora - timedelta(seconds=azar.randint(0, dias * 86400))
+        lineas = []
+        for _ in range(azar.randint(1, 3)):
+            linea = PedidoItem(
+                producto_id=azar.choice(productos_ids),
+                talla=azar.choice(TALLAS),
+                cantidad=azar.randint(1, 3),
+                precio_unitario=Decimal(azar.randint(10_000, 150_000)) / 100,
+            )
+            linea._codigo_pedido = codigo
+            lineas.append(linea)
+        pedidos.append(
+            Pedido(
+                codigo=codigo,
+                usuario_id=azar.choice(usuarios_ids) if usuarios_ids else None,
+                nombre_completo=f"Cliente {i}",
+                email=f"cliente{i}@ejemplo.com",
+                telefono="5512345678",
+                direccion="Calle 1",
+                ciudad="CDMX",
+                estado="CDMX",
+                codigo_postal="01000",
+                metodo_pago=azar.choice(METODOS_PAGO),
+                estado_pedido=azar.choice(ESTADOS),
+                total=sum(l.precio_unitario * l.cantidad for l in lineas),
+                creado_en=creado_en,
+                actualizado_en=creado_en,
+            )
+        )
+        items.extend(lineas)
+    return pedidos, items
+
+
+@contextmanager
+def fechas_manuales(modelo, *campos):
+    """
+    Desactiva auto_now/auto_now_add de `campos` mientras se insertan datos
+    históricos, para que bulk_create respete las fechas dadas.
+    """
+    originales = []
+    for nombre in campos:
+        campo = modelo._meta.get_field(nombre)
+        originales.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
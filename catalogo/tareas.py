@@ -0,0 +1,48 @@
+"""
+Tareas de la cola (catalogo.cola): efectos de los pedidos que no tienen
+que esperar a que el cliente reciba su respuesta (avisos de stock,
+correos). Se registran al cargar la app (CatalogoConfig.ready).
+"""
+
+import logging
+
+from django.db.models import Value
+
+from . import avisos
+from .cola import tarea
+from .models import PedidoItem, Producto, VarianteProducto
+from .reportes import UMBRAL_STOCK_BAJO
+
+
+logger = logging.getLogger(__name__)
+
+
+@tarea("pedido_registrado")
+def pedido_registrado(pedido_id):
+    """Lo que sigue a un pedido nuevo (lo encola inventario.registrar_pedido)."""
+    avisar_stock_bajo(pedido_id)
+    avisos.avisar([pedido_id], "pendiente")
+
+
+@tarea("avisar_pedidos", max_intentos=8)
+def avisar_pedidos(pedido_ids, estado):
+    """Correo de cambio de estado (señal de Pedido y acciones del admin)."""
+    avisos.avisar(pedido_ids, estado)
+
+
+def avisar_stock_bajo(pedido_id, umbral=UMBRAL_STOCK_BAJO):
+    """
+    Avisa de los productos del pedido que quedaron con `umbral` piezas o
+    menos (por talla si tienen variantes). Regresa [(nombre, talla, stock)].
+    """
+    ids = PedidoItem.objects.filter(pedido_id=pedido_id).values("producto_id")
+    bajos = [
+        *Producto.objects.filter(id__in=ids, stock__lte=umbral, variantes__isnull=True)
+                         .annotate(talla=Value(""))
+                         .values_list("nombre", "talla", "stock"),
+        *VarianteProducto.objects.filter(producto_id__in=ids, stock__lte=umbral)
+                                 .values_list("producto__nombre", "talla", "stock"),
+    ]
+    for nombre, talla, stock in bajos:
+        logger.warning("Stock bajo: %s %s (quedan %s)", nombre, talla, stock)
+    return bajos
@@ -0,0 +1,81 @@
+from django import template
+from django.db.models import Prefetch, prefetch_related_objects
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from catalogo.fragmentos import fragmentos_productos
+from catalogo.models import Producto, VarianteProducto
+from tienda.replicas import en_replica, leyendo_del_primario
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def tarjetas_productos(productos):
+    """
+    Las tarjetas de `productos` (catalogo/_tarjeta_producto.html) desde la
+    caché de fragmentos. Sólo se renderizan las que cambiaron, y sólo para
+    ésas se leen las tallas (una consulta). Si el listado se leyó de la
+    réplica, las que faltan se vuelven a leer del primario antes de
+    guardarlas.
+
+        {% tarjetas_productos productos %}
+    """
+    plantilla = get_template("catalogo/_tarjeta_producto.html")
+
+    def renderizar(faltantes):
+        recargar = en_replica()
+        with leyendo_del_primario():
+            if recargar:
+                frescos = Producto.objects.in_bulk([p.id for p in faltantes])
+                faltantes = [frescos.get(p.id, p) for p in faltantes]
+            prefetch_related_objects(
+                faltantes,
+                Prefetch(
+                    "variantes",
+                    queryset=VarianteProducto.objects.only("id", "producto_id", "talla", "stock"),
+                ),
+            )
+        # Sin request: la tarjeta no puede depender de la sesión.
+        return [plantilla.render({"p": p}) for p in faltantes]
+
+    return mark_safe("".join(fragmentos_productos("tarjeta", productos, renderizar)))
+
+
+class FragmentoProductoNode(template.Node):
+    def __init__(self, nodelist, nombre, producto):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.producto = producto
+
+    def render(self, context):
+        producto = self.producto.resolve(context)
+        html, = fragmentos_productos(
+            self.nombre.resolve(context),
+            [producto],
+            lambda faltantes: [self.nodelist.render(context)],
+        )
+        return html
+
+
+@register.tag
+def fragmento_producto(parser, token):
+    """
+    Guarda en caché una parte de la página que sólo depende del producto
+    (nada de la sesión: ni token CSRF ni disponibilidad con reservas).
+    El producto tiene que estar al día con el primario (ver
+    detalle_producto): lo que se renderiza aquí se queda en la caché.
+
+        {% fragmento_producto "detalle_info" producto %}...{% endfragmento_producto %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"{bits[0]} recibe un nombre de fragmento y un producto."
+        )
+    nodelist = parser.parse(("endfragmento_producto",))
+    parser.delete_first_token()
+    return FragmentoProductoNode(
+        nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2])
+    )
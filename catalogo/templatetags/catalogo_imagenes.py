@@ -0,0 +1,26 @@
+from django import template
+
+from catalogo.imagenes import SIZES, url_derivado
+
+
+register = template.Library()
+
+
+@register.inclusion_tag("catalogo/_imagen_producto.html")
+def imagen_producto(producto, uso, clase=""):
+    """
+    <picture> con miniaturas WebP/JPEG y `srcset` para `uso`
+    ("tarjeta", "detalle" o "linea"). Si el producto aún no tiene
+    derivados, usa la imagen original.
+
+        {% imagen_producto p "tarjeta" %}
+    """
+    return {
+        "producto": producto,
+        "src": url_derivado(producto, uso),
+        "srcset_webp": producto.srcset(uso, "webp"),
+        "srcset_jpeg": producto.srcset(uso, "jpeg"),
+        "sizes": SIZES[uso],
+        "clase": clase,
+        "perezosa": uso != "detalle",
+    }
@@ -1,3 +1,1888 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.forms.models import model_to_dict
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection, router
+from django.db.utils import ConnectionHandler
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from tienda.estaticos import EstaticosPrecomprimidosMiddleware
+from tienda.instrumentacion import PresupuestoConsultasMixin, RegistroConsultas
+from tienda.mysql_pool.base import Pool
+from tienda.replicas import leyendo_de_replica
+
+from . import api, avisos, cola
+from . import carrito as carrito_db
+from . import reportes, ventas
+from .admin import PedidoAdminForm
+from .busqueda import buscar, normalizar, terminos_de
+from .codigos import BITS, CodigoInvalido, codigo_pedido, normalizar_codigo, permutar
+from .estados import cambiar_estado
+from .facetas import CLAVE_CATEGORIAS, CLAVE_TALLAS, categorias_con_conteo
+from .fragmentos import estadisticas
+from .inventario import (
+    StockInsuficiente,
+    TallaInvalida,
+    disponibles,
+    disponibles_por_talla,
+    liberar,
+    registrar_pedido,
+    repartir_stock,
+    reservar,
+)
+from .models import (
+    MAX_TALLA,
+    AvisoPedido,
+    Carrito,
+    CarritoItem,
+    Pedido,
+    PedidoItem,
+    Producto,
+    Reserva,
+    Tarea,
+    VarianteProducto,
+    VentaDiaria,
+)
+from .paginacion import CursorInvalido, codificar_cursor, decodificar_cursor
+
+
+def _pedido():
+    return Pedido(
+        nombre_completo="Cliente Prueba",
+        email="cliente@ejemplo.com",
+        telefono="5512345678",
+        direccion="Calle 1",
+        ciudad="CDMX",
+        estado="CDMX",
+        codigo_postal="01000",
+    )
+
+
+def _item(producto, cantidad=1, talla="M"):
+    return {
+        "producto_id": producto.id,
+        "nombre": producto.nombre,
+        "talla": talla,
+        "cantidad": cantidad,
+        "precio": float(producto.precio),
+    }
+
+
+class RegistrarPedidoTests(TestCase):
+    def test_descuenta_stock_y_crea_lineas(self):
+        playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=5)
+        sudadera = Producto.objects.create(nombre="Sudadera", precio="450.00", stock=3)
+
+        pedido = registrar_pedido(
+            _pedido(),
+            [_item(playera, 2, "S"), _item(playera, 1, "L"), _item(sudadera, 3)],
+        )
+
+        playera.refresh_from_db()
+        sudadera.refresh_from_db()
+        self.assertEqual(playera.stock, 2)
+        self.assertEqual(sudadera.stock, 0)
+        self.assertEqual(pedido.items.count(), 3)
+        self.assertEqual(pedido.total, Decimal("1949.70"))
+
+    def test_stock_insuficiente_revierte_todo(self):
+        playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=5)
+        sudadera = Producto.objects.create(nombre="Sudadera", precio="450.00", stock=1)
+
+        with self.assertRaises(StockInsuficiente) as ctx:
+            registrar_pedido(_pedido(), [_item(playera, 2), _item(sudadera, 2)])
+
+        self.assertEqual(ctx.exception.nombre, "Sudadera")
+        self.assertEqual(ctx.exception.disponible, 1)
+        playera.refresh_from_db()
+        self.assertEqual(playera.stock, 5)
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_numero_de_consultas_no_depende_de_las_lineas(self):
+        productos = [
+            Producto.objects.create(nombre=f"Producto {i}", precio="10.00", stock=10)
+            for i in range(30)
+        ]
+
+        with CaptureQueriesContext(connection) as una_linea:
+            registrar_pedido(_pedido(), [_item(productos[0])])
+        with CaptureQueriesContext(connection) as treinta_lineas:
+            registrar_pedido(_pedido(), [_item(p) for p in productos])
+
+        self.assertEqual(len(una_linea), len(treinta_lineas))
+
+
+class CheckoutConcurrenteTests(TransactionTestCase):
+    HILOS = 12
+    STOCK_INICIAL = 7
+
+    def test_stock_nunca_queda_negativo(self):
+        producto = Producto.objects.create(
+            nombre="Edición limitada", precio="999.00", stock=self.STOCK_INICIAL
+        )
+        barrera = threading.Barrier(self.HILOS)
+
+        def comprar():
+            try:
+                barrera.wait()
+                registrar_pedido(_pedido(), [_item(producto)])
+            except (StockInsuficiente, DatabaseError):
+                pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=comprar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        producto.refresh_from_db()
+        vendidos = sum(
+            PedidoItem.objects.filter(producto=producto).values_list("cantidad", flat=True)
+        )
+        self.assertGreaterEqual(producto.stock, 0)
+        self.assertEqual(producto.stock + vendidos, self.STOCK_INICIAL)
+
+
+class ReservaTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Hoodie", precio="650.00", stock=5)
+
+    def test_reservas_descuentan_disponible_de_otros_carritos(self):
+        reservar("carrito-a", self.producto, "", 3)
+
+        self.assertEqual(disponibles([self.producto.id])[self.producto.id], 2)
+        self.assertEqual(disponibles([self.producto.id], "carrito-a")[self.producto.id], 5)
+        with self.assertRaises(StockInsuficiente):
+            reservar("carrito-b", self.producto, "", 3)
+
+    def test_agregar_de_nuevo_incrementa_la_misma_reserva(self):
+        reservar("carrito-a", self.producto, "", 2)
+        reservar("carrito-a", self.producto, "", 1)
+
+        self.assertEqual(Reserva.objects.get().cantidad, 3)
+        with self.assertRaises(TallaInvalida):
+            reservar("carrito-a", self.producto, "L", 1)
+        with self.assertRaises(StockInsuficiente):
+            reservar("carrito-a", self.producto, "", 3)
+
+    def test_liberar_y_expirar(self):
+        reservar("carrito-a", self.producto, "", 2)
+        reservar("carrito-b", self.producto, "", 2)
+        liberar("carrito-a")
+        self.assertEqual(disponibles([self.producto.id])[self.producto.id], 3)
+
+        Reserva.objects.update(expira_en=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(disponibles([self.producto.id])[self.producto.id], 5)
+        call_command("expirar_reservas", lote=1, stdout=StringIO())
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_checkout_consume_las_reservas_del_carrito(self):
+        reservar("carrito-a", self.producto, "", 4)
+
+        with self.assertRaises(StockInsuficiente):
+            registrar_pedido(_pedido(), [_item(self.producto, 2)], "carrito-b")
+
+        registrar_pedido(_pedido(), [_item(self.producto, 4)], "carrito-a")
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock, 1)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_vistas_de_carrito_reservan_y_liberan(self):
+        url = reverse("agregar_al_carrito", args=[self.producto.id])
+        self.client.post(url, {"talla": "", "cantidad": 2})
+        self.assertEqual(Reserva.objects.get().cantidad, 2)
+
+        respuesta = self.client.post(url, {"talla": "", "cantidad": 4})
+        self.assertRedirects(
+            respuesta, reverse("detalle_producto", args=[self.producto.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(Reserva.objects.get().cantidad, 2)
+
+        respuesta = self.client.post(url, {"talla": "XL", "cantidad": 1})
+        self.assertRedirects(
+            respuesta, reverse("detalle_producto", args=[self.producto.id]),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(Reserva.objects.get().cantidad, 2)
+
+        item = CarritoItem.objects.get()
+        self.client.get(reverse("eliminar_del_carrito", args=[item.id]))
+        self.assertFalse(Reserva.objects.exists())
+        self.assertFalse(CarritoItem.objects.exists())
+
+
+class ListaProductosPaginacionTests(TestCase):
+    def setUp(self):
+        for i in range(7):
+            Producto.objects.create(
+                nombre=f"Playera {i % 3}", precio="100.00", stock=1,
+                categoria="Camisas" if i % 2 else "Otros",
+                descripcion="x" * 1000,
+            )
+        Producto.objects.create(nombre="Oculto", precio="1.00", activo=False)
+
+    def _recorrer(self, **params):
+        vistos = []
+        url = reverse("lista_productos")
+        params = {"por_pagina": 2, **params}
+        while True:
+            respuesta = self.client.get(url, params)
+            pagina = respuesta.context["pagina"]
+            vistos.extend(p.id for p in pagina)
+            if not pagina.siguiente:
+                return vistos, pagina
+            params["despues"] = pagina.siguiente
+
+    def test_recorre_todo_el_catalogo_sin_repetir(self):
+        vistos, _ = self._recorrer()
+        esperados = list(
+            Producto.objects.filter(activo=True)
+                            .order_by("nombre", "id")
+                            .values_list("id", flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+
+    def test_filtra_por_categoria_y_regresa_con_antes(self):
+        vistos, ultima = self._recorrer(categoria="Camisas")
+        self.assertEqual(len(vistos), 3)
+
+        respuesta = self.client.get(
+            reverse("lista_productos"),
+            {"categoria": "Camisas", "por_pagina": 2, "antes": ultima.anterior},
+        )
+        self.assertEqual([p.id for p in respuesta.context["pagina"]], vistos[:2])
+
+    def test_no_carga_la_descripcion(self):
+        respuesta = self.client.get(reverse("lista_productos"))
+        producto = respuesta.context["pagina"].items[0]
+        self.assertIn("descripcion", producto.get_deferred_fields())
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        respuesta = self.client.get(reverse("lista_productos"), {"despues": "%%%"})
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_cursor_bien_codificado_con_datos_invalidos(self):
+        primera = list(Producto.objects.filter(activo=True).order_by("nombre", "id")[:24])
+        for valores in ([{"a": 1}, "x"], [None, "abc"], ["Camisa", "1"], ["Camisa", 1.5],
+                        [True, 1], [["Camisa"], 1], ["Camisa", True]):
+            with self.subTest(valores=valores):
+                cursor = codificar_cursor(valores)
+                with self.assertRaises(CursorInvalido):
+                    decodificar_cursor(cursor, Producto._meta.get_field("nombre"))
+                respuesta = self.client.get(reverse("lista_productos"), {"despues": cursor})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(list(respuesta.context["pagina"]), primera)
+                respuesta = self.client.get(reverse("api_productos"), {"despues": cursor})
+                self.assertEqual(respuesta.status_code, 400)
+
+    def test_cursor_con_valor_del_tipo_del_campo(self):
+        self.assertEqual(
+            decodificar_cursor(codificar_cursor(["2026-01-01", 7]), Pedido._meta.get_field("creado_en"))[1], 7
+        )
+        with self.assertRaises(CursorInvalido):
+            decodificar_cursor(codificar_cursor(["ayer", 7]), Pedido._meta.get_field("creado_en"))
+
+
+class FacetaCategoriasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Producto.objects.create(nombre="Camisa", categoria="Camisas", precio="1.00")
+        Producto.objects.create(nombre="Camisa 2", categoria="Camisas", precio="1.00")
+        Producto.objects.create(nombre="Gorra", categoria="Accesorios", precio="1.00")
+        Producto.objects.create(
+            nombre="Descontinuado", categoria="Pantalones", precio="1.00", activo=False
+        )
+
+    def test_cuenta_solo_productos_activos(self):
+        self.assertEqual(
+            categorias_con_conteo(),
+            [
+                {"categoria": "Accesorios", "total": 1},
+                {"categoria": "Camisas", "total": 2},
+            ],
+        )
+
+    def test_senales_invalidan_la_cache(self):
+        categorias_con_conteo()
+        producto = Producto.objects.create(
+            nombre="Suéter", categoria="Suéteres", precio="1.00"
+        )
+        self.assertIn({"categoria": "Suéteres", "total": 1}, categorias_con_conteo())
+
+        producto.delete()
+        self.assertNotIn("Suéteres", [c["categoria"] for c in categorias_con_conteo()])
+
+    def test_vuelve_a_invalidar_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(nombre="Suéter", categoria="Suéteres", precio="1.00")
+            # Una lectura concurrente llena la caché con datos de antes
+            # del commit.
+            cache.set(CLAVE_CATEGORIAS, [], 60)
+            cache.set(CLAVE_TALLAS, [], 60)
+        self.assertIsNone(cache.get(CLAVE_CATEGORIAS))
+        self.assertIsNone(cache.get(CLAVE_TALLAS))
+
+    def test_lista_sin_consultas_de_faceta_con_cache_caliente(self):
+        self.client.get(reverse("lista_productos"))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse("lista_productos"))
+
+        self.assertEqual(
+            [q["sql"] for q in consultas if "COUNT(" in q["sql"].upper()], []
+        )
+        # Sólo la versión del listado (para el ETag) y la página de
+        # productos: las tarjetas (y sus tallas) salen de la caché de
+        # fragmentos.
+        self.assertEqual(len(consultas), 2)
+
+
+class CarritoTests(TestCase):
+    def setUp(self):
+        self.playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=10)
+        self.gorra = Producto.objects.create(nombre="Gorra", precio="0.10", stock=10)
+
+    def _agregar(self, producto, cantidad, talla=""):
+        return self.client.post(
+            reverse("agregar_al_carrito", args=[producto.id]),
+            {"talla": talla, "cantidad": cantidad},
+        )
+
+    def test_agregar_incrementa_la_linea_y_suma_en_decimal(self):
+        self._agregar(self.playera, 1)
+        self._agregar(self.playera, 2)
+        for _ in range(3):
+            self._agregar(self.gorra, 1)
+
+        self.assertEqual(CarritoItem.objects.count(), 2)
+        respuesta = self.client.get(reverse("ver_carrito"))
+        self.assertEqual(respuesta.context["total"], Decimal("600.00"))
+        self.assertEqual(
+            carrito_db.total_carrito(Carrito.objects.get()), Decimal("600.00")
+        )
+        self.assertEqual(
+            [(i["nombre"], i["cantidad"]) for i in respuesta.context["items"]],
+            [("Playera", 3), ("Gorra", 3)],
+        )
+
+    def test_la_sesion_solo_guarda_la_clave(self):
+        for _ in range(5):
+            self._agregar(self.playera, 1)
+        self.assertNotIn("carrito", self.client.session)
+        self.assertEqual(
+            self.client.session["carrito_clave"], Carrito.objects.get().clave
+        )
+
+    def test_checkout_vacia_el_carrito(self):
+        self._agregar(self.playera, 2)
+        datos = {
+            "nombre_completo": "Cliente", "email": "c@ejemplo.com",
+            "telefono": "5512345678", "direccion": "Calle 1", "ciudad": "CDMX",
+            "estado": "CDMX", "codigo_postal": "01000", "metodo_pago": "tarjeta",
+        }
+        self.client.post(reverse("checkout_pedido"), datos)
+
+        pedido = Pedido.objects.get()
+        self.assertEqual(pedido.total, Decimal("399.80"))
+        self.assertFalse(CarritoItem.objects.exists())
+
+    def test_fusiona_carritos_al_iniciar_sesion(self):
+        usuario = User.objects.create_user("ana", password="secreta-123")
+        previo = Carrito.objects.create(clave="previo", usuario=usuario)
+        CarritoItem.objects.create(carrito=previo, producto=self.playera, talla="", cantidad=1)
+        reservar("previo", self.playera, "", 1)
+
+        self._agregar(self.playera, 2)
+        self._agregar(self.gorra, 1)
+        self.client.login(username="ana", password="secreta-123")
+
+        self.assertEqual(Carrito.objects.get(), previo)
+        self.assertEqual(self.client.session["carrito_clave"], "previo")
+        self.assertEqual(
+            previo.items.get(producto=self.playera, talla="").cantidad, 3
+        )
+        self.assertEqual(
+            Reserva.objects.get(producto=self.playera).cantidad, 3
+        )
+
+
+class MigracionesDeDatosTests(SimpleTestCase):
+    def test_no_importan_codigo_de_la_app(self):
+        carpeta = os.path.join(os.path.dirname(__file__), "migrations")
+        for nombre in sorted(os.listdir(carpeta)):
+            if not nombre.endswith(".py"):
+                continue
+            with open(os.path.join(carpeta, nombre), encoding="utf-8") as archivo:
+                fuente = archivo.read()
+            with self.subTest(migracion=nombre):
+                self.assertNotRegex(fuente, r"(?m)^\s*(from|import)\s+catalogo\b")
+
+    def test_copias_iguales_a_las_de_la_app(self):
+        busqueda = importlib.import_module("catalogo.migrations.0009_busqueda")
+        variantes = importlib.import_module("catalogo.migrations.0011_variantes")
+        texto = ("Suéter de lana", "Para el frío, con cuello alto y lana 100%")
+        self.assertEqual(busqueda.terminos_de(*texto), terminos_de(*texto))
+        self.assertEqual(variantes.repartir_stock(10, ["S", "M", "L"]), repartir_stock(10, ["S", "M", "L"]))
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.sueter = Producto.objects.create(
+            nombre="Suéter negro", categoria="Suéteres", precio="500.00",
+            descripcion="Suéter de lana tejido.",
+        )
+        self.playera = Producto.objects.create(
+            nombre="Playera básica", categoria="Camisas", precio="150.00",
+            descripcion="Combina con tu sueter favorito.",
+        )
+
+    def test_normaliza_acentos(self):
+        self.assertEqual(normalizar("Suéter PANTALÓN"), "sueter pantalon")
+
+    def test_sin_acento_encuentra_con_acento_y_ordena_por_relevancia(self):
+        self.assertEqual(list(buscar("sueter")), [self.sueter, self.playera])
+        self.assertEqual(list(buscar("SUÉTER negro")), [self.sueter])
+
+    def test_filtra_por_categoria(self):
+        self.assertEqual(list(buscar("sueter", categoria="Camisas")), [self.playera])
+
+    def test_reindexa_al_guardar_y_quita_inactivos(self):
+        self.playera.nombre = "Gorra"
+        self.playera.descripcion = ""
+        self.playera.save()
+        self.assertEqual(list(buscar("gorra")), [self.playera])
+        self.assertEqual(list(buscar("playera")), [])
+
+        self.playera.activo = False
+        self.playera.save()
+        self.assertEqual(list(buscar("gorra")), [])
+
+    def test_vista_pagina_resultados(self):
+        respuesta = self.client.get(
+            reverse("buscar_productos"), {"q": "sueter", "por_pagina": 1}
+        )
+        self.assertEqual(list(respuesta.context["productos"]), [self.sueter])
+        self.assertTrue(respuesta.context["productos"].has_next())
+
+
+class MiniaturasTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _png(self, tamano=(1600, 1200)):
+        contenido = BytesIO()
+        Image.new("RGBA", tamano, (200, 30, 30, 255)).save(contenido, "PNG")
+        return SimpleUploadedFile("hoodie.png", contenido.getvalue(), "image/png")
+
+    def test_genera_derivados_al_subir_la_imagen(self):
+        producto = Producto.objects.create(
+            nombre="Hoodie", precio="650.00", imagen=self._png()
+        )
+        producto.refresh_from_db()
+
+        self.assertEqual(producto.miniaturas["origen"], producto.imagen.name)
+        nombre = producto.miniaturas["tarjeta"]["webp"]["320"]
+        self.assertIn(producto.miniaturas["huella"], nombre)
+        with Image.open(f"{self.media}/{nombre}") as miniatura:
+            self.assertEqual((miniatura.format, miniatura.width), ("WEBP", 320))
+
+        self.assertTrue(producto.url_linea.endswith("-64.jpeg"))
+        self.assertIn(" 640w", producto.srcset("tarjeta", "webp"))
+
+    def test_sin_derivados_usa_la_original(self):
+        producto = Producto.objects.create(nombre="Hoodie", precio="1.00")
+        Producto.objects.filter(id=producto.id).update(imagen="productos/x.png")
+        producto.refresh_from_db()
+        self.assertEqual(producto.url_tarjeta, "/media/productos/x.png")
+        self.assertEqual(producto.srcset("tarjeta"), "")
+
+    def test_tarjeta_usa_picture_con_srcset(self):
+        Producto.objects.create(nombre="Hoodie", precio="650.00", imagen=self._png())
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertContains(respuesta, '<source type="image/webp"')
+        self.assertContains(respuesta, 'loading="lazy"')
+
+
+class EstaticosTests(SimpleTestCase):
+    def setUp(self):
+        self.fuentes = tempfile.mkdtemp()
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.fuentes)
+        self.addCleanup(shutil.rmtree, self.destino)
+
+        with open(f"{self.fuentes}/tienda.css", "w") as css:
+            css.write(".producto-card { color: #111827; }\n" * 100)
+        Image.effect_noise((400, 300), 80).convert("RGB").save(f"{self.fuentes}/hero.png")
+
+        ajustes = override_settings(
+            STATICFILES_DIRS=[self.fuentes],
+            STATIC_ROOT=self.destino,
+            SERVIR_ESTATICOS=True,
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "tienda.estaticos.EstaticosComprimidos"},
+            },
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+        with open(f"{self.destino}/staticfiles.json") as manifest:
+            self.rutas = json.load(manifest)["paths"]
+        self.middleware = EstaticosPrecomprimidosMiddleware(lambda request: None)
+
+    def _get(self, nombre, **cabeceras):
+        request = RequestFactory().get(f"/static/{nombre}", headers=cabeceras)
+        return self.middleware(request)
+
+    def test_sirve_gzip_con_cache_inmutable(self):
+        css = self.rutas["tienda.css"]
+        respuesta = self._get(css, accept_encoding="gzip, deflate")
+
+        self.assertEqual(respuesta["Content-Encoding"], "gzip")
+        self.assertEqual(respuesta["Content-Type"], "text/css")
+        self.assertIn("immutable", respuesta["Cache-Control"])
+        self.assertIn("Accept-Encoding", respuesta["Vary"])
+        cuerpo = gzip.decompress(b"".join(respuesta.streaming_content))
+        self.assertIn(b".producto-card", cuerpo)
+
+    def test_sin_hash_o_sin_soporte_sirve_el_original(self):
+        respuesta = self._get("tienda.css")
+        self.assertNotIn("Content-Encoding", respuesta)
+        self.assertNotIn("immutable", respuesta["Cache-Control"])
+
+    def test_no_sirve_codificaciones_con_q_cero(self):
+        css = self.rutas["tienda.css"]
+        self.assertNotIn("Content-Encoding", self._get(css, accept_encoding="gzip;q=0, deflate"))
+        self.assertNotIn("Content-Encoding", self._get(css, accept_encoding="*;q=0"))
+        self.assertEqual(self._get(css, accept_encoding="br;q=0, *")["Content-Encoding"], "gzip")
+
+    def test_negocia_webp_para_imagenes(self):
+        png = self.rutas["hero.png"]
+        self.assertEqual(self._get(png, accept="image/webp,*/*")["Content-Type"], "image/webp")
+        self.assertEqual(self._get(png)["Content-Type"], "image/png")
+        self.assertEqual(self._get(png, accept="image/webp;q=0, */*")["Content-Type"], "image/png")
+
+    def test_no_sale_de_static_root(self):
+        self.assertIsNone(self._get("../../etc/passwd"))
+
+
+class PresupuestoConsultasTests(PresupuestoConsultasMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("ana", password="secreta-123")
+        self.productos = [
+            Producto.objects.create(nombre=f"Playera {i}", precio="100.00", stock=50)
+            for i in range(5)
+        ]
+
+    def _comprar(self):
+        for producto in self.productos:
+            self.client.post(
+                reverse("agregar_al_carrito", args=[producto.id]),
+                {"talla": "", "cantidad": 1},
+            )
+        return self.client.post(
+            reverse("checkout_pedido"),
+            {
+                "nombre_completo": "Ana", "email": "ana@ejemplo.com",
+                "telefono": "5512345678", "direccion": "Calle 1", "ciudad": "CDMX",
+                "estado": "CDMX", "codigo_postal": "01000", "metodo_pago": "tarjeta",
+            },
+        )
+
+    def _urls_catalogo(self):
+        return (
+            reverse("inicio"),
+            reverse("lista_productos"),
+            reverse("detalle_producto", args=[self.productos[0].id]),
+            reverse("buscar_productos") + "?q=playera",
+        )
+
+    def test_vistas_del_catalogo(self):
+        for url in self._urls_catalogo():
+            with self.subTest(url=url):
+                self.assertDentroDePresupuesto(self.client.get(url))
+
+    def test_vistas_del_catalogo_con_sesion(self):
+        # El presupuesto incluye la sesión y el usuario que cargan los
+        # middlewares, también con la caché fría.
+        self.client.login(username="ana", password="secreta-123")
+        for url in self._urls_catalogo():
+            with self.subTest(url=url):
+                self.assertDentroDePresupuesto(self.client.get(url))
+
+    def test_carrito_y_checkout(self):
+        self.client.login(username="ana", password="secreta-123")
+        self.assertDentroDePresupuesto(self.client.post(
+            reverse("agregar_al_carrito", args=[self.productos[0].id]),
+            {"talla": "", "cantidad": 1},
+        ))
+        self.assertDentroDePresupuesto(self._comprar())
+        self.assertDentroDePresupuesto(self.client.get(reverse("ver_carrito")))
+
+    def test_pedidos(self):
+        self.client.login(username="ana", password="secreta-123")
+        self._comprar()
+        pedido = Pedido.objects.get()
+
+        for url in (
+            reverse("mis_pedidos"),
+            reverse("detalle_pedido", args=[pedido.id]),
+            reverse("pedido_confirmacion", args=[pedido.codigo]),
+        ):
+            with self.subTest(url=url):
+                self.assertDentroDePresupuesto(self.client.get(url))
+
+        respuesta = self.client.post(reverse("trackear_pedido"), {"codigo": pedido.codigo})
+        self.assertDentroDePresupuesto(respuesta)
+
+    def test_reportes(self):
+        self._comprar()
+        User.objects.filter(id=self.usuario.id).update(is_staff=True)
+        self.client.login(username="ana", password="secreta-123")
+        self.assertDentroDePresupuesto(self.client.get(reverse("reportes")))
+
+    @override_settings(METRICAS_CONSULTAS_CABECERA=True)
+    def test_cabecera_de_depuracion(self):
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertRegex(respuesta["X-Consultas"], r"^n=\d+; ms=[\d.]+; duplicadas=0$")
+
+    def test_detecta_consultas_repetidas(self):
+        registro = RegistroConsultas()
+        with connection.execute_wrapper(registro):
+            for producto in self.productos:
+                Producto.objects.get(id=producto.id)
+        self.assertEqual(list(registro.duplicadas.values()), [5])
+
+
+class SembrarDatosTests(TestCase):
+    def test_siembra_catalogo_y_pedidos_con_fechas_repartidas(self):
+        call_command(
+            "sembrar_datos", productos=30, pedidos=40, usuarios=3, lote=16,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Producto.objects.count(), 30)
+        self.assertEqual(Pedido.objects.count(), 40)
+        self.assertTrue(PedidoItem.objects.filter(pedido__usuario__isnull=False).exists())
+        fechas = set(Pedido.objects.values_list("creado_en__date", flat=True))
+        self.assertGreater(len(fechas), 1)
+
+
+class VarianteProductoTests(TestCase):
+    def setUp(self):
+        self.playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=5)
+        VarianteProducto.objects.bulk_create([
+            VarianteProducto(producto=self.playera, talla="S", stock=0),
+            VarianteProducto(producto=self.playera, talla="M", stock=2),
+            VarianteProducto(producto=self.playera, talla="L", stock=3),
+        ])
+
+    def test_reparte_stock_entre_tallas(self):
+        self.assertEqual(repartir_stock(10, ["S", "M", "L"]), {"S": 4, "M": 3, "L": 3})
+
+    def test_talla_del_mismo_largo_en_todos_los_modelos(self):
+        for modelo in (VarianteProducto, CarritoItem, Reserva, PedidoItem, VentaDiaria):
+            with self.subTest(modelo=modelo.__name__):
+                self.assertEqual(modelo._meta.get_field("talla").max_length, MAX_TALLA)
+
+    def test_reserva_valida_stock_de_la_talla(self):
+        reservar("a", self.playera, "M", 2)
+
+        with self.assertRaises(StockInsuficiente):
+            reservar("b", self.playera, "M", 1)
+        with self.assertRaises(TallaInvalida):
+            reservar("b", self.playera, "XXL", 1)
+        with self.assertRaises(TallaInvalida):
+            reservar("b", self.playera, "", 1)
+        reservar("b", self.playera, "L", 3)
+
+        self.assertEqual(
+            disponibles_por_talla(self.playera, "c"), {"S": 0, "M": 0, "L": 0}
+        )
+
+    def test_pedido_descuenta_variante_y_producto(self):
+        registrar_pedido(_pedido(), [_item(self.playera, 2, "M"), _item(self.playera, 1, "L")])
+
+        self.assertEqual(
+            dict(self.playera.variantes.values_list("talla", "stock")),
+            {"S": 0, "M": 0, "L": 2},
+        )
+        self.playera.refresh_from_db()
+        self.assertEqual(self.playera.stock, 2)
+
+    def test_pedido_rechaza_talla_agotada_sin_tocar_stock(self):
+        with self.assertRaises(StockInsuficiente):
+            registrar_pedido(_pedido(), [_item(self.playera, 1, "L"), _item(self.playera, 1, "S")])
+
+        self.assertEqual(self.playera.variantes.get(talla="L").stock, 3)
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_catalogo_filtra_por_talla_en_existencia(self):
+        gorra = Producto.objects.create(nombre="Gorra", precio="99.00", stock=4)
+
+        respuesta = self.client.get(reverse("lista_productos"), {"talla": "M"})
+        self.assertEqual(list(respuesta.context["productos"]), [self.playera])
+
+        respuesta = self.client.get(reverse("lista_productos"), {"talla": "S"})
+        self.assertEqual(list(respuesta.context["productos"]), [])
+
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertEqual(list(respuesta.context["productos"]), [gorra, self.playera])
+
+    def test_detalle_muestra_tallas_con_disponible(self):
+        respuesta = self.client.get(reverse("detalle_producto", args=[self.playera.id]))
+
+        self.assertEqual(respuesta.context["tallas"], {"S": 0, "M": 2, "L": 3})
+        self.assertEqual(respuesta.context["disponible"], 5)
+        self.assertContains(respuesta, "M (2 disponibles)")
+
+
+class CodigoPedidoTests(TestCase):
+    def test_permutacion_sin_colisiones_en_medio_millon_de_pedidos(self):
+        # Un día con 500k pedidos: los códigos de ese día sólo difieren en
+        # el bloque que sale de permutar(id).
+        bloques = {permutar(numero) for numero in range(1, 500_001)}
+        self.assertEqual(len(bloques), 500_000)
+        self.assertLess(max(bloques), 2 ** BITS)
+
+    def test_pedidos_del_mismo_dia_reciben_codigos_unicos_y_verificables(self):
+        codigos = set()
+        for _ in range(200):
+            pedido = _pedido()
+            pedido.save()
+            codigos.add(pedido.codigo)
+            self.assertEqual(normalizar_codigo(pedido.codigo), pedido.codigo)
+
+        self.assertEqual(len(codigos), 200)
+        self.assertEqual(
+            set(Pedido.objects.values_list("codigo", flat=True)), codigos
+        )
+
+    def test_normaliza_lo_que_escribe_el_cliente(self):
+        codigo = codigo_pedido(12345, date(2026, 10, 18))
+        escrito = codigo.lower().replace("-", " ").replace("0", "o")
+
+        self.assertEqual(normalizar_codigo(escrito), codigo)
+        self.assertEqual(normalizar_codigo(" pw-20251126-0d65 "), "PW-20251126-0D65")
+
+    def test_rechaza_un_caracter_cambiado(self):
+        codigo = codigo_pedido(12345, date(2026, 10, 18))
+        for posicion in range(12, len(codigo)):
+            if codigo[posicion] == "-":
+                continue
+            otro = "A" if codigo[posicion] != "A" else "B"
+            with self.assertRaises(CodigoInvalido):
+                normalizar_codigo(codigo[:posicion] + otro + codigo[posicion + 1:])
+
+    def test_trackear_con_codigo_mal_escrito_no_consulta_pedidos(self):
+        pedido = _pedido()
+        pedido.save()
+        errado = pedido.codigo[:-1] + ("A" if pedido.codigo[-1] != "A" else "B")
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse("trackear_pedido"), {"codigo": errado})
+        self.assertIsNone(respuesta.context["pedido"])
+        self.assertFalse([q for q in consultas if "catalogo_pedido" in q["sql"]])
+
+        respuesta = self.client.post(
+            reverse("trackear_pedido"), {"codigo": pedido.codigo.lower()}
+        )
+        self.assertEqual(respuesta.context["pedido"]["id"], pedido.id)
+
+
+class SeguimientoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pedido = _pedido()
+        self.pedido.save()
+
+    def test_consulta_repetida_sale_de_cache_y_se_invalida_al_cambiar_estado(self):
+        url = reverse("trackear_pedido")
+        self.client.post(url, {"codigo": self.pedido.codigo})
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, {"codigo": self.pedido.codigo})
+        self.assertFalse([q for q in consultas if "catalogo_pedido" in q["sql"]])
+        self.assertContains(respuesta, "Pendiente de pago")
+
+        self.pedido.estado_pedido = "enviado"
+        self.pedido.save()
+        self.assertContains(self.client.post(url, {"codigo": self.pedido.codigo}), "Enviado")
+
+    def test_codigo_inexistente_no_vuelve_a_consultar(self):
+        url = reverse("trackear_pedido")
+        self.client.post(url, {"codigo": "PW-20200101-ABCD"})
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(url, {"codigo": "PW-20200101-ABCD"})
+        self.assertIsNone(respuesta.context["pedido"])
+        self.assertFalse([q for q in consultas if "catalogo_pedido" in q["sql"]])
+
+    @override_settings(CATALOGO_SEGUIMIENTO_LIMITE=(3, 1))
+    def test_limita_consultas_por_cliente(self):
+        url = reverse("trackear_pedido")
+        for _ in range(3):
+            self.assertEqual(self.client.post(url, {"codigo": self.pedido.codigo}).status_code, 200)
+
+        self.assertEqual(self.client.post(url, {"codigo": self.pedido.codigo}).status_code, 429)
+        respuesta = self.client.get(reverse("estado_pedido", args=[self.pedido.codigo]))
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertIn("Retry-After", respuesta)
+
+        otro = self.client_class(REMOTE_ADDR="10.1.1.1")
+        self.assertEqual(otro.post(url, {"codigo": self.pedido.codigo}).status_code, 200)
+
+    def test_estado_json_con_etag(self):
+        url = reverse("estado_pedido", args=[self.pedido.codigo.lower()])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["estado"], "pendiente")
+        etag = respuesta["ETag"]
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(len(consultas), 0)
+
+        self.pedido.estado_pedido = "enviado"
+        self.pedido.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["estado"], "enviado")
+
+        self.assertEqual(
+            self.client.get(reverse("estado_pedido", args=["PW-20200101-ABCD"])).status_code,
+            404,
+        )
+
+
+class HistorialPedidosTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user("ana", password="secreta-123")
+        self.gorra = Producto.objects.create(nombre="Gorra", precio="0.10", stock=100)
+        self.playera = Producto.objects.create(nombre="Playera", precio="19.99", stock=100)
+
+    def _registrar(self):
+        pedido = _pedido()
+        pedido.usuario = self.usuario
+        return registrar_pedido(pedido, [_item(self.gorra, 3), _item(self.playera, 7)])
+
+    @override_settings(CATALOGO_PEDIDOS_POR_PAGINA=2)
+    def test_historial_paginado_con_totales_de_la_base(self):
+        pedidos = [self._registrar() for _ in range(3)]
+        self.client.force_login(self.usuario)
+
+        pagina = self.client.get(reverse("mis_pedidos")).context["pedidos"]
+        self.assertEqual([p.id for p in pagina], [pedidos[2].id, pedidos[1].id])
+        self.assertEqual(pagina[0].num_articulos, 10)
+        self.assertEqual(pagina[0].total_lineas, Decimal("140.23"))
+
+        pagina = self.client.get(reverse("mis_pedidos"), {"pagina": 2}).context["pedidos"]
+        self.assertEqual([p.id for p in pagina], [pedidos[0].id])
+
+    def test_detalle_y_confirmacion_usan_el_total_exacto(self):
+        pedido = self._registrar()
+        self.client.force_login(self.usuario)
+
+        for respuesta in (
+            self.client.get(reverse("detalle_pedido", args=[pedido.id])),
+            self.client.get(reverse("pedido_confirmacion", args=[pedido.codigo])),
+        ):
+            self.assertEqual(respuesta.context["total_pedido"], pedido.total)
+            self.assertEqual(
+                [item.importe for item in respuesta.context["items"]],
+                [Decimal("0.30"), Decimal("139.93")],
+            )
+
+
+class FragmentosCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=5)
+
+    def test_tarjeta_sale_de_cache_hasta_que_cambia_el_producto(self):
+        self.client.get(reverse("lista_productos"))
+        Producto.objects.filter(id=self.playera.id).update(nombre="Cambio sin señal")
+
+        self.assertContains(self.client.get(reverse("lista_productos")), "Playera")
+        self.assertEqual(estadisticas(["tarjeta"])["tarjeta"], (1, 1))
+
+        self.playera.refresh_from_db()
+        self.playera.nombre = "Playera básica"
+        self.playera.save()
+        self.assertContains(self.client.get(reverse("lista_productos")), "Playera básica")
+
+    def test_checkout_invalida_tarjetas_de_lo_vendido(self):
+        self.client.get(reverse("lista_productos"))
+        registrar_pedido(_pedido(), [_item(self.playera, 2)])
+
+        self.assertContains(self.client.get(reverse("lista_productos")), "Stock: 3")
+
+    def test_detalle_cachea_lo_fijo_pero_no_lo_de_la_sesion(self):
+        url = reverse("detalle_producto", args=[self.playera.id])
+        self.client.get(url)
+        Producto.objects.filter(id=self.playera.id).update(precio="99.00")
+        reservar("otro-carrito", self.playera, "", 2)
+
+        respuesta = self.client.get(url)
+        self.assertContains(respuesta, "$199.90")
+        self.assertContains(respuesta, "<strong>3</strong> piezas", html=False)
+        self.assertContains(respuesta, "csrfmiddlewaretoken")
+
+    def test_inicio_en_cache_solo_para_anonimos(self):
+        self.client.get(reverse("inicio"))
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse("inicio"))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(consultas), 0)
+        self.assertIn("Cookie", respuesta["Vary"])
+
+        usuario = User.objects.create_user("ana", password="secreta-123")
+        self.client.force_login(usuario)
+        self.assertContains(self.client.get(reverse("inicio")), "Hola, ana")
+        self.assertEqual(estadisticas(["inicio"])["inicio"], (1, 1))
+
+    def test_comando_estadisticas(self):
+        self.client.get(reverse("lista_productos"))
+        self.client.get(reverse("lista_productos"))
+
+        salida = StringIO()
+        call_command("estadisticas_cache", reiniciar=True, stdout=salida)
+        self.assertRegex(salida.getvalue(), r"tarjeta\s+1\s+1\s+50%")
+        self.assertEqual(estadisticas(["tarjeta"])["tarjeta"], (0, 0))
+
+
+class RespuestasCondicionalesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.playera = Producto.objects.create(nombre="Playera", precio="199.90", stock=5)
+
+    def _revalidar(self, url, respuesta):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=respuesta["ETag"])
+
+    def test_detalle_producto_304_hasta_que_cambia_la_disponibilidad(self):
+        url = reverse("detalle_producto", args=[self.playera.id])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta["Cache-Control"], "private, no-cache")
+
+        no_modificada = self._revalidar(url, respuesta)
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertEqual(no_modificada.content, b"")
+
+        reservar("otro-carrito", self.playera, "", 2)
+        respuesta_nueva = self._revalidar(url, respuesta)
+        self.assertContains(respuesta_nueva, "<strong>3</strong> piezas", html=False)
+
+        self.playera.precio = "99.00"
+        self.playera.save()
+        self.assertContains(self._revalidar(url, respuesta_nueva), "$99.00")
+
+    def test_detalle_producto_inactivo_es_404(self):
+        self.playera.activo = False
+        self.playera.save()
+        respuesta = self.client.get(reverse("detalle_producto", args=[self.playera.id]))
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_lista_cambia_de_etag_con_el_catalogo_y_el_usuario(self):
+        url = reverse("lista_productos")
+        respuesta = self.client.get(url)
+        self.assertEqual(self._revalidar(url, respuesta).status_code, 304)
+
+        registrar_pedido(_pedido(), [_item(self.playera, 2)])
+        self.assertContains(self._revalidar(url, respuesta), "Stock: 3")
+
+        respuesta = self.client.get(url)
+        self.client.force_login(User.objects.create_user("ana", password="secreta-123"))
+        self.assertEqual(self._revalidar(url, respuesta).status_code, 200)
+
+    def test_pedido_304_con_last_modified_y_permisos_primero(self):
+        usuario = User.objects.create_user("ana", password="secreta-123")
+        pedido = _pedido()
+        pedido.usuario = usuario
+        pedido = registrar_pedido(pedido, [_item(self.playera, 1)])
+        self.client.force_login(usuario)
+
+        for url in (
+            reverse("detalle_pedido", args=[pedido.id]),
+            reverse("pedido_confirmacion", args=[pedido.codigo]),
+        ):
+            respuesta = self.client.get(url)
+            self.assertIn("Last-Modified", respuesta)
+            self.assertEqual(self._revalidar(url, respuesta).status_code, 304)
+
+        url = reverse("detalle_pedido", args=[pedido.id])
+        respuesta = self.client.get(url)
+        pedido.estado_pedido = "enviado"
+        pedido.save()
+        self.assertEqual(self._revalidar(url, respuesta).status_code, 200)
+
+        self.client.logout()
+        self.assertRedirects(
+            self._revalidar(url, respuesta), reverse("inicio"), fetch_redirect_response=False
+        )
+
+
+class ImportacionCatalogoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _importar(self, contenido, sufijo=".csv", **opciones):
+        with tempfile.NamedTemporaryFile("w", suffix=sufijo, encoding="utf-8", delete=False) as archivo:
+            archivo.write(contenido)
+        self.addCleanup(os.remove, archivo.name)
+        salida, errores = StringIO(), StringIO()
+        call_command("importar_catalogo", archivo.name, stdout=salida, stderr=errores, **opciones)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_crea_actualiza_y_reporta_errores_por_fila(self):
+        Producto.objects.create(nombre="Gorra", sku="GOR-1", precio="150.00", stock=3)
+        salida, errores = self._importar(
+            "sku,nombre,categoria,precio,stock,tallas,imagen\n"
+            "SUE-1,Suéter de lana,Suéteres,799.00,,S:2|M:5,\n"
+            "GOR-1,,,175.50,,,\n"
+            "MAL-1,Sin precio,Otros,,4,,\n"
+            "MAL-2,Precio raro,Otros,abc,4,,\n"
+            "MAL-3,Con URL,Otros,10,4,,https://proveedor.com/foto.jpg\n"
+        )
+
+        self.assertIn("1 creados, 1 actualizados, 3 con error", salida)
+        self.assertIn("Línea 4: El sku MAL-1 no existe; para crearlo faltan: precio.", errores)
+        self.assertIn("Línea 5: precio:", errores)
+        self.assertIn("Línea 6: imagen:", errores)
+
+        gorra = Producto.objects.get(sku="GOR-1")
+        self.assertEqual((gorra.nombre, gorra.precio, gorra.stock), ("Gorra", Decimal("175.50"), 3))
+        sueter = Producto.objects.get(sku="SUE-1")
+        self.assertEqual(sueter.stock, 7)
+        self.assertEqual(
+            dict(sueter.variantes.values_list("talla", "stock")), {"S": 2, "M": 5}
+        )
+        self.assertEqual(list(buscar("lana")), [sueter])
+        self.assertIn("Suéteres", [c["categoria"] for c in categorias_con_conteo()])
+
+    def test_tallas_reemplazan_variantes_e_invalida_tarjetas(self):
+        producto = Producto.objects.create(nombre="Playera", sku="PLA-1", precio="199.90")
+        VarianteProducto.objects.create(producto=producto, talla="XL", stock=9)
+        self.client.get(reverse("lista_productos"))
+
+        self._importar(
+            '{"sku": "PLA-1", "precio": 149.9, "tallas": {"M": 4}}\n\n', sufijo=".jsonl"
+        )
+
+        self.assertEqual(list(producto.variantes.values_list("talla", "stock")), [("M", 4)])
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertContains(respuesta, "149.90")
+        self.assertContains(respuesta, "Stock: 4")
+
+    def test_stock_sin_tallas_de_producto_con_variantes_se_rechaza(self):
+        producto = Producto.objects.create(nombre="Playera", sku="PLA-1", precio="199.90", stock=4)
+        VarianteProducto.objects.create(producto=producto, talla="M", stock=4)
+        Producto.objects.create(nombre="Gorra", sku="GOR-1", precio="150.00", stock=3)
+
+        salida, errores = self._importar(
+            "sku,precio,stock,tallas\n"
+            "PLA-1,149.90,50,\n"
+            "GOR-1,,8,\n"
+        )
+
+        self.assertIn("0 creados, 1 actualizados, 1 con error", salida)
+        self.assertIn("Línea 2: El producto tiene tallas", errores)
+        producto.refresh_from_db()
+        self.assertEqual((producto.precio, producto.stock), (Decimal("199.90"), 4))
+        self.assertEqual(Producto.objects.get(sku="GOR-1").stock, 8)
+
+    def test_conflicto_en_la_base_solo_rechaza_esa_fila(self):
+        primero = Producto.objects.create(nombre="Uno", sku="UNO", precio="10.00")
+        Producto.objects.create(nombre="Dos", sku="DOS", precio="10.00")
+
+        salida, errores = self._importar(
+            "id,sku,nombre,precio\n"
+            f"{primero.id},DOS,,\n"
+            ",TRES,Tres,30.00\n"
+        )
+
+        self.assertIn("1 creados, 0 actualizados, 1 con error", salida)
+        self.assertIn("Línea 2: La base rechazó la fila", errores)
+        self.assertTrue(Producto.objects.filter(sku="TRES").exists())
+        primero.refresh_from_db()
+        self.assertEqual(primero.sku, "UNO")
+
+    def test_simular_no_escribe(self):
+        salida, _ = self._importar("sku,nombre,precio\nNUEVO,Nuevo,10\n", simular=True)
+        self.assertIn("Simulación: 1 creados", salida)
+        self.assertFalse(Producto.objects.filter(sku="NUEVO").exists())
+
+    def test_exportacion_se_puede_reimportar(self):
+        producto = Producto.objects.create(nombre="Pantalón, recto", precio="450.00", activo=False)
+        VarianteProducto.objects.create(producto=producto, talla="32", stock=2)
+
+        for formato in ("csv", "jsonl"):
+            exportado = StringIO()
+            call_command("exportar_catalogo", formato=formato, stdout=exportado)
+            if formato == "csv":
+                self.assertIn('"Pantalón, recto"', exportado.getvalue())
+            salida, errores = self._importar(exportado.getvalue(), sufijo=f".{formato}")
+            self.assertIn("0 creados, 1 actualizados, 0 con error", salida, errores)
+
+        producto.refresh_from_db()
+        self.assertEqual((producto.nombre, producto.activo, producto.stock), ("Pantalón, recto", False, 2))
+
+    def test_accion_del_admin_exporta_en_streaming(self):
+        Producto.objects.create(nombre="Gorra", sku="GOR-1", precio="150.00")
+        self.client.force_login(User.objects.create_superuser("admin", "a@ejemplo.com", "secreta-123"))
+
+        respuesta = self.client.post(
+            reverse("admin:catalogo_producto_changelist"),
+            {"action": "exportar_jsonl", "_selected_action": Producto.objects.values_list("id", flat=True)},
+        )
+
+        self.assertTrue(respuesta.streaming)
+        fila = json.loads(b"".join(respuesta.streaming_content))
+        self.assertEqual((fila["sku"], fila["precio"]), ("GOR-1", "150.00"))
+
+
+class ReportesTests(TestCase):
+    def setUp(self):
+        self.hoy = timezone.localdate()
+        self.camisa = Producto.objects.create(nombre="Camisa", categoria="Camisas", precio="300.00", stock=50)
+        self.gorra = Producto.objects.create(nombre="Gorra", categoria="Accesorios", precio="100.00", stock=50)
+
+        self._pedido(self.camisa, 2, dias=1)
+        self._pedido(self.gorra, 1, dias=1, metodo_pago="transferencia")
+        self._pedido(self.camisa, 5, dias=1, estado_pedido="cancelado")
+        self._pedido(self.gorra, 3, dias=0)
+        self._pedido(self.gorra, 9, dias=40)
+
+    def _pedido(self, producto, cantidad, dias, **campos):
+        pedido = registrar_pedido(_pedido(), [_item(producto, cantidad)])
+        creado_en = timezone.now() - timedelta(days=dias)
+        Pedido.objects.filter(id=pedido.id).update(creado_en=creado_en, **campos)
+
+    def test_agregados_del_rango(self):
+        desde = self.hoy - timedelta(days=7)
+        ayer = self.hoy - timedelta(days=1)
+
+        self.assertEqual(
+            list(reportes.ventas_por_dia(desde, self.hoy)),
+            [(ayer, 2, Decimal("700.00")), (self.hoy, 1, Decimal("300.00"))],
+        )
+        self.assertEqual(
+            list(reportes.ventas_por_categoria(desde, self.hoy)),
+            [("Camisas", 2, Decimal("600.00")), ("Accesorios", 4, Decimal("400.00"))],
+        )
+        self.assertEqual(
+            dict((e, n) for e, n, _ in reportes.pedidos_por_estado(desde, self.hoy)),
+            {"pendiente": 3, "cancelado": 1},
+        )
+        self.assertEqual(
+            list(reportes.ventas_por_metodo_pago(desde, self.hoy)),
+            [("tarjeta", 2, Decimal("900.00")), ("transferencia", 1, Decimal("100.00"))],
+        )
+
+    def test_stock_bajo_por_talla_y_por_producto(self):
+        Producto.objects.filter(id=self.camisa.id).update(stock=3)
+        VarianteProducto.objects.create(producto=self.gorra, talla="U", stock=1)
+        VarianteProducto.objects.create(producto=self.gorra, talla="XL", stock=20)
+
+        self.assertEqual(
+            list(reportes.stock_bajo(umbral=5)),
+            [(self.gorra.id, "Gorra", "U", 1), (self.camisa.id, "Camisa", "", 3)],
+        )
+
+    def test_solo_personal_y_csv_en_streaming(self):
+        url = reverse("reportes")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        self.assertContains(self.client.get(url), "Ventas por categoría")
+
+        respuesta = self.client.get(url, {"exportar": "dia", "desde": self.hoy - timedelta(days=60)})
+        self.assertTrue(respuesta.streaming)
+        lineas = b"".join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], "dia,pedidos,importe")
+        self.assertEqual(len(lineas), 4)
+
+        self.assertEqual(self.client.get(url, {"exportar": "nada"}).status_code, 404)
+
+
+class VentasDiariasTests(TestCase):
+    def setUp(self):
+        self.hoy = timezone.localdate()
+        self.camisa = Producto.objects.create(nombre="Camisa", categoria="Camisas", precio="300.00", stock=50)
+        self.gorra = Producto.objects.create(nombre="Gorra", categoria="Accesorios", precio="100.00", stock=50)
+        self.viejo = self._pedido(self.camisa, 2, dias=3)
+        self._pedido(self.gorra, 1, dias=3)
+        self._pedido(self.gorra, 4, dias=2)
+        self._pedido(self.camisa, 1, dias=0)
+        # Nada cambió en la última hora.
+        Pedido.objects.update(actualizado_en=timezone.now() - timedelta(hours=1))
+
+    def _pedido(self, producto, cantidad, dias):
+        pedido = registrar_pedido(_pedido(), [_item(producto, cantidad)])
+        Pedido.objects.filter(id=pedido.id).update(creado_en=timezone.now() - timedelta(days=dias))
+        pedido.refresh_from_db()
+        return pedido
+
+    def _dia(self, dias):
+        return ventas.dia_local(timezone.now() - timedelta(days=dias))
+
+    def test_resumen_da_lo_mismo_que_las_lineas(self):
+        desde = self.hoy - timedelta(days=7)
+        en_vivo = reportes.ventas_por_categoria(desde, self.hoy)
+
+        self.assertEqual(len(ventas.actualizar()), 3)
+        self.assertEqual(
+            set(VentaDiaria.objects.filter(dia=self._dia(3)).values_list("producto_id", "piezas")),
+            {(self.camisa.id, 2), (self.gorra.id, 1)},
+        )
+        with CaptureQueriesContext(connection) as consultas:
+            resumido = reportes.ventas_por_categoria(desde, self.hoy)
+        self.assertEqual(resumido, en_vivo)
+        self.assertTrue(any("catalogo_ventadiaria" in q["sql"] for q in consultas))
+
+    def test_solo_recalcula_los_dias_que_cambiaron(self):
+        ventas.actualizar()
+        self.assertEqual(ventas.actualizar(), [])
+
+        self._pedido(self.gorra, 1, dias=2)
+        self.assertEqual(ventas.actualizar(), [self._dia(2)])
+        self.assertEqual(
+            VentaDiaria.objects.get(dia=self._dia(2), producto=self.gorra).piezas, 5
+        )
+
+    def test_cancelar_corrige_el_dia_al_momento(self):
+        call_command("actualizar_ventas", stdout=StringIO())
+
+        self.viejo.estado_pedido = "cancelado"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viejo.save()
+
+        self.assertFalse(
+            VentaDiaria.objects.filter(dia=self._dia(3), producto=self.camisa).exists()
+        )
+        self.assertEqual(
+            reportes.ventas_por_categoria(self.hoy - timedelta(days=7), self.hoy),
+            [("Accesorios", 5, Decimal("500.00")), ("Camisas", 1, Decimal("300.00"))],
+        )
+
+
+class AdminPedidosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.producto = Producto.objects.create(nombre="Camisa", categoria="Camisas", precio="300.00", stock=100)
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+
+    def _pedido(self, estado="pendiente", lineas=1):
+        pedido = registrar_pedido(_pedido(), [_item(self.producto)] * lineas)
+        Pedido.objects.filter(id=pedido.id).update(
+            estado_pedido=estado, actualizado_en=timezone.now() - timedelta(hours=1)
+        )
+        pedido.refresh_from_db()
+        return pedido
+
+    def test_cambia_solo_los_pedidos_con_transicion_permitida(self):
+        pendiente = self._pedido("pendiente")
+        enviado = self._pedido("enviado")
+        cancelado = self._pedido("cancelado")
+        url = reverse("trackear_pedido")
+        self.client.post(url, {"codigo": pendiente.codigo})
+
+        respuesta = self.client.post(
+            reverse("admin:catalogo_pedido_changelist"),
+            {
+                "action": "marcar_procesando",
+                "_selected_action": [pendiente.id, enviado.id, cancelado.id],
+            },
+            follow=True,
+        )
+
+        self.assertContains(respuesta, "1 pedido(s) marcados como preparando pedido.")
+        self.assertContains(respuesta, "2 no cambiaron")
+        self.assertEqual(
+            dict(Pedido.objects.values_list("id", "estado_pedido")),
+            {pendiente.id: "procesando", enviado.id: "enviado", cancelado.id: "cancelado"},
+        )
+        self.assertGreater(Pedido.objects.get(id=pendiente.id).actualizado_en, pendiente.actualizado_en)
+        self.assertEqual(Pedido.objects.get(id=enviado.id).actualizado_en, enviado.actualizado_en)
+        # La caché de seguimiento se invalidó aunque UPDATE no dispara señales.
+        self.assertContains(self.client.post(url, {"codigo": pendiente.codigo}), "Preparando pedido")
+
+    def test_formulario_solo_acepta_transiciones_permitidas(self):
+        entregado = self._pedido("entregado")
+        datos = {k: v for k, v in model_to_dict(entregado).items() if v is not None}
+
+        formulario = PedidoAdminForm({**datos, "estado_pedido": "pendiente"}, instance=entregado)
+        self.assertFalse(formulario.is_valid())
+        self.assertEqual(list(formulario.errors), ["estado_pedido"])
+        self.assertEqual([e for e, _ in formulario.fields["estado_pedido"].choices], ["entregado"])
+
+        pendiente = self._pedido("pendiente")
+        datos = {k: v for k, v in model_to_dict(pendiente).items() if v is not None}
+        formulario = PedidoAdminForm({**datos, "estado_pedido": "procesando"}, instance=pendiente)
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual(
+            [e for e, _ in formulario.fields["estado_pedido"].choices],
+            ["pendiente", "procesando", "cancelado"],
+        )
+
+    def test_cancelar_en_bloque_corrige_el_resumen_de_ventas(self):
+        pedido = self._pedido("pendiente")
+        Pedido.objects.filter(id=pedido.id).update(creado_en=timezone.now() - timedelta(days=2))
+        ventas.actualizar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cambiados = cambiar_estado(Pedido.objects.filter(id=pedido.id), "cancelado")
+
+        self.assertEqual(cambiados, 1)
+        self.assertFalse(VentaDiaria.objects.exists())
+
+    def test_paginas_del_admin_no_crecen_con_los_pedidos(self):
+        def consultas(url):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(capturadas)
+
+        lista = reverse("admin:catalogo_pedido_changelist")
+        pedido = self._pedido(lineas=1)
+        detalle = reverse("admin:catalogo_pedido_change", args=[pedido.id])
+        self.client.get(detalle)  # llena la caché de ContentType
+        en_lista, en_detalle = consultas(lista), consultas(detalle)
+
+        for _ in range(5):
+            self._pedido()
+        grande = self._pedido(lineas=6)
+        self.assertEqual(consultas(lista), en_lista)
+        self.assertEqual(
+            consultas(reverse("admin:catalogo_pedido_change", args=[grande.id])), en_detalle
+        )
+
+
+_anotadas = []
+
+
+@cola.tarea("prueba_anotar")
+def _anotar(valor):
+    _anotadas.append(valor)
+
+
+@cola.tarea("prueba_fallar", max_intentos=2)
+def _fallar():
+    raise RuntimeError("servicio caído")
+
+
+class ColaTareasTests(TestCase):
+    def setUp(self):
+        _anotadas.clear()
+
+    def test_registrar_pedido_encola_sus_efectos(self):
+        producto = Producto.objects.create(nombre="Gorra", precio="100.00", stock=3)
+        pedido = registrar_pedido(_pedido(), [_item(producto, 2)])
+
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.nombre, tarea.argumentos), ("pedido_registrado", {"pedido_id": pedido.id}))
+        with self.assertLogs("catalogo.tareas", "WARNING") as avisos:
+            self.assertEqual(cola.procesar(), 1)
+        self.assertIn("Gorra", avisos.output[0])
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_pedido_revertido_no_deja_tarea(self):
+        producto = Producto.objects.create(nombre="Gorra", precio="100.00", stock=1)
+        with self.assertRaises(StockInsuficiente):
+            registrar_pedido(_pedido(), [_item(producto, 2)])
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_tarea_tomada_no_la_reclama_otro_hasta_que_vence_el_plazo(self):
+        cola.encolar("prueba_anotar", valor=1)
+        tomadas = cola.reclamar(10)
+
+        self.assertEqual(len(tomadas), 1)
+        self.assertEqual(cola.reclamar(10), [])
+
+        Tarea.objects.update(ejecutar_en=timezone.now() - timedelta(seconds=1))
+        otra = cola.reclamar(10)
+        self.assertEqual([t.intentos for t in otra], [2])
+        # El primer trabajador llegó tarde: ya no es suya.
+        cola.ejecutar(tomadas[0])
+        self.assertTrue(Tarea.objects.exists())
+        cola.ejecutar(otra[0])
+        self.assertEqual(_anotadas, [1, 1])
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_error_reprograma_con_espera_y_al_final_queda_fallida(self):
+        cola.encolar("prueba_fallar")
+        with self.assertLogs("catalogo.cola", "ERROR"):
+            cola.procesar()
+        tarea = Tarea.objects.get()
+        self.assertEqual((tarea.estado, tarea.intentos), (Tarea.PENDIENTE, 1))
+        self.assertGreater(tarea.ejecutar_en, timezone.now() + cola.ESPERA_BASE - timedelta(seconds=1))
+        self.assertEqual(cola.procesar(), 0)
+
+        Tarea.objects.update(ejecutar_en=timezone.now())
+        with self.assertLogs("catalogo.cola", "ERROR"):
+            cola.procesar()
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, Tarea.FALLIDA)
+        self.assertIn("servicio caído", tarea.error)
+
+    def test_espera_crece_hasta_el_maximo(self):
+        self.assertEqual(cola.espera(1), cola.ESPERA_BASE)
+        self.assertEqual(cola.espera(3), cola.ESPERA_BASE * 4)
+        self.assertEqual(cola.espera(50), cola.ESPERA_MAXIMA)
+
+
+class TrabajadorTareasTests(TransactionTestCase):
+    def test_hilos_ejecutan_cada_tarea_una_vez(self):
+        _anotadas.clear()
+        for valor in range(20):
+            cola.encolar("prueba_anotar", valor=valor)
+
+        salida = StringIO()
+        call_command("procesar_tareas", hilos=4, una_vez=True, stdout=salida)
+
+        self.assertEqual(sorted(_anotadas), list(range(20)))
+        self.assertIn("Tareas terminadas: 20", salida.getvalue())
+        self.assertFalse(Tarea.objects.exists())
+
+
+class CorreoQueFalla(locmem.EmailBackend):
+    """Deja pasar `PASAN` mensajes por conexión y luego falla."""
+
+    PASAN = 1
+
+    def open(self):
+        self.enviados = 0
+        return super().open()
+
+    def send_messages(self, mensajes):
+        if self.enviados >= self.PASAN:
+            raise ConnectionError("se cayó el servidor de correo")
+        self.enviados += len(mensajes)
+        return super().send_messages(mensajes)
+
+
+class AvisosPedidoTests(TestCase):
+    def setUp(self):
+        self.producto = Producto.objects.create(nombre="Camisa", precio="300.00", stock=50)
+
+    def _pedido(self):
+        return registrar_pedido(_pedido(), [_item(self.producto, 2)])
+
+    def test_confirmacion_sale_desde_la_cola(self):
+        pedido = self._pedido()
+        self.assertEqual(mail.outbox, [])
+
+        cola.procesar()
+
+        [correo] = mail.outbox
+        self.assertEqual(correo.to, ["cliente@ejemplo.com"])
+        self.assertIn(pedido.codigo, correo.subject)
+        self.assertIn("Camisa (talla M) x 2: $600.00", correo.body)
+
+    def test_mismo_estado_no_se_envia_dos_veces(self):
+        pedido = self._pedido()
+        cola.procesar()
+        self.assertEqual(avisos.avisar([pedido.id], "pendiente"), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_cambio_de_estado_avisa_al_cliente(self):
+        pedido = self._pedido()
+        cola.procesar()
+
+        pedido = Pedido.objects.get(id=pedido.id)
+        pedido.save()  # sin cambio de estado
+        self.assertFalse(Tarea.objects.exists())
+        pedido.estado_pedido = "enviado"
+        pedido.save()
+        cola.procesar()
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("va en camino", mail.outbox[1].subject)
+
+    def test_cambio_en_bloque_usa_una_conexion(self):
+        pedidos = [self._pedido() for _ in range(3)]
+        cola.procesar()
+        mail.outbox.clear()
+
+        cambiar_estado(Pedido.objects.filter(id__in=[p.id for p in pedidos]), "procesando")
+        with mock.patch("catalogo.avisos.get_connection", wraps=get_connection) as conexiones:
+            cola.procesar()
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(conexiones.call_count, 1)
+
+    @override_settings(EMAIL_BACKEND="catalogo.tests.CorreoQueFalla")
+    def test_error_a_media_conexion_solo_reintenta_los_que_no_salieron(self):
+        ids = [self._pedido().id for _ in range(2)]
+        Tarea.objects.all().delete()
+
+        with self.assertRaises(ConnectionError):
+            avisos.avisar(ids, "pendiente")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(AvisoPedido.objects.filter(enviado_en__isnull=True, lote="").count(), 1)
+
+        self.assertEqual(avisos.enviar_pendientes(), 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertNotEqual(mail.outbox[0].subject, mail.outbox[1].subject)
+
+    def test_lote_de_un_envio_muerto_se_vuelve_a_tomar(self):
+        viejo, reciente = [self._pedido().id for _ in range(2)]
+        Tarea.objects.all().delete()
+        AvisoPedido.objects.bulk_create([AvisoPedido(pedido_id=i, estado="pendiente") for i in (viejo, reciente)])
+        ahora = timezone.now()
+        AvisoPedido.objects.filter(pedido_id=viejo).update(
+            lote="muerto", tomado_en=ahora - avisos.PLAZO - timedelta(seconds=1)
+        )
+        AvisoPedido.objects.filter(pedido_id=reciente).update(lote="en-curso", tomado_en=ahora)
+
+        self.assertEqual(avisos.enviar_pendientes(), 1)
+
+        [correo] = mail.outbox
+        self.assertIn(Pedido.objects.get(id=viejo).codigo, correo.subject)
+        self.assertTrue(AvisoPedido.objects.filter(pedido_id=reciente, enviado_en__isnull=True).exists())
+
+
+class VistasAsyncTests(PresupuestoConsultasMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.camisa = Producto.objects.create(nombre="Camisa azul", categoria="Camisas", precio="300.00", stock=4)
+        VarianteProducto.objects.create(producto=self.camisa, talla="M", stock=4)
+        self.gorra = Producto.objects.create(nombre="Gorra", categoria="Accesorios", precio="100.00", stock=3)
+        Producto.objects.create(nombre="Oculto", precio="1.00", stock=1, activo=False)
+
+    async def test_catalogo_por_asgi(self):
+        lista = await self.async_client.get(reverse("lista_productos"))
+        self.assertContains(lista, "Camisa azul")
+        self.assertDentroDePresupuesto(lista)
+
+        detalle = await self.async_client.get(reverse("detalle_producto", args=[self.camisa.id]))
+        self.assertContains(detalle, "Camisa azul")
+        self.assertEqual(detalle.context["tallas"], {"M": 4})
+        self.assertDentroDePresupuesto(detalle)
+
+        repetida = await self.async_client.get(
+            reverse("detalle_producto", args=[self.camisa.id]),
+            headers={"if-none-match": detalle["ETag"]},
+        )
+        self.assertEqual(repetida.status_code, 304)
+
+    async def test_usuario_con_sesion_por_asgi(self):
+        usuario = await User.objects.acreate_user("ana", password="x")
+        await self.async_client.aforce_login(usuario)
+        respuesta = await self.async_client.get(reverse("lista_productos"))
+        self.assertContains(respuesta, "ana")
+        self.assertDentroDePresupuesto(respuesta)
+
+        detalle = await self.async_client.get(reverse("detalle_producto", args=[self.camisa.id]))
+        self.assertDentroDePresupuesto(detalle)
+
+    async def test_trackear_por_asgi(self):
+        pedido = await sync_to_async(registrar_pedido)(_pedido(), [_item(self.gorra)])
+        respuesta = await self.async_client.post(reverse("trackear_pedido"), {"codigo": pedido.codigo})
+        self.assertContains(respuesta, "Pendiente de pago")
+        self.assertDentroDePresupuesto(respuesta)
+
+        no_existe = await self.async_client.post(reverse("trackear_pedido"), {"codigo": "PW-20200101-ABCD"})
+        self.assertIsNone(no_existe.context["pedido"])
+
+    async def test_api_lista_paginada_y_filtrada(self):
+        url = reverse("api_productos")
+        primera = await self.async_client.get(url, {"por_pagina": 1})
+        self.assertDentroDePresupuesto(primera)
+        self.assertEqual(primera["Cache-Control"], "public, max-age=60")
+        datos = primera.json()
+        self.assertEqual([p["nombre"] for p in datos["resultados"]], ["Camisa azul"])
+        self.assertEqual(datos["resultados"][0]["precio"], "300.00")
+
+        segunda = (await self.async_client.get(url, {"por_pagina": 1, "despues": datos["siguiente"]})).json()
+        self.assertEqual([p["nombre"] for p in segunda["resultados"]], ["Gorra"])
+        self.assertIsNone(segunda["siguiente"])
+
+        filtrada = (await self.async_client.get(url, {"categoria": "Accesorios"})).json()
+        self.assertEqual([p["id"] for p in filtrada["resultados"]], [self.gorra.id])
+        self.assertEqual((await self.async_client.get(url, {"despues": "no-es-cursor"})).status_code, 400)
+
+    def test_api_tope_de_por_pagina(self):
+        with mock.patch("catalogo.api.MAX_POR_PAGINA", 1):
+            datos = self.client.get(reverse("api_productos"), {"por_pagina": 50}).json()
+        self.assertEqual(len(datos["resultados"]), 1)
+        self.assertIsNotNone(datos["siguiente"])
+
+    def test_api_por_wsgi_no_usa_streaming(self):
+        respuesta = self.client.get(reverse("api_productos"), {"por_pagina": 1})
+        self.assertFalse(respuesta.streaming)
+        self.assertEqual(respuesta.json()["resultados"][0]["nombre"], "Camisa azul")
+        self.assertDentroDePresupuesto(respuesta)
+
+    async def test_api_campos_elegidos_y_304(self):
+        url = reverse("api_productos")
+        respuesta = await self.async_client.get(url, {"fields": "id,precio"})
+        datos = respuesta.json()
+        self.assertEqual(datos["resultados"][0], {"id": self.camisa.id, "precio": "300.00"})
+        # El listado se lee dentro de la vista: las métricas lo ven y sólo
+        # trae esas columnas (más nombre, que ordena el cursor).
+        listado = [sql for sql, _ in respuesta.metricas_consultas.consultas if "LIMIT" in sql][-1]
+        self.assertIn('"precio"', listado)
+        self.assertNotIn("descripcion", listado)
+        self.assertNotIn("miniaturas", listado)
+
+        repetida = await self.async_client.get(
+            url, {"fields": "id,precio"}, headers={"if-none-match": respuesta["ETag"]}
+        )
+        self.assertEqual(repetida.status_code, 304)
+
+        await Producto.objects.filter(id=self.gorra.id).aupdate(precio="90.00", actualizado_en=timezone.now())
+        cambiada = await self.async_client.get(
+            url, {"fields": "id,precio"}, headers={"if-none-match": respuesta["ETag"]}
+        )
+        self.assertEqual(cambiada.status_code, 200)
+
+        invalida = await self.async_client.get(url, {"fields": "id,contrasena"})
+        self.assertEqual(invalida.status_code, 400)
+        self.assertIn("contrasena", invalida.json()["error"])
+
+    async def test_api_detalle(self):
+        respuesta = await self.async_client.get(reverse("api_producto", args=[self.camisa.id]))
+        self.assertDentroDePresupuesto(respuesta)
+        datos = respuesta.json()
+        self.assertEqual(datos["tallas"], [{"talla": "M", "stock": 4}])
+        self.assertEqual((datos["imagen"], datos["imagenes"]), (None, {}))
+
+        solo_nombre = await self.async_client.get(
+            reverse("api_producto", args=[self.camisa.id]), {"fields": "nombre"}
+        )
+        self.assertEqual(solo_nombre.json(), {"nombre": "Camisa azul"})
+        repetida = await self.async_client.get(
+            reverse("api_producto", args=[self.camisa.id]), headers={"if-none-match": respuesta["ETag"]}
+        )
+        self.assertEqual(repetida.status_code, 304)
+
+        oculto = await Producto.objects.aget(nombre="Oculto")
+        self.assertEqual(
+            (await self.async_client.get(reverse("api_producto", args=[oculto.id]))).status_code, 404
+        )
+
+
+class LecturasEnReplicaTests(TestCase):
+    """Primario y réplica son dos SQLite distintas: se ve de cuál se leyó."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.en_primario = Producto.objects.create(nombre="Sólo primario", precio="100.00", stock=9)
+        # Llega "por replicación": sin señales que escriban en el primario.
+        [self.en_replica] = Producto.objects.using("replica").bulk_create([Producto(
+            id=self.en_primario.id + 1000, nombre="Sólo réplica", categoria="Camisas", precio="200.00", stock=2
+        )])
+
+    def _replicar(self, producto, **cambios):
+        """Copia `producto` a la réplica tal como está en el primario."""
+        campos = {"nombre": producto.nombre, "precio": producto.precio, "stock": producto.stock, **cambios}
+        Producto.objects.using("replica").bulk_create([Producto(id=producto.id, **campos)])
+        # auto_now no toca los UPDATE: misma marca que en el primario.
+        Producto.objects.using("replica").filter(id=producto.id).update(actualizado_en=producto.actualizado_en)
+
+    def test_sin_replica_configurada_lee_del_primario(self):
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertContains(respuesta, "Sólo primario")
+        self.assertNotContains(respuesta, "Sólo réplica")
+
+    @override_settings(BASE_REPLICA="replica")
+    def test_catalogo_y_reportes_leen_de_la_replica(self):
+        respuesta = self.client.get(reverse("lista_productos"))
+        self.assertContains(respuesta, "Sólo réplica")
+        self.assertNotContains(respuesta, "Sólo primario")
+
+        # La existencia y la versión del detalle salen del primario; el
+        # producto, de la réplica mientras esté al día.
+        self.assertEqual(
+            self.client.get(reverse("detalle_producto", args=[self.en_replica.id])).status_code, 404
+        )
+        self._replicar(self.en_primario, nombre="Copia en réplica")
+        self.assertContains(
+            self.client.get(reverse("detalle_producto", args=[self.en_primario.id])), "Copia en réplica"
+        )
+
+        # El usuario (sesión, auth) sí viene del primario; el CSV se genera
+        # después de que la vista regresa y también lee de la réplica.
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        respuesta = self.client.get(reverse("reportes"), {"exportar": "stock_bajo"})
+        lineas = b"".join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[1:], [f"{self.en_replica.id},Sólo réplica,,2"])
+
+    @override_settings(BASE_REPLICA="replica")
+    async def test_api_lee_de_la_replica(self):
+        respuesta = await self.async_client.get(reverse("api_productos"), {"fields": "nombre"})
+        datos = respuesta.json()
+        self.assertEqual(datos["resultados"], [{"nombre": "Sólo réplica"}])
+
+    @override_settings(BASE_REPLICA="replica")
+    def test_escrituras_y_datos_del_cliente_van_al_primario(self):
+        with leyendo_de_replica():
+            self.assertEqual(Producto.objects.all().db, "replica")
+            self.assertEqual(Carrito.objects.all().db, "default")
+            self.assertEqual(Reserva.objects.all().db, "default")
+            self.assertEqual(router.db_for_write(Pedido), "default")
+        self.assertEqual(Producto.objects.all().db, "default")
+
+    @override_settings(BASE_REPLICA="replica")
+    def test_replica_atrasada_no_queda_en_la_cache(self):
+        producto = self.en_primario
+        self._replicar(producto)
+        Reserva.objects.create(
+            clave="otro", producto=producto, talla="", cantidad=3,
+            expira_en=timezone.now() + timedelta(minutes=5),
+        )
+        detalle = reverse("detalle_producto", args=[producto.id])
+        self.assertContains(self.client.get(detalle), "$100.00")
+        self.assertContains(self.client.get(reverse("lista_productos")), "$100.00")
+
+        # Cambia en el primario; la réplica se queda con el precio viejo.
+        producto.precio = Decimal("150.00")
+        producto.save()
+
+        for _ in range(2):  # la segunda ya sale de la caché
+            self.assertContains(self.client.get(detalle), "$150.00")
+            listado = self.client.get(reverse("lista_productos"))
+            self.assertContains(listado, "$150.00")
+            self.assertNotContains(listado, "$100.00")
+        with leyendo_de_replica():
+            # Las reservas no están en la réplica: se suman en el primario.
+            self.assertEqual(disponibles([producto.id]), {producto.id: 6})
+
+
+class PerfilesTests(SimpleTestCase):
+    def _cargar(self, **entorno):
+        """Importa tienda.settings en otro proceso con `entorno`."""
+        entorno = {
+            **{k: v for k, v in os.environ.items() if not k.startswith("TIENDA_")},
+            "TIENDA_PERFIL": "prod", **entorno,
+        }
+        return subprocess.run(
+            [sys.executable, "-c", "import tienda.settings as s; print(s.ALLOWED_HOSTS)"],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+
+    def test_prod_exige_llave_hosts_y_clave(self):
+        completo = {
+            "TIENDA_SECRET_KEY": "llave", "TIENDA_ALLOWED_HOSTS": "tienda.mx, www.tienda.mx",
+            "TIENDA_DB_CLAVE": "clave",
+        }
+        for falta in completo:
+            with self.subTest(falta=falta):
+                resultado = self._cargar(**{k: v for k, v in completo.items() if k != falta})
+                self.assertNotEqual(resultado.returncode, 0)
+                self.assertIn(falta, resultado.stderr)
+
+        resultado = self._cargar(**completo)
+        self.assertEqual(resultado.stdout.strip(), "['tienda.mx', 'www.tienda.mx']")
+
+
+class _ConexionFalsa:
+    def __init__(self, responde=True):
+        self.responde = responde
+        self.cerrada = False
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.responde:
+            raise OSError("se fue")
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(SimpleTestCase):
+    def test_reutiliza_las_conexiones_devueltas(self):
+        pool = Pool(tamano=1)
+        primera, creada_en, reutilizada = pool.tomar(_ConexionFalsa)
+        self.assertFalse(reutilizada)
+        segunda, _, _ = pool.tomar(_ConexionFalsa)
+
+        pool.devolver(primera, creada_en)
+        pool.devolver(segunda, creada_en)  # el pool ya está lleno
+        self.assertTrue(segunda.cerrada)
+
+        conexion, _, reutilizada = pool.tomar(_ConexionFalsa)
+        self.assertIs(conexion, primera)
+        self.assertTrue(reutilizada)
+        self.assertEqual(primera.pings, 0)
+
+    def test_revisa_las_inactivas_y_descarta_las_viejas(self):
+        pool = Pool(revisar_despues=0)
+        caida = _ConexionFalsa(responde=False)
+        pool.devolver(caida, time.monotonic())
+        conexion, _, reutilizada = pool.tomar(_ConexionFalsa)
+        self.assertIsNot(conexion, caida)
+        self.assertFalse(reutilizada)
+        self.assertTrue(caida.cerrada)
+
+        pool = Pool(vida_maxima=60)
+        vieja = _ConexionFalsa()
+        pool.devolver(vieja, time.monotonic() - 120)
+        self.assertTrue(vieja.cerrada)
+
+    def test_backend_requiere_conn_max_age_cero(self):
+        conexiones = ConnectionHandler({
+            "default": {
+                "ENGINE": "tienda.mysql_pool",
+                "NAME": "tienda",
+                "OPTIONS": {"pool": {"tamano": 2}},
+            },
+            "persistente": {
+                "ENGINE": "tienda.mysql_pool",
+                "NAME": "tienda",
+                "CONN_MAX_AGE": 60,
+            },
+        })
+        self.assertNotIn("pool", conexiones["default"].get_connection_params())
+        self.assertEqual(conexiones["default"].pool.libres.maxsize, 2)
+        with self.assertRaises(ImproperlyConfigured):
+            conexiones["persistente"].pool
@@ -6,6 +6,7 @@ urlpatterns = [
     path("", views.inicio, name="inicio"),
 
     path("productos/", views.lista_productos, name="lista_productos"),
+    path("productos/buscar/", views.buscar_productos, name="buscar_productos"),
     path(
         "productos/<int:producto_id>/",
         views.detalle_producto,
@@ -44,4 +45,19 @@ urlpatterns = [
         views.trackear_pedido,
         name="trackear_pedido",
     ),
+
+    path(
+        "trackear-pedido/<str:codigo>/estado/",
+        views.estado_pedido,
+        name="estado_pedido",
+    ),
+
+    path("reportes/", views.reportes, name="reportes"),
+
+    path("api/v1/productos/", views.api_productos, name="api_productos"),
+    path(
+        "api/v1/productos/<int:producto_id>/",
+        views.api_producto,
+        name="api_producto",
+    ),
 ]
@@ -0,0 +1,113 @@
+"""
+Resumen diario de ventas (VentaDiaria: día × producto × talla).
+
+- La unidad de trabajo es el día completo: se borran sus filas y se
+  vuelven a agregar desde PedidoItem en una transacción. Es idempotente y
+  cuesta lo mismo sin importar cuánta historia haya.
+- `actualizar()` (comando `actualizar_ventas`) sólo recalcula los días
+  de los pedidos creados o cambiados desde la última corrida (marca sobre
+  Pedido.actualizado_en, con índice). La marca se pone al inicio de la
+  corrida y se repasan unos minutos antes de ella, por las transacciones
+  que confirmaron tarde: recalcular un día de más no cambia nada.
+- Cancelar un pedido recalcula su día al momento (señal de Pedido), sin
+  esperar a la siguiente corrida.
+- Los días anteriores al de la marca se leen del resumen; del día de la
+  marca en adelante los reportes agregan PedidoItem directamente (ver
+  catalogo.reportes), así nunca muestran datos viejos.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MarcaProceso, Pedido, PedidoItem, VentaDiaria
+from .pedidos import importe_linea
+
+
+MARCA = "ventas_diarias"
+SOLAPE = timedelta(minutes=5)
+
+
+def rango(desde, hasta):
+    """(inicio, fin) con zona horaria para los días `desde`..`hasta` incluidos."""
+    zona = timezone.get_current_timezone()
+    inicio = timezone.make_aware(datetime.combine(desde, time.min), zona)
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min), zona)
+    return inicio, fin
+
+
+def dia_local(momento):
+    return timezone.localtime(momento).date()
+
+
+def _dias_de(pedidos):
+    return set(
+        pedidos.annotate(dia=TruncDate("creado_en", tzinfo=timezone.get_current_timezone()))
+               .values_list("dia", flat=True)
+               .distinct()
+    )
+
+
+def recalcular_dias(dias):
+    """Rehace las filas de VentaDiaria de cada día de `dias`."""
+    for dia in sorted(dias):
+        inicio, fin = rango(dia, dia)
+        filas = (
+            PedidoItem.objects.filter(pedido__creado_en__gte=inicio, pedido__creado_en__lt=fin)
+                              .exclude(pedido__estado_pedido="cancelado")
+                              .values("producto_id", "talla")
+                              .annotate(piezas=Sum("cantidad"), importe=Sum(importe_linea()))
+                              .order_by()
+        )
+        with transaction.atomic():
+            VentaDiaria.objects.filter(dia=dia).delete()
+            VentaDiaria.objects.bulk_create([
+                VentaDiaria(dia=dia, **fila) for fila in filas
+            ])
+
+
+def corregir_pedidos(fechas_creacion):
+    """
+    Al confirmar la transacción, rehace los días ya resumidos de pedidos
+    que se cancelaron o borraron (`fechas_creacion`: su creado_en). Los
+    días desde el corte se leen en vivo y no hace falta tocarlos.
+    """
+    corte = dia_de_corte()
+    if corte is None:
+        return
+    dias = {dia for dia in map(dia_local, fechas_creacion) if dia < corte}
+    if dias:
+        transaction.on_commit(lambda: recalcular_dias(dias))
+
+
+def actualizar(desde_cero=False):
+    """
+    Recalcula los días con pedidos nuevos o cambiados desde la marca (o
+    todos con `desde_cero`) y mueve la marca. Regresa los días recalculados.
+    """
+    inicio = timezone.now()
+    marca = MarcaProceso.objects.filter(nombre=MARCA).first()
+
+    pedidos = Pedido.objects.all()
+    if marca and not desde_cero:
+        pedidos = pedidos.filter(actualizado_en__gte=marca.hasta - SOLAPE)
+    dias = _dias_de(pedidos)
+    if desde_cero:
+        # Días que ya no tienen pedidos (se borraron) también se limpian.
+        dias |= set(VentaDiaria.objects.values_list("dia", flat=True).distinct())
+
+    recalcular_dias(dias)
+    MarcaProceso.objects.update_or_create(nombre=MARCA, defaults={"hasta": inicio})
+    return sorted(dias)
+
+
+def dia_de_corte():
+    """
+    Primer día que el resumen todavía no cubre por completo (el de la
+    última corrida), o None si nunca ha corrido.
+    """
+    hasta = MarcaProceso.objects.filter(nombre=MARCA).values_list("hasta", flat=True).first()
+    return dia_local(hasta) if hasta else None
@@ -1,53 +1,203 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import math
+from itertools import islice
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render, get_object_or_404, redirect
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db import transaction
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.db.models import Max
+
+from tienda.replicas import lee_de_replica, leyendo_del_primario
+
+from .models import Producto, Pedido, VarianteProducto
+from . import api
+from . import carrito as carrito_db
+from .busqueda import buscar
+from .codigos import CodigoInvalido, normalizar_codigo
+from .condicional import con_validadores, etiqueta, etiqueta_pagina, no_modificado
+from .facetas import categorias_con_conteo, tallas_con_existencia
+from .fragmentos import cache_anonimo
+from . import reportes as reportes_db
+from .flujo_csv import lineas_csv, respuesta_streaming
+from .forms import PedidoCheckoutForm, RangoReporteForm
+from .paginacion import CursorInvalido, apaginar_por_cursor, consulta_pagina
+from .pedidos import CAMPOS_HISTORIAL, con_totales, resumen_lineas, version_pedido
+from .seguimiento import aresumen_pedido, espera_para, etag_resumen, resumen_pedido
+from .ventas import dia_de_corte
+from .inventario import (
+    StockInsuficiente,
+    TallaInvalida,
+    disponibles,
+    disponibles_por_talla,
+    liberar,
+    registrar_pedido,
+    reservar,
+    version_disponibilidad,
+)
+
+
+# Columnas que usa la tarjeta de producto en lista_productos.html; la
+# descripción (TEXT) y demás campos no se leen en el listado.
+CAMPOS_TARJETA_PRODUCTO = (
+    "id", "nombre", "categoria", "precio", "stock", "imagen", "miniaturas",
+)
+
+
+@cache_anonimo("inicio")
+def inicio(request):
+    return render(request, "catalogo/inicio.html")
 
-from .models import Producto, Pedido, PedidoItem
-from .forms import PedidoCheckoutForm
 
 
+# Vistas async (ASGI): lista_productos, detalle_producto, trackear_pedido
+# y la API. Consultan con el ORM async; lo que sólo existe síncrono
+# (plantillas con caché de fragmentos y context processors, helpers de
+# inventario, límites) va por sync_to_async.
 
-def inicio(request):
-    return render(request, "catalogo/inicio.html")
+async def _resolver_usuario(request):
+    # request.user es perezoso y consultaría la base en el hilo del event
+    # loop (SynchronousOnlyOperation): se resuelve antes con la API async.
+    request.user = await request.auser()
+
+
+async def _arender(request, plantilla, contexto, **kwargs):
+    return await sync_to_async(render)(request, plantilla, contexto, **kwargs)
+
+
+def _facetas():
+    return categorias_con_conteo(), tallas_con_existencia()
+
+
+async def _ultimo_cambio_catalogo():
+    ultimo = await Producto.objects.filter(activo=True).aaggregate(ultimo=Max("actualizado_en"))
+    return ultimo["ultimo"]
 
 
 
-def lista_productos(request):
+def _tamano_pagina(request):
+    tamano = getattr(settings, "CATALOGO_PRODUCTOS_POR_PAGINA", 24)
+    try:
+        tamano = int(request.GET.get("por_pagina", tamano))
+    except ValueError:
+        pass
+    return max(1, min(tamano, getattr(settings, "CATALOGO_MAX_POR_PAGINA", 100)))
+
+
+
+@lee_de_replica
+async def lista_productos(request):
+    await _resolver_usuario(request)
     categoria = request.GET.get("categoria")
-    productos = Producto.objects.filter(activo=True).order_by("nombre")
+    talla = request.GET.get("talla")
+
+    # Facetas (de la caché) + último producto modificado: si nada cambió
+    # desde la visita anterior, 304 con una sola consulta.
+    categorias, tallas = await sync_to_async(_facetas)()
+    version = (
+        await _ultimo_cambio_catalogo(),
+        [(c["categoria"], c["total"]) for c in categorias],
+        tallas,
+    )
+    respuesta = no_modificado(request, etiqueta_pagina(request, *version))
+    if respuesta is not None:
+        return respuesta
 
-    categorias = (
-        Producto.objects.exclude(categoria__isnull=True)
-                        .exclude(categoria__exact="")
-                        .values_list("categoria", flat=True)
-                        .distinct()
+    productos = (
+        Producto.objects.filter(activo=True)
+                        .only(*CAMPOS_TARJETA_PRODUCTO)
     )
 
     if categoria:
         productos = productos.filter(categoria=categoria)
+    if talla:
+        # (producto, talla) es único: el JOIN no duplica productos.
+        productos = productos.filter(variantes__talla=talla, variantes__stock__gt=0)
+
+    try:
+        pagina = await apaginar_por_cursor(
+            productos,
+            "nombre",
+            _tamano_pagina(request),
+            despues=request.GET.get("despues"),
+            antes=request.GET.get("antes"),
+        )
+    except CursorInvalido:
+        pagina = await apaginar_por_cursor(productos, "nombre", _tamano_pagina(request))
 
     context = {
-        "productos": productos,
+        "productos": pagina,
+        "pagina": pagina,
         "categorias": categorias,
         "categoria_actual": categoria,
+        "tallas": tallas,
+        "talla_actual": talla,
+        "filtros": urlencode(
+            {k: v for k, v in (("categoria", categoria), ("talla", talla)) if v}
+        ),
     }
-    return render(request, "catalogo/lista_productos.html", context)
+    respuesta = await _arender(request, "catalogo/lista_productos.html", context)
+    return con_validadores(respuesta, etiqueta_pagina(request, *version))
 
 
 
-def detalle_producto(request, producto_id):
-    producto = get_object_or_404(Producto, id=producto_id, activo=True)
+def buscar_productos(request):
+    consulta = request.GET.get("q", "").strip()
+    categoria = request.GET.get("categoria")
+
+    resultados = buscar(consulta, categoria).only(*CAMPOS_TARJETA_PRODUCTO)
+    paginador = Paginator(resultados, _tamano_pagina(request))
+    productos = paginador.get_page(request.GET.get("pagina"))
 
-    tallas = []
-    if producto.tallas:
-        tallas = [t.strip() for t in producto.tallas.split(",") if t.strip()]
+    context = {
+        "consulta": consulta,
+        "productos": productos,
+        "categorias": categorias_con_conteo(),
+        "categoria_actual": categoria,
+    }
+    return render(request, "catalogo/buscar.html", context)
+
+
+
+@lee_de_replica
+async def detalle_producto(request, producto_id):
+    await _resolver_usuario(request)
+    clave = await request.session.aget(carrito_db.CLAVE_SESION)
+    version = await sync_to_async(version_disponibilidad)(producto_id, clave)
+    if version is None:
+        raise Http404("No existe el producto.")
+    respuesta = no_modificado(request, etiqueta_pagina(request, producto_id, *version))
+    if respuesta is not None:
+        return respuesta
+
+    productos = Producto.objects.prefetch_related("variantes").filter(id=producto_id, activo=True)
+    producto = await productos.afirst()
+    if producto is None or producto.actualizado_en != version[0]:
+        # La réplica aún no tiene el último cambio (version_disponibilidad
+        # lee del primario): la página y sus fragmentos salen del primario.
+        with leyendo_del_primario():
+            producto = await aget_object_or_404(productos)
+    tallas, disponible = await sync_to_async(_disponibilidad)(producto, clave)
 
     context = {
         "producto": producto,
         "tallas": tallas,
+        "disponible": disponible,
     }
-    return render(request, "catalogo/detalle_producto.html", context)
+    respuesta = await _arender(request, "catalogo/detalle_producto.html", context)
+    return con_validadores(respuesta, etiqueta_pagina(request, producto_id, *version))
+
+
+def _disponibilidad(producto, clave):
+    """({talla: disponibles}, total disponible) descontando otras reservas."""
+    tallas = disponibles_por_talla(producto, clave)
+    if tallas:
+        return tallas, sum(tallas.values())
+    return tallas, disponibles([producto.id], clave).get(producto.id, 0)
 
 
 
@@ -57,10 +207,7 @@ def _obtener_items_carrito(request):
     - items: lista de dicts
     - total: suma de los subtotales
     """
-    carrito = request.session.get("carrito", {})
-    items = list(carrito.values())
-    total = sum(item.get("subtotal", 0) for item in items)
-    return items, total
+    return carrito_db.items_carrito(carrito_db.obtener_carrito(request))
 
 
 
@@ -81,29 +228,22 @@ def agregar_al_carrito(request, producto_id):
     if cantidad < 1:
         cantidad = 1
 
-    carrito = request.session.get("carrito", {})
-
-    clave_item = f"{producto.id}_{talla or 'unica'}"
+    carrito = carrito_db.obtener_carrito(request, crear=True)
 
-    precio = float(producto.precio)
-
-    if clave_item in carrito:
-        carrito[clave_item]["cantidad"] += cantidad
-        carrito[clave_item]["subtotal"] = carrito[clave_item]["cantidad"] * precio
-    else:
-        carrito[clave_item] = {
-            "id": clave_item,
-            "producto_id": producto.id,
-            "nombre": producto.nombre,
-            "talla": talla,
-            "cantidad": cantidad,
-            "precio": precio,
-            "subtotal": precio * cantidad,
-            "imagen_url": producto.imagen.url if producto.imagen else "",
-        }
-
-    request.session["carrito"] = carrito
-    request.session.modified = True
+    try:
+        reservar(carrito.clave, producto, talla, cantidad)
+    except TallaInvalida:
+        messages.error(request, f"Elige una de las tallas disponibles de {producto.nombre}.")
+        return redirect("detalle_producto", producto_id=producto.id)
+    except StockInsuficiente as exc:
+        messages.error(
+            request,
+            f"No hay suficiente stock de {exc.nombre}. "
+            f"Disponible: {exc.disponible}, solicitaste: {exc.solicitado}."
+        )
+        return redirect("detalle_producto", producto_id=producto.id)
+
+    carrito_db.agregar(carrito, producto, talla, cantidad)
 
     messages.success(request, f"{producto.nombre} se agregó al carrito.")
     return redirect("ver_carrito")
@@ -120,79 +260,60 @@ def ver_carrito(request):
 
 
 def eliminar_del_carrito(request, item_id):
-    carrito = request.session.get("carrito", {})
-    if item_id in carrito:
-        del carrito[item_id]
-        request.session["carrito"] = carrito
-        request.session.modified = True
+    carrito = carrito_db.obtener_carrito(request)
+    item = None
+    if carrito is not None and item_id.isdigit():
+        item = carrito_db.quitar(carrito, int(item_id))
+
+    if item:
+        liberar(carrito.clave, producto_id=item["producto_id"], talla=item["talla"])
         messages.info(request, "Producto eliminado del carrito.")
 
     return redirect("ver_carrito")
 
 
 def vaciar_carrito(request):
-    request.session["carrito"] = {}
-    request.session.modified = True
+    carrito = carrito_db.obtener_carrito(request)
+    if carrito is not None:
+        liberar(carrito.clave)
+        carrito_db.vaciar(carrito)
     messages.info(request, "Carrito vaciado.")
     return redirect("ver_carrito")
 
 
 
 def checkout_pedido(request):
-    carrito = request.session.get("carrito", {})
-    if not carrito:
+    carrito = carrito_db.obtener_carrito(request)
+    items, total = carrito_db.items_carrito(carrito)
+    if not items:
         messages.warning(request, "Tu carrito está vacío.")
         return redirect("ver_carrito")
 
-    items, total = _obtener_items_carrito(request)
-
     if request.method == "POST":
         form = PedidoCheckoutForm(request.POST)
         if form.is_valid():
-            try:
-                with transaction.atomic():
-                    pedido = form.save(commit=False)
-                    if request.user.is_authenticated:
-                        pedido.usuario = request.user
-                    pedido.total = total
-                    pedido.save()
-
-                    for item in items:
-                        producto = get_object_or_404(Producto, id=item["producto_id"])
-
-                        if producto.stock < item["cantidad"]:
-                            messages.error(
-                                request,
-                                f"No hay suficiente stock de {producto.nombre}. "
-                                f"Disponible: {producto.stock}, solicitaste: {item['cantidad']}."
-                            )
-                            raise transaction.TransactionManagementError(
-                                "Stock insuficiente"
-                            )
-
-                        producto.stock -= item["cantidad"]
-                        producto.save()
-
-                        PedidoItem.objects.create(
-                            pedido=pedido,
-                            producto=producto,
-                            talla=item.get("talla", ""),
-                            cantidad=item["cantidad"],
-                            precio_unitario=item["precio"],
-                        )
-
-                    request.session["carrito"] = {}
-                    request.session.modified = True
-
-                    messages.success(
-                        request,
-                        f"Tu pedido {pedido.codigo} se registró correctamente. "
-                        "Guarda este código para consultar el estado de tu envío."
-                    )
-                    return redirect("pedido_confirmacion", codigo=pedido.codigo)
+            pedido = form.save(commit=False)
+            if request.user.is_authenticated:
+                pedido.usuario = request.user
 
-            except transaction.TransactionManagementError:
+            try:
+                registrar_pedido(pedido, items, carrito.clave)
+            except StockInsuficiente as exc:
+                messages.error(
+                    request,
+                    f"No hay suficiente stock de {exc.nombre}. "
+                    f"Disponible: {exc.disponible}, solicitaste: {exc.solicitado}."
+                )
                 return redirect("checkout_pedido")
+
+            carrito_db.vaciar(carrito)
+
+            messages.success(
+                request,
+                f"Tu pedido {pedido.codigo} se registró correctamente. "
+                "Guarda este código para consultar el estado de tu envío."
+            )
+            return redirect("pedido_confirmacion", codigo=pedido.codigo)
     else:
         initial = {}
         if request.user.is_authenticated:
@@ -211,14 +332,36 @@ def checkout_pedido(request):
 
 
 
+def _version_pedido_visible(request, **filtro):
+    """
+    Versión del pedido (ver pedidos.version_pedido), o Http404 si no existe.
+    Regresa también el redirect si el usuario no puede verlo.
+    """
+    version = version_pedido(**filtro)
+    if version is None:
+        raise Http404("No existe el pedido.")
+    _, usuario_id, _, _ = version
+    if usuario_id and request.user.id != usuario_id and not request.user.is_staff:
+        messages.error(request, "No tienes permiso para ver este pedido.")
+        return version, redirect("inicio")
+    return version, None
+
+
 def detalle_pedido(request, pedido_id):
-    pedido = get_object_or_404(Pedido, id=pedido_id)
+    version, sin_permiso = _version_pedido_visible(request, id=pedido_id)
+    if sin_permiso:
+        return sin_permiso
+    ultima_modificacion = version[2]
+    respuesta = no_modificado(
+        request, etiqueta_pagina(request, "detalle_pedido", *version), ultima_modificacion
+    )
+    if respuesta is not None:
+        return respuesta
 
-    if pedido.usuario and request.user != pedido.usuario and not request.user.is_staff:
-        messages.error(request, "No tienes permiso para ver este pedido.")
-        return redirect("inicio")
+    pedido = get_object_or_404(Pedido, id=pedido_id)
 
-    items = list(pedido.items.select_related("producto").all())
+    resumen = resumen_lineas(pedido)
+    items = resumen.items
 
     primer_item = items[0] if items else None
 
@@ -229,28 +372,34 @@ def detalle_pedido(request, pedido_id):
         and getattr(primer_item.producto, "imagen", None)
         and primer_item.producto.imagen
     ):
-        hero_imagen_url = primer_item.producto.imagen.url
-
-    total_pedido = sum(float(it.precio_unitario) * it.cantidad for it in items)
+        hero_imagen_url = primer_item.producto.url_detalle
 
     context = {
         "pedido": pedido,
         "items": items,
         "primer_item": primer_item,
         "hero_imagen_url": hero_imagen_url,
-        "total_pedido": total_pedido,
+        "total_pedido": resumen.total,
     }
-    return render(request, "catalogo/detalle_pedido.html", context)
+    respuesta = render(request, "catalogo/detalle_pedido.html", context)
+    return con_validadores(
+        respuesta, etiqueta_pagina(request, "detalle_pedido", *version), ultima_modificacion
+    )
 
 
 
 @login_required
 def mis_pedidos(request):
-    pedidos = Pedido.objects.filter(usuario=request.user).order_by("-creado_en")
+    pedidos = con_totales(
+        Pedido.objects.filter(usuario=request.user)
+                      .only(*CAMPOS_HISTORIAL)
+                      .order_by("-creado_en", "-id")
+    )
+    paginador = Paginator(pedidos, getattr(settings, "CATALOGO_PEDIDOS_POR_PAGINA", 20))
     context = {
-        "pedidos": pedidos,
+        "pedidos": paginador.get_page(request.GET.get("pagina")),
     }
-    return render(request, "catalogo/mis_pedidos.html", context)
+    return render(request, "catalogo/lista_pedidos.html", context)
 
 
 
@@ -258,46 +407,222 @@ def pedido_confirmacion(request, codigo):
     """
     Pantalla de “gracias por tu compra” usando el CÓDIGO del pedido.
     """
-    pedido = get_object_or_404(Pedido, codigo=codigo)
+    version, sin_permiso = _version_pedido_visible(request, codigo=codigo)
+    if sin_permiso:
+        return sin_permiso
+    ultima_modificacion = version[2]
+    respuesta = no_modificado(
+        request, etiqueta_pagina(request, "pedido_confirmacion", *version), ultima_modificacion
+    )
+    if respuesta is not None:
+        return respuesta
 
-    if pedido.usuario and request.user != pedido.usuario and not request.user.is_staff:
-        messages.error(request, "No tienes permiso para ver este pedido.")
-        return redirect("inicio")
+    pedido = get_object_or_404(Pedido, codigo=codigo)
 
-    items = list(pedido.items.select_related("producto").all())
-    total_pedido = sum(float(it.precio_unitario) * it.cantidad for it in items)
+    resumen = resumen_lineas(pedido)
 
     context = {
         "pedido": pedido,
-        "items": items,
-        "total_pedido": total_pedido,
+        "items": resumen.items,
+        "total_pedido": resumen.total,
     }
-    return render(request, "catalogo/pedido_confirmacion.html", context)
+    respuesta = render(request, "catalogo/pedido_confirmacion.html", context)
+    return con_validadores(
+        respuesta, etiqueta_pagina(request, "pedido_confirmacion", *version), ultima_modificacion
+    )
 
 
 
-def trackear_pedido(request):
+def _demasiadas_consultas(segundos):
+    return f"Hiciste demasiadas consultas. Intenta de nuevo en {math.ceil(segundos)} segundos."
+
+
+async def trackear_pedido(request):
     """
     Permite a cualquier usuario consultar el estado de su pedido
     escribiendo el CÓDIGO (pedido.codigo) que se le generó.
     """
     pedido_encontrado = None
     codigo_busqueda = ""
+    status = 200
 
     if request.method == "POST":
         codigo_busqueda = request.POST.get("codigo", "").strip()
-        if codigo_busqueda:
+        espera = await sync_to_async(espera_para)(request) if codigo_busqueda else 0
+        if espera:
+            messages.error(request, _demasiadas_consultas(espera))
+            status = 429
+        elif codigo_busqueda:
             try:
-                pedido_encontrado = Pedido.objects.get(codigo=codigo_busqueda)
-            except Pedido.DoesNotExist:
+                codigo_busqueda = normalizar_codigo(codigo_busqueda)
+                pedido_encontrado = await aresumen_pedido(codigo_busqueda)
+            except CodigoInvalido:
                 messages.error(
                     request,
-                    "No encontramos ningún pedido con ese código. "
-                    "Revisa que esté bien escrito."
+                    "Ese código no es válido: algún carácter está mal escrito. "
+                    "Revísalo en el correo de confirmación."
                 )
+            else:
+                if pedido_encontrado is None:
+                    messages.error(
+                        request,
+                        "No encontramos ningún pedido con ese código. "
+                        "Revisa que esté bien escrito."
+                    )
 
     context = {
         "codigo": codigo_busqueda,
         "pedido": pedido_encontrado,
     }
-    return render(request, "catalogo/trackear_pedido.html", context)
+    return await _arender(request, "catalogo/trackear_pedido.html", context, status=status)
+
+
+@lee_de_replica
+async def api_productos(request):
+    """
+    Productos activos en JSON, por nombre y paginados por cursor
+    (`?despues=`), con filtro `?categoria=` y campos `?fields=`.
+    """
+    try:
+        campos = api.elegir_campos(request.GET.get("fields"), api.CAMPOS_LISTA)
+    except api.CamposInvalidos as exc:
+        return api.error(str(exc), 400)
+
+    # Mismo criterio que lista_productos: último cambio + conteos por
+    # categoría (cambian si se agrega, borra o desactiva un producto).
+    categorias = await sync_to_async(categorias_con_conteo)()
+    version = (
+        await _ultimo_cambio_catalogo(),
+        [(c["categoria"], c["total"]) for c in categorias],
+    )
+    etag = etiqueta("api_productos", request.GET.urlencode(), *version)
+    respuesta = no_modificado(request, etag)
+    if respuesta is None:
+        productos = Producto.objects.filter(activo=True).values(
+            *api.columnas(campos, api.CAMPOS_LISTA, "id", "nombre")
+        )
+        categoria = request.GET.get("categoria")
+        if categoria:
+            productos = productos.filter(categoria=categoria)
+        tamano = api.tamano_pagina(request)
+        try:
+            consulta = consulta_pagina(productos, "nombre", tamano, despues=request.GET.get("despues"))
+        except CursorInvalido:
+            return api.error("Cursor inválido.", 400)
+        respuesta = api.respuesta(await api.listado(consulta, tamano, campos, "nombre"))
+    return api.con_cache(respuesta, etag)
+
+
+@lee_de_replica
+async def api_producto(request, producto_id):
+    """Un producto activo en JSON; `tallas` trae el stock de cada talla."""
+    try:
+        campos = api.elegir_campos(request.GET.get("fields"), api.CAMPOS_DETALLE)
+    except api.CamposInvalidos as exc:
+        return api.error(str(exc), 400)
+    try:
+        producto = await (
+            Producto.objects.filter(activo=True)
+                            .values(*api.columnas(campos, api.CAMPOS_DETALLE, "id", "actualizado_en"))
+                            .aget(id=producto_id)
+        )
+    except Producto.DoesNotExist:
+        return api.error("No existe el producto.", 404)
+
+    # Los cambios de tallas también mueven Producto.actualizado_en.
+    ultima_modificacion = producto["actualizado_en"]
+    etag = etiqueta("api_producto", ",".join(campos), producto_id, ultima_modificacion.isoformat())
+    respuesta = no_modificado(request, etag, ultima_modificacion)
+    if respuesta is None:
+        if "tallas" in campos:
+            producto["tallas"] = [
+                variante
+                async for variante in VarianteProducto.objects.filter(producto_id=producto_id)
+                                                              .values("talla", "stock")
+            ]
+        respuesta = api.respuesta(api.serializar(producto, campos))
+    return api.con_cache(respuesta, etag, ultima_modificacion)
+
+
+def estado_pedido(request, codigo):
+    """
+    Estado del pedido en JSON para consultarlo periódicamente. Responde
+    con ETag; si el cliente manda If-None-Match y el estado no cambió,
+    regresa 304 sin cuerpo.
+    """
+    espera = espera_para(request)
+    if espera:
+        respuesta = JsonResponse({"error": _demasiadas_consultas(espera)}, status=429)
+        respuesta["Retry-After"] = str(math.ceil(espera))
+        return respuesta
+
+    try:
+        resumen = resumen_pedido(normalizar_codigo(codigo))
+    except CodigoInvalido:
+        resumen = None
+    if resumen is None:
+        return JsonResponse({"error": "Pedido no encontrado."}, status=404)
+
+    etag = etag_resumen(resumen)
+    respuesta = no_modificado(request, etag)
+    if respuesta is None:
+        respuesta = JsonResponse({
+            "codigo": resumen["codigo"],
+            "estado": resumen["estado_pedido"],
+            "estado_display": resumen["estado_display"],
+            "actualizado_en": resumen["actualizado_en"].isoformat(),
+        })
+    return con_validadores(respuesta, etag)
+
+
+
+@staff_member_required
+@lee_de_replica
+def reportes(request):
+    """
+    Ventas del rango (por día, categoría, método de pago y estado) y
+    productos con stock bajo. Con ?exportar=<reporte> descarga ese reporte
+    en CSV, escrito fila por fila.
+    """
+    formulario = RangoReporteForm(request.GET)
+    if formulario.is_valid():
+        desde, hasta = formulario.cleaned_data["desde"], formulario.cleaned_data["hasta"]
+    else:
+        desde, hasta = RangoReporteForm.por_omision()
+
+    exportar = request.GET.get("exportar")
+    if exportar:
+        if exportar not in reportes_db.REPORTES:
+            raise Http404("No existe ese reporte.")
+        _, encabezado = reportes_db.REPORTES[exportar]
+        return respuesta_streaming(
+            lineas_csv(encabezado, reportes_db.filas(exportar, desde, hasta)),
+            f"reporte-{exportar}-{desde:%Y%m%d}-{hasta:%Y%m%d}.csv",
+        )
+
+    metodos = dict(Pedido.METODO_PAGO_CHOICES)
+    estados = dict(Pedido.ESTADO_CHOICES)
+    corte = dia_de_corte()
+    por_dia = list(reportes_db.ventas_por_dia(desde, hasta))
+    context = {
+        "formulario": formulario,
+        "desde": desde,
+        "hasta": hasta,
+        "por_dia": por_dia,
+        "pedidos": sum(pedidos for _, pedidos, _ in por_dia),
+        "importe": sum(importe for _, _, importe in por_dia),
+        "por_categoria": reportes_db.ventas_por_categoria(desde, hasta, corte),
+        "por_producto": reportes_db.ventas_por_producto(desde, hasta, corte)[:10],
+        "por_metodo_pago": [
+            (metodos.get(metodo, metodo), pedidos, importe)
+            for metodo, pedidos, importe in reportes_db.ventas_por_metodo_pago(desde, hasta)
+        ],
+        "por_estado": [
+            (estados.get(estado, estado), pedidos, importe)
+            for estado, pedidos, importe in reportes_db.pedidos_por_estado(desde, hasta)
+        ],
+        "stock_bajo": list(islice(reportes_db.stock_bajo(), 50)),
+        "umbral": reportes_db.UMBRAL_STOCK_BAJO,
+        "filtros": urlencode({"desde": desde.isoformat(), "hasta": hasta.isoformat()}),
+    }
+    return render(request, "catalogo/reportes.html", context)
@@ -7,6 +7,9 @@ import sys
 def main():
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tienda.settings')
+    if sys.argv[1:2] == ['test']:
+        # Las pruebas corren sobre SQLite local (ver PERFIL en settings).
+        os.environ.setdefault('TIENDA_PERFIL', 'test')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
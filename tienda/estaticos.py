@@ -0,0 +1,204 @@
+"""
+Archivos estáticos para producción sin CDN.
+
+- `EstaticosComprimidos`: storage de collectstatic que, además de los nombres
+  con hash de ManifestStaticFilesStorage, deja junto a cada archivo de texto
+  sus variantes `.gz` y `.br` (si está instalado `brotli`) y junto a cada
+  imagen grande una variante `.webp` redimensionada.
+- `EstaticosPrecomprimidosMiddleware`: sirve STATIC_ROOT eligiendo la mejor
+  variante según Accept-Encoding/Accept, con cabeceras de caché
+  `immutable` para los nombres con hash.
+"""
+
+import gzip
+import io
+import json
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional; sin él sólo se genera .gz
+    brotli = None
+
+
+EXTENSIONES_COMPRIMIBLES = {".css", ".js", ".svg", ".txt", ".json", ".map", ".html"}
+EXTENSIONES_IMAGEN = {".png", ".jpg", ".jpeg"}
+
+# No vale la pena comprimir archivos muy chicos ni convertir imágenes chicas.
+MINIMO_COMPRIMIR = 256
+MINIMO_WEBP = 20 * 1024
+ANCHO_MAXIMO_WEBP = 1920
+
+SEGUNDOS_INMUTABLE = 60 * 60 * 24 * 365
+SEGUNDOS_SIN_HASH = 60 * 60
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+
+        for nombre in set(self.hashed_files.values()):
+            extension = posixpath.splitext(nombre)[1].lower()
+            if extension in EXTENSIONES_COMPRIMIBLES:
+                self._precomprimir(nombre)
+            elif extension in EXTENSIONES_IMAGEN:
+                self._variante_webp(nombre)
+
+    def _precomprimir(self, nombre):
+        with self.open(nombre) as archivo:
+            contenido = archivo.read()
+        if len(contenido) < MINIMO_COMPRIMIR:
+            return
+
+        variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variantes[".br"] = brotli.compress(contenido)
+
+        for sufijo, comprimido in variantes.items():
+            if len(comprimido) < len(contenido) and not self.exists(nombre + sufijo):
+                self._save(nombre + sufijo, ContentFile(comprimido))
+
+    def _variante_webp(self, nombre):
+        if self.exists(nombre + ".webp") or self.size(nombre) < MINIMO_WEBP:
+            return
+
+        from PIL import Image
+
+        with self.open(nombre) as archivo:
+            imagen = Image.open(archivo)
+            imagen.load()
+        if imagen.width > ANCHO_MAXIMO_WEBP:
+            alto = round(imagen.height * ANCHO_MAXIMO_WEBP / imagen.width)
+            imagen = imagen.resize((ANCHO_MAXIMO_WEBP, alto), Image.LANCZOS)
+
+        salida = io.BytesIO()
+        imagen.save(salida, "WEBP", quality=80, method=6)
+        if salida.tell() < self.size(nombre):
+            self._save(nombre + ".webp", ContentFile(salida.getvalue()))
+
+
+def _calidades(cabecera):
+    """
+    {valor: q} de una cabecera Accept o Accept-Encoding:
+    "br;q=0, gzip" -> {"br": 0.0, "gzip": 1.0}. Un q ilegible cuenta como 0.
+    """
+    calidades = {}
+    for parte in cabecera.split(","):
+        valor, *parametros = [trozo.strip() for trozo in parte.split(";")]
+        if not valor:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            nombre, _, dato = parametro.partition("=")
+            if nombre.strip().lower() == "q":
+                try:
+                    q = float(dato)
+                except ValueError:
+                    q = 0.0
+        calidades[valor.lower()] = q
+    return calidades
+
+
+class EstaticosPrecomprimidosMiddleware:
+    """
+    Sirve los archivos de STATIC_ROOT cuando no hay CDN ni servidor web
+    delante. Se activa con SERVIR_ESTATICOS = True.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SERVIR_ESTATICOS", False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.raiz = Path(settings.STATIC_ROOT)
+        self.prefijo = settings.STATIC_URL
+        self._con_hash = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._estatico(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # Buscar el archivo es un stat() local: no vale un hilo aparte.
+        return self._estatico(request) or await self.get_response(request)
+
+    def _estatico(self, request):
+        if request.method in ("GET", "HEAD") and request.path.startswith(self.prefijo):
+            return self._servir(request, request.path[len(self.prefijo):])
+        return None
+
+    @property
+    def con_hash(self):
+        """Nombres con hash del manifest: su contenido nunca cambia."""
+        if self._con_hash is None:
+            try:
+                manifest = json.loads((self.raiz / "staticfiles.json").read_text())
+                self._con_hash = set(manifest.get("paths", {}).values())
+            except (OSError, ValueError):
+                self._con_hash = set()
+        return self._con_hash
+
+    def _servir(self, request, nombre):
+        try:
+            ruta = Path(safe_join(self.raiz, nombre))
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not ruta.is_file():
+            return None
+
+        tipo = mimetypes.guess_type(ruta.name)[0] or "application/octet-stream"
+        extension = ruta.suffix.lower()
+        archivo, codificacion, vary = ruta, None, []
+
+        if extension in EXTENSIONES_COMPRIMIBLES:
+            vary.append("Accept-Encoding")
+            calidades = _calidades(request.headers.get("Accept-Encoding", ""))
+            opciones = [
+                (calidades.get(nombre_cod, calidades.get("*", 0)), sufijo, nombre_cod)
+                for sufijo, nombre_cod in ((".br", "br"), (".gz", "gzip"))
+            ]
+            # La de mayor q; a igual q, br antes que gzip (sort es estable).
+            for q, sufijo, nombre_cod in sorted(opciones, key=lambda opcion: -opcion[0]):
+                variante = ruta.with_name(ruta.name + sufijo)
+                if q > 0 and variante.is_file():
+                    archivo, codificacion = variante, nombre_cod
+                    break
+        elif extension in EXTENSIONES_IMAGEN:
+            vary.append("Accept")
+            variante = ruta.with_name(ruta.name + ".webp")
+            # Sólo si se nombra: */* no garantiza que el navegador lea webp.
+            aceptada = _calidades(request.headers.get("Accept", "")).get("image/webp", 0) > 0
+            if aceptada and variante.is_file():
+                archivo, tipo = variante, "image/webp"
+
+        respuesta = FileResponse(archivo.open("rb"), content_type=tipo)
+        if codificacion:
+            respuesta.headers["Content-Encoding"] = codificacion
+        if vary:
+            patch_vary_headers(respuesta, vary)
+
+        if nombre in self.con_hash:
+            respuesta.headers["Cache-Control"] = (
+                f"public, max-age={SEGUNDOS_INMUTABLE}, immutable"
+            )
+        else:
+            respuesta.headers["Cache-Control"] = f"public, max-age={SEGUNDOS_SIN_HASH}"
+        return respuesta
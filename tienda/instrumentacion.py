@@ -0,0 +1,186 @@
+"""
+Métricas de consultas SQL por petición.
+
+`MetricasConsultasMiddleware` cuenta las consultas que ejecuta cada vista,
+su tiempo total y las "formas" de SQL repetidas (la firma típica de un
+N+1), las registra en el logger `tienda.consultas` y, si
+METRICAS_CONSULTAS_CABECERA está activo, las expone en la cabecera
+`X-Consultas`.
+
+Sólo se cuenta lo que corre mientras la vista arma la respuesta: las
+filas que un StreamingHttpResponse lee al enviarse (exportaciones CSV)
+quedan fuera del registro y del presupuesto.
+
+Los presupuestos por nombre de URL viven en settings.PRESUPUESTO_CONSULTAS;
+`PresupuestoConsultasMixin` permite que las pruebas fallen si una vista
+se pasa del suyo.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger("tienda.consultas")
+
+_CONTROL_TRANSACCION = re.compile(
+    r"^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b", re.IGNORECASE
+)
+_LISTA_PARAMETROS = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def forma_sql(sql):
+    """
+    Normaliza una consulta para agrupar las que sólo difieren en sus
+    valores: IN (%s, %s, %s) -> IN (...), literales -> ?.
+    """
+    sql = _LISTA_PARAMETROS.sub("(...)", sql)
+    return _LITERALES.sub("?", sql)
+
+
+class RegistroConsultas:
+    """execute_wrapper que acumula las consultas de una petición."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, time.perf_counter() - inicio))
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def milisegundos(self):
+        return sum(duracion for _, duracion in self.consultas) * 1000
+
+    @property
+    def duplicadas(self):
+        """
+        {forma: veces} de las formas que se ejecutaron más de una vez
+        (sin contar BEGIN/SAVEPOINT y demás control de transacciones).
+        """
+        formas = Counter(
+            forma_sql(sql) for sql, _ in self.consultas
+            if not _CONTROL_TRANSACCION.match(sql)
+        )
+        return {forma: veces for forma, veces in formas.items() if veces > 1}
+
+    def resumen(self):
+        return {
+            "consultas": self.total,
+            "ms": round(self.milisegundos, 2),
+            "duplicadas": sum(veces - 1 for veces in self.duplicadas.values()),
+        }
+
+
+class MetricasConsultasMiddleware:
+    # Sirve igual en WSGI que en ASGI: con vistas async no obliga a Django
+    # a pasar cada petición a un hilo sólo por este middleware. Las
+    # conexiones son por hilo y el ORM (también el async) consulta desde
+    # el hilo de sync_to_async de la petición: el registro se instala en
+    # ese hilo, no en el del event loop.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        registro = RegistroConsultas()
+        with _registrando(registro):
+            response = self.get_response(request)
+        return self._reportar(request, response, registro)
+
+    async def __acall__(self, request):
+        registro = RegistroConsultas()
+        pila = await sync_to_async(_registrando)(registro)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self._reportar(request, response, registro)
+
+    def _reportar(self, request, response, registro):
+        vista = getattr(request.resolver_match, "url_name", None) or request.path
+        resumen = registro.resumen()
+        response.metricas_consultas = registro
+
+        presupuesto = getattr(settings, "PRESUPUESTO_CONSULTAS", {}).get(vista)
+        nivel = logging.INFO
+        if presupuesto is not None and registro.total > presupuesto:
+            nivel = logging.WARNING
+        logger.log(
+            nivel,
+            "%s %s: %s consultas, %s ms, %s duplicadas",
+            request.method, vista,
+            resumen["consultas"], resumen["ms"], resumen["duplicadas"],
+            extra={"vista": vista, "presupuesto": presupuesto, **resumen},
+        )
+
+        if getattr(settings, "METRICAS_CONSULTAS_CABECERA", settings.DEBUG):
+            response["X-Consultas"] = (
+                f"n={resumen['consultas']}; ms={resumen['ms']}; "
+                f"duplicadas={resumen['duplicadas']}"
+            )
+        return response
+
+
+def _registrando(registro):
+    pila = ExitStack()
+    for alias in connections:
+        pila.enter_context(connections[alias].execute_wrapper(registro))
+    return pila
+
+
+class PresupuestoConsultasMixin:
+    """
+    Para TestCase: `self.assertDentroDePresupuesto(respuesta)` falla si la
+    vista ejecutó más consultas que su presupuesto en
+    settings.PRESUPUESTO_CONSULTAS o si repitió la misma forma de SQL más
+    veces de las permitidas (N+1).
+    """
+
+    max_repeticiones = 1
+
+    def assertDentroDePresupuesto(self, respuesta, presupuesto=None):
+        registro = getattr(respuesta, "metricas_consultas", None)
+        if registro is None:
+            self.fail("La respuesta no pasó por MetricasConsultasMiddleware.")
+
+        vista = respuesta.resolver_match.url_name
+        if presupuesto is None:
+            presupuesto = settings.PRESUPUESTO_CONSULTAS.get(vista)
+        if presupuesto is None:
+            self.fail(f"La vista {vista!r} no tiene presupuesto de consultas.")
+
+        detalle = "\n".join(sql for sql, _ in registro.consultas)
+        self.assertLessEqual(
+            registro.total, presupuesto,
+            f"{vista} ejecutó {registro.total} consultas "
+            f"(presupuesto: {presupuesto}):\n{detalle}",
+        )
+
+        repetidas = {
+            forma: veces for forma, veces in registro.duplicadas.items()
+            if veces > self.max_repeticiones
+        }
+        self.assertFalse(
+            repetidas, f"{vista} repite consultas (posible N+1): {repetidas}"
+        )
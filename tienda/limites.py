@@ -0,0 +1,64 @@
+"""
+Límite de peticiones por cliente con un "cubo de fichas" guardado en la
+caché de Django.
+
+Cada cliente tiene un cubo con `capacidad` fichas que se rellena a razón
+de `por_minuto`; cada petición gasta una y, sin fichas, se rechaza. Así
+se permiten ráfagas cortas pero no un ritmo sostenido mayor al límite.
+
+La lectura y escritura del cubo no son atómicas: con mucha concurrencia
+un cliente puede colar alguna petición de más. Para frenar a quien
+enumera códigos no hace falta más precisión. Usa la caché "default"
+(ver CACHES en tienda/settings.py): en desarrollo es locmem y el límite
+es por proceso; en producción es la tabla `tienda_cache` de la base, que
+comparten todos los procesos, así que el límite es global.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+PREFIJO = "limites"
+
+
+class CuboDeFichas:
+    def __init__(self, nombre, capacidad, por_minuto):
+        self.nombre = nombre
+        self.capacidad = capacidad
+        self.por_segundo = por_minuto / 60
+
+    def _clave(self, cliente):
+        return f"{PREFIJO}:{self.nombre}:{cliente}"
+
+    def consumir(self, cliente):
+        """
+        Gasta una ficha de `cliente`. Regresa 0 si se permitió la petición
+        o los segundos que faltan para tener una ficha si no.
+        """
+        ahora = time.time()
+        fichas, antes = cache.get(self._clave(cliente), (self.capacidad, ahora))
+        fichas = min(self.capacidad, fichas + (ahora - antes) * self.por_segundo)
+
+        if fichas < 1:
+            cache.set(self._clave(cliente), (fichas, ahora), self._vida())
+            return (1 - fichas) / self.por_segundo
+
+        cache.set(self._clave(cliente), (fichas - 1, ahora), self._vida())
+        return 0
+
+    def _vida(self):
+        # Pasado este tiempo el cubo estaría lleno otra vez: se puede olvidar.
+        return int(self.capacidad / self.por_segundo) + 1
+
+
+def clientes(request):
+    """
+    Identificadores del cliente para limitarlo: su IP y, si tiene, su
+    sesión (un scraper que descarta cookies sigue limitado por IP).
+    """
+    identificadores = [f"ip:{request.META.get('REMOTE_ADDR', '')}"]
+    sesion = getattr(request, "session", None)
+    if sesion is not None and sesion.session_key:
+        identificadores.append(f"sesion:{sesion.session_key}")
+    return identificadores
@@ -0,0 +1,135 @@
+"""
+Backend de MySQL con un pool de conexiones dentro del proceso.
+
+Con CONN_MAX_AGE cada hilo guarda su propia conexión entre peticiones;
+bajo ASGI los hilos de sync_to_async no son fijos y esas conexiones se
+quedan abiertas sin dueño, así que ahí se usa CONN_MAX_AGE = 0 y este
+pool: al "cerrar", la conexión vuelve al pool y la siguiente petición
+(de cualquier hilo) la reutiliza sin repetir el TCP + autenticación.
+
+Se activa con ENGINE "tienda.mysql_pool" y OPTIONS["pool"] (ver el
+perfil de base de datos en tienda/settings.py):
+
+    "pool": {"tamano": 10, "revisar_despues": 30, "vida_maxima": 3600}
+
+- tamano: conexiones libres que se guardan; las que sobran se cierran.
+  No limita cuántas hay abiertas a la vez (eso lo marcan los hilos).
+- revisar_despues: segundos sin uso tras los que se hace ping antes de
+  prestarla (MySQL cierra las inactivas tras wait_timeout).
+- vida_maxima: segundos tras los que se cierra en vez de reutilizarla.
+
+Sólo vuelven al pool conexiones en autocommit, fuera de transacción y
+sin errores; cualquier otra se cierra de verdad.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql import base as mysql
+
+
+class Pool:
+    def __init__(self, tamano=10, revisar_despues=30, vida_maxima=3600):
+        self.libres = queue.LifoQueue(maxsize=tamano)
+        self.revisar_despues = revisar_despues
+        self.vida_maxima = vida_maxima
+
+    def tomar(self, conectar):
+        """(conexión, creada_en, reutilizada): una libre que responda o una nueva."""
+        while True:
+            try:
+                conexion, creada_en, devuelta_en = self.libres.get_nowait()
+            except queue.Empty:
+                return conectar(), time.monotonic(), False
+            ahora = time.monotonic()
+            if ahora - creada_en > self.vida_maxima:
+                _cerrar(conexion)
+                continue
+            if ahora - devuelta_en > self.revisar_despues:
+                try:
+                    conexion.ping()
+                except Exception:
+                    _cerrar(conexion)
+                    continue
+            return conexion, creada_en, True
+
+    def devolver(self, conexion, creada_en):
+        if time.monotonic() - creada_en > self.vida_maxima:
+            _cerrar(conexion)
+            return
+        try:
+            self.libres.put_nowait((conexion, creada_en, time.monotonic()))
+        except queue.Full:
+            _cerrar(conexion)
+
+    def vaciar(self):
+        while True:
+            try:
+                conexion, _, _ = self.libres.get_nowait()
+            except queue.Empty:
+                return
+            _cerrar(conexion)
+
+
+def _cerrar(conexion):
+    try:
+        conexion.close()
+    except Exception:
+        pass
+
+
+# {(pid, alias): Pool}. Con el pid, un proceso hijo (gunicorn --preload)
+# no reutiliza los sockets que heredó del padre.
+_pools = {}
+_candado = threading.Lock()
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    _creada_en = None
+    _reutilizada = False
+
+    @property
+    def pool(self):
+        clave = (os.getpid(), self.alias)
+        with _candado:
+            if clave not in _pools:
+                if self.settings_dict["CONN_MAX_AGE"] != 0:
+                    raise ImproperlyConfigured(
+                        "El pool de conexiones requiere CONN_MAX_AGE = 0."
+                    )
+                _pools[clave] = Pool(**self.settings_dict["OPTIONS"].get("pool", {}))
+            return _pools[clave]
+
+    def get_connection_params(self):
+        parametros = super().get_connection_params()
+        parametros.pop("pool", None)
+        return parametros
+
+    def get_new_connection(self, conn_params):
+        conexion, self._creada_en, self._reutilizada = self.pool.tomar(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        return conexion
+
+    def init_connection_state(self):
+        # Una conexión reutilizada conserva su sesión (aislamiento,
+        # SQL_AUTO_IS_NULL): no hace falta repetir los SET.
+        if not self._reutilizada:
+            super().init_connection_state()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        reutilizable = (
+            not self.in_atomic_block
+            and self.autocommit
+            and not self.errors_occurred
+        )
+        with self.wrap_database_errors:
+            if reutilizable:
+                self.pool.devolver(self.connection, self._creada_en)
+            else:
+                self.connection.close()
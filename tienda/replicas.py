@@ -0,0 +1,132 @@
+"""
+Lecturas del catálogo y de los reportes en una réplica de la base.
+
+Las vistas marcadas con `@lee_de_replica` (listado, detalle, API de
+productos y reportes) leen de la base `settings.BASE_REPLICA` los
+modelos de MODELOS_EN_REPLICA: productos, variantes y ventas, que
+toleran unos segundos de atraso de la réplica. Todo lo demás se lee del
+primario, también dentro de esas vistas: carrito, reservas, sesión,
+usuario y caché, que el cliente acaba de escribir y tiene que ver al
+momento. Las escrituras (checkout, carrito, admin) siempre van al
+primario.
+
+El router decide por el modelo de la consulta, no por sus JOINs: las
+consultas de Producto que suman reservas (inventario.disponibles,
+version_disponibilidad) piden el primario con using(). Lo que se guarda
+en caché (fragmentos, facetas) también sale del primario, con
+`leyendo_del_primario()`: un dato atrasado de la réplica quedaría ahí
+bajo la versión nueva hasta el siguiente cambio.
+
+Sin BASE_REPLICA (desarrollo sin réplica, pruebas) todo usa "default".
+
+La marca vive en un ContextVar: la ven también las llamadas del ORM que
+las vistas async pasan a un hilo con sync_to_async. Las respuestas en
+streaming (CSV de reportes, API) leen sus filas después de que la vista
+regresa; `lee_de_replica` envuelve su contenido para que esas lecturas
+también vayan a la réplica.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+MODELOS_EN_REPLICA = {
+    "catalogo.producto",
+    "catalogo.varianteproducto",
+    "catalogo.terminoproducto",
+    "catalogo.pedido",
+    "catalogo.pedidoitem",
+    "catalogo.ventadiaria",
+    "catalogo.marcaproceso",
+}
+
+_en_replica = ContextVar("en_replica", default=False)
+
+
+def alias_replica():
+    """Alias de la réplica si está configurada, None si no."""
+    return getattr(settings, "BASE_REPLICA", None)
+
+
+def en_replica():
+    """True si las lecturas de catálogo de este momento van a la réplica."""
+    return bool(alias_replica()) and _en_replica.get()
+
+
+@contextmanager
+def _marcando(valor):
+    anterior = _en_replica.get()
+    _en_replica.set(valor)
+    try:
+        yield
+    finally:
+        # set() y no reset(token): un generador de streaming puede
+        # cerrarse en otro contexto (p. ej. al recolectarlo).
+        _en_replica.set(anterior)
+
+
+def leyendo_de_replica():
+    return _marcando(True)
+
+
+def leyendo_del_primario():
+    """Dentro de una vista de réplica, vuelve a leer todo del primario."""
+    return _marcando(False)
+
+
+def _iterar_en_replica(partes):
+    with leyendo_de_replica():
+        yield from partes
+
+
+async def _aiterar_en_replica(partes):
+    with leyendo_de_replica():
+        async for parte in partes:
+            yield parte
+
+
+def _con_contenido_en_replica(respuesta):
+    if getattr(respuesta, "streaming", False):
+        partes = respuesta.streaming_content
+        respuesta.streaming_content = (
+            _aiterar_en_replica(partes) if respuesta.is_async else _iterar_en_replica(partes)
+        )
+    return respuesta
+
+
+def lee_de_replica(vista):
+    """Decorador de vistas (sync o async): sus lecturas de catálogo van a la réplica."""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            with leyendo_de_replica():
+                respuesta = await vista(request, *args, **kwargs)
+            return _con_contenido_en_replica(respuesta)
+    else:
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            with leyendo_de_replica():
+                respuesta = vista(request, *args, **kwargs)
+            return _con_contenido_en_replica(respuesta)
+    return envoltura
+
+
+class RouterReplica:
+    """DATABASE_ROUTERS: lecturas marcadas a la réplica, escrituras al primario."""
+
+    def db_for_read(self, model, **hints):
+        if en_replica() and model._meta.label_lower in MODELOS_EN_REPLICA:
+            return alias_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primario tienen los mismos datos.
+        return True
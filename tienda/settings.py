@@ -4,15 +4,40 @@ Django settings for tienda project.
 Generated by 'django-admin startproject' using Django 5.2.8.
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-SECRET_KEY = 'django-insecure-ssu^i6y=nq)io&5f+)*_*y70p^^%*1=+n-31x2y+ltg#(0wq*k'
+# Perfil de ejecución, de la variable de entorno TIENDA_PERFIL:
+# - dev (por omisión): DEBUG, MySQL local.
+# - test: DEBUG, dos SQLite locales como primario y réplica (las pruebas
+#   se corren con este perfil).
+# - prod: sin DEBUG; llave, hosts y clave de la base de datos del
+#   entorno, obligatorias.
+# `manage.py test` usa el perfil test si no se indica otro.
+PERFIL = os.environ.get("TIENDA_PERFIL", "dev")
+if PERFIL not in ("dev", "test", "prod"):
+    raise ImproperlyConfigured(f"TIENDA_PERFIL desconocido: {PERFIL!r}")
+
+
+def _requerida(variable):
+    valor = os.environ.get(variable, "").strip()
+    if not valor:
+        raise ImproperlyConfigured(f"El perfil {PERFIL} requiere la variable de entorno {variable}.")
+    return valor
+
 
-DEBUG = True
+if PERFIL == "prod":
+    SECRET_KEY = _requerida("TIENDA_SECRET_KEY")
+    ALLOWED_HOSTS = [host.strip() for host in _requerida("TIENDA_ALLOWED_HOSTS").split(",") if host.strip()]
+else:
+    SECRET_KEY = 'django-insecure-ssu^i6y=nq)io&5f+)*_*y70p^^%*1=+n-31x2y+ltg#(0wq*k'
+    ALLOWED_HOSTS = []
 
-ALLOWED_HOSTS = []
+DEBUG = PERFIL != "prod"
 
 
 INSTALLED_APPS = [
@@ -28,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tienda.estaticos.EstaticosPrecomprimidosMiddleware',
+    'tienda.instrumentacion.MetricasConsultasMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,20 +83,56 @@ TEMPLATES = [
 WSGI_APPLICATION = 'tienda.wsgi.application'
 
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.mysql",
-        "NAME": "tienda",
-        "USER": "tienda_user",
-        "PASSWORD": "sistemas1",
-        "HOST": "127.0.0.1",
-        "PORT": "3306",
-        "OPTIONS": {
-            "charset": "utf8mb4",
-            "init_command": "SET sql_mode='STRICT_ALL_TABLES'",
-        },
+# Bases de datos. En dev y prod, MySQL con conexiones persistentes
+# (CONN_MAX_AGE) revisadas al inicio de cada petición
+# (CONN_HEALTH_CHECKS). Con TIENDA_DB_POOL=<n> se usa en su lugar el pool
+# del proceso (tienda/mysql_pool), pensado para ASGI. Con
+# TIENDA_DB_REPLICA_HOST se agrega la réplica "replica", de la que leen
+# las vistas del catálogo y los reportes (tienda/replicas.py).
+if PERFIL == "test":
+    DATABASES = {
+        alias: {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / nombre,
+            "OPTIONS": {"timeout": 20},
+            "TEST": {"NAME": BASE_DIR / f"test_{nombre}"},
+        }
+        for alias, nombre in (("default", "db.sqlite3"), ("replica", "db_replica.sqlite3"))
     }
-}
+else:
+    def _mysql(host):
+        base = {
+            "ENGINE": "django.db.backends.mysql",
+            "NAME": os.environ.get("TIENDA_DB_NOMBRE", "tienda"),
+            "USER": os.environ.get("TIENDA_DB_USUARIO", "tienda_user"),
+            "PASSWORD": (
+                _requerida("TIENDA_DB_CLAVE") if PERFIL == "prod"
+                else os.environ.get("TIENDA_DB_CLAVE", "sistemas1")
+            ),
+            "HOST": host,
+            "PORT": os.environ.get("TIENDA_DB_PUERTO", "3306"),
+            "CONN_MAX_AGE": int(os.environ.get("TIENDA_DB_CONN_MAX_AGE", 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                "charset": "utf8mb4",
+                "init_command": "SET sql_mode='STRICT_ALL_TABLES'",
+            },
+        }
+        if tamano_pool := int(os.environ.get("TIENDA_DB_POOL", 0)):
+            base["ENGINE"] = "tienda.mysql_pool"
+            base["CONN_MAX_AGE"] = 0
+            base["OPTIONS"]["pool"] = {"tamano": tamano_pool}
+        return base
+
+    DATABASES = {"default": _mysql(os.environ.get("TIENDA_DB_HOST", "127.0.0.1"))}
+    if replica := os.environ.get("TIENDA_DB_REPLICA_HOST"):
+        DATABASES["replica"] = {**_mysql(replica), "TEST": {"MIRROR": "default"}}
+
+DATABASE_ROUTERS = ["tienda.replicas.RouterReplica"]
+# Alias del que leen las vistas marcadas con @lee_de_replica; sin réplica
+# leen de "default". En el perfil test la réplica existe pero sólo la usan
+# las pruebas del router, que la activan con override_settings.
+BASE_REPLICA = "replica" if "replica" in DATABASES and PERFIL != "test" else None
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -88,6 +151,27 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# En producción `collectstatic` genera nombres con hash, variantes .gz/.br
+# y .webp (ver tienda/estaticos.py). En desarrollo runserver sirve los
+# originales de STATICFILES_DIRS.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "tienda.estaticos.EstaticosComprimidos"
+        ),
+    },
+}
+
+# Servir STATIC_ROOT desde Django (con caché inmutable) cuando no hay CDN
+# ni servidor web delante.
+SERVIR_ESTATICOS = not DEBUG
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -97,3 +181,84 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'inicio'
 LOGOUT_REDIRECT_URL = 'portal_acceso'
+
+# Caché (fragmentos del catálogo, facetas, seguimiento, límites). En
+# desarrollo y pruebas vive en memoria; en producción se comparte entre
+# procesos con una tabla en la misma base de datos, sin servicios extra
+# (crearla una vez con `python manage.py createcachetable`).
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        if DEBUG
+        else {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "tienda_cache",
+            "OPTIONS": {"MAX_ENTRIES": 50_000},
+        }
+    ),
+}
+
+# Catálogo
+CATALOGO_MINUTOS_RESERVA = 15
+CATALOGO_PRODUCTOS_POR_PAGINA = 24
+CATALOGO_MAX_POR_PAGINA = 100
+CATALOGO_PEDIDOS_POR_PAGINA = 20
+# Seguimiento de pedidos por código: (ráfaga, consultas por minuto) por
+# IP y por sesión.
+CATALOGO_SEGUIMIENTO_LIMITE = (10, 10)
+# Reporte de stock bajo: productos (o tallas) con estas piezas o menos.
+CATALOGO_UMBRAL_STOCK_BAJO = 5
+# Dirección pública de la tienda, para los enlaces de los correos.
+CATALOGO_URL_SITIO = "http://localhost:8000"
+# API JSON de productos: segundos que CDN y navegador pueden guardar una
+# respuesta (se revalida con ETag) y tope de ?por_pagina=.
+CATALOGO_API_SEGUNDOS_CACHE = 60
+CATALOGO_API_MAX_POR_PAGINA = 1000
+
+# Correos a clientes (catalogo.avisos). En desarrollo se imprimen en la
+# consola; en producción SMTP con EMAIL_HOST/EMAIL_PORT/EMAIL_HOST_USER.
+EMAIL_BACKEND = (
+    "django.core.mail.backends.console.EmailBackend"
+    if DEBUG
+    else "django.core.mail.backends.smtp.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = "Pure Warer <pedidos@localhost>"
+
+# Máximo de consultas SQL por vista (nombre de URL). Ver
+# tienda/instrumentacion.py; las pruebas fallan si una vista se pasa.
+# Medidos con un cliente con sesión iniciada y la caché fría: incluyen
+# la sesión y el usuario que leen los middlewares.
+PRESUPUESTO_CONSULTAS = {
+    "inicio": 2,
+    "lista_productos": 7,
+    "buscar_productos": 5,
+    "detalle_producto": 6,
+    "ver_carrito": 4,
+    "agregar_al_carrito": 21,
+    "checkout_pedido": 16,
+    "mis_pedidos": 4,
+    "detalle_pedido": 5,
+    "pedido_confirmacion": 5,
+    "trackear_pedido": 3,
+    "estado_pedido": 1,
+    "reportes": 10,
+    "api_productos": 3,
+    "api_producto": 2,
+}
+
+# Las métricas de cada petición se registran en INFO; por omisión sólo se
+# muestran las vistas que se pasan de su presupuesto (WARNING).
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "tienda.consultas": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
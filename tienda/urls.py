@@ -14,6 +14,11 @@ urlpatterns = [
 
     path("inicio/", catalogo_views.inicio, name="inicio"),
     path("productos/", catalogo_views.lista_productos, name="lista_productos"),
+    path(
+        "productos/buscar/",
+        catalogo_views.buscar_productos,
+        name="buscar_productos",
+    ),
 
     path(
         "productos/<int:producto_id>/",
@@ -71,6 +76,21 @@ urlpatterns = [
         name="trackear_pedido",
     ),
 
+    path(
+        "trackear-pedido/<str:codigo>/estado/",
+        catalogo_views.estado_pedido,
+        name="estado_pedido",
+    ),
+
+    path("reportes/", catalogo_views.reportes, name="reportes"),
+
+    path("api/v1/productos/", catalogo_views.api_productos, name="api_productos"),
+    path(
+        "api/v1/productos/<int:producto_id>/",
+        catalogo_views.api_producto,
+        name="api_producto",
+    ),
+
     path(
         "login/",
         auth_views.LoginView.as_view(template_name="cuentas/login.html"),